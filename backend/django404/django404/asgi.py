@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+The push endpoints (/events/, /events/poll/) and the async cross-node endpoints (/async/...)
+in myapp/async_views.py wait on open connections and remote nodes, so serve the project
+through this module with an ASGI server, e.g.
+    uvicorn django404.asgi:application --workers 4
 """
 
 import os
@@ -49,7 +49,8 @@ ALLOWED_HOSTS = [
 
 ]
 
-# Node configuration for inter-node communication (used by utility functions)
+# Initial peer nodes. At runtime nodes come from the Node table (myapp/nodes.py, editable in
+# the admin); `manage.py load_nodes` copies these entries into it.
 NODE_CONFIG = {
     'node1': {
         'url': 'http://[2605:fd00:4:1001:f816:3eff:fe8c:5c2d]:8000',
@@ -81,6 +82,50 @@ NODE_CONFIG = {
     },
 }
 
+# Overall time budget (seconds) for one request fanned out to every node (myapp/federation.py)
+FEDERATION_FANOUT_DEADLINE = 6
+# Cached remote user lists (RemoteAuthor) older than this many seconds are flagged as stale
+REMOTE_AUTHOR_MAX_AGE = 300
+# Outbound federation queue (myapp/outbox.py, drained by `manage.py drain_outbox --loop`)
+FEDERATION_OUTBOX_MAX_ATTEMPTS = 12
+FEDERATION_OUTBOX_PER_NODE = 2
+# /federation/changes/ (myapp/changes.py) holds back posts changed in the last this many seconds,
+# so transactions that commit late are not skipped by a peer's cursor ('manage.py pull_changes')
+FEDERATION_CHANGES_SETTLE = 5
+# Responses and outbound federation bodies smaller than this many bytes are not compressed
+# (myapp/compression.py; zstd and br need the optional 'zstandard' / 'brotli' packages)
+COMPRESSION_MIN_SIZE = 1024
+# Outbound calls to other nodes (myapp/node_http.py): connect/read timeouts in seconds, calls in
+# flight per node, seconds to wait for a free slot, and retries of idempotent calls
+FEDERATION_CONNECT_TIMEOUT = 3.05
+FEDERATION_READ_TIMEOUT = 5
+FEDERATION_MAX_PER_NODE = 8
+FEDERATION_SLOT_TIMEOUT = 5
+FEDERATION_RETRIES = 2
+# Threads per process that download the images of posts received from other nodes (myapp/inbox.py)
+FEDERATION_IMAGE_FETCH_WORKERS = 4
+
+# Django cache shared by every worker process. Local memory is per process; point this at
+# Redis or Memcached in production so invalidations (e.g. myapp/social_graph.py) reach all workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# Follower/followee ID sets (myapp/social_graph.py): in-process LRU size and lifetimes in seconds
+SOCIAL_GRAPH_LRU_SIZE = 10000
+SOCIAL_GRAPH_LOCAL_TTL = 5
+SOCIAL_GRAPH_CACHE_TIMEOUT = 600
+# Node circuit breaker (myapp/node_health.py): failures in a row that open a node's circuit,
+# and seconds between probes of an open node (run 'manage.py probe_nodes --loop')
+NODE_FAILURE_THRESHOLD = 5
+NODE_PROBE_INTERVAL = 30
+# Pub/sub behind the /events/ push endpoints (myapp/push.py). LocalBroker only reaches
+# connections held by the same process; use 'myapp.push.RedisBroker' with several workers.
+PUSH_BACKEND = 'myapp.push.LocalBroker'
+PUSH_BACKEND_OPTIONS = {}
+PUSH_REDIS_URL = os.environ.get('PUSH_REDIS_URL', 'redis://localhost:6379/0')
+
 # Application definition
 AUTH_USER_MODEL = 'myapp.User'
 
@@ -100,6 +145,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'myapp.compression.CompressionMiddleware',  # Before anything that reads or changes the body
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Must come early
     'django.middleware.common.CommonMiddleware',
@@ -124,6 +170,8 @@ CORS_ALLOWED_ORIGINS = [
 
 ]
 CORS_ALLOW_CREDENTIALS = True
+# Paginated listings, node fan-outs and cached remote users describe themselves in headers; let the frontend read them.
+CORS_EXPOSE_HEADERS = ['Link', 'X-Nodes-Timed-Out', 'X-Nodes-Failed', 'X-Cache-Stale', 'X-Cache-Refreshed-At']
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -177,6 +225,10 @@ HOSTNAME_TO_INSTANCE = {
 # Determine the instance based on the current hostname. Default to node1 if not found.
 INSTANCE_NAME = HOSTNAME_TO_INSTANCE.get(current_hostname, "node1")
 print("INSTANCE_NAME determined as:", INSTANCE_NAME)  # Debug log
+# Node (by name) whose users the single-node listings (get-remote-users/, remote-list-all-users/) show
+DEFAULT_PEER_NODE = "node1" if INSTANCE_NAME == "node2" else "node2"
+# Seconds each process may serve its in-memory copy of the Node table (myapp/nodes.py)
+NODE_REGISTRY_TTL = 30
 
 # Set up DATABASES based on INSTANCE_NAME.
 if INSTANCE_NAME == "node1":
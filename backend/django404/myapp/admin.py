@@ -1,3 +1,39 @@
 from django.contrib import admin
 
+from myapp import node_health
+from myapp.models import Node
+
 # Register your models here.
+
+
+@admin.register(Node)
+class NodeAdmin(admin.ModelAdmin):
+    list_display = (
+        "name", "base_url", "is_active", "circuit", "consecutive_failures", "latency",
+        "last_connected", "last_failure",
+    )
+    list_filter = ("is_active",)
+    search_fields = ("name", "base_url")
+    readonly_fields = (
+        "circuit", "consecutive_failures", "latency", "last_connected", "last_failure",
+        "circuit_opened_at", "last_error",
+    )
+    actions = ("probe_now", "close_circuit")
+
+    @admin.display(description="Circuit")
+    def circuit(self, node):
+        return node_health.state(node)
+
+    @admin.display(description="Latency (ms)", ordering="latency_ms")
+    def latency(self, node):
+        return None if node.latency_ms is None else round(node.latency_ms)
+
+    @admin.action(description="Probe selected nodes now")
+    def probe_now(self, request, queryset):
+        answered = sum(node_health.probe(node) for node in queryset)
+        self.message_user(request, f"{answered} of {len(queryset)} nodes answered.")
+
+    @admin.action(description="Close the circuit of selected nodes")
+    def close_circuit(self, request, queryset):
+        closed = queryset.update(consecutive_failures=0, circuit_opened_at=None)
+        self.message_user(request, f"Closed the circuit of {closed} nodes.")
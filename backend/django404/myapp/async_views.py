@@ -0,0 +1,218 @@
+# async_views.py
+#
+# Async (ASGI) views. They are plain Django async views rather than DRF views, because DRF
+# runs every view synchronously; run the project under an ASGI server (see django404/asgi.py)
+# so a waiting connection costs an open socket instead of a worker thread.
+# - /events/: push channel (myapp/push.py)
+# - /async/...: the cross-node endpoints of views.py, calling other nodes through the shared
+#   async HTTP client of myapp/federation_async.py
+
+import asyncio
+import json
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from myapp import compression, federation, federation_async, nodes, push
+from myapp.serializers import RegisterUserSerializer
+from myapp.views import local_follow_request
+
+User = get_user_model()
+
+# Seconds between SSE keep-alive comments, so proxies do not drop idle connections
+SSE_KEEPALIVE = 15
+# Longest a long-poll request waits for an event, in seconds
+LONG_POLL_MAX_TIMEOUT = 30
+
+
+async def _authenticate(request):
+    """
+    The JWT user of the request, or None.
+    EventSource cannot send headers, so the token may also come as ?token=.
+    """
+    token = request.GET.get("token")
+    if token and "HTTP_AUTHORIZATION" not in request.META:
+        request.META["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _subscribe(user):
+    return push.get_broker().subscribe([push.user_channel(user.id), push.PUBLIC_CHANNEL])
+
+
+def _for_user(message, user):
+    """Public stream events for the user's own posts are not part of their stream."""
+    # Ids arrive as whatever JSON made of them, so compare them as strings
+    return not (message["event"] == "stream" and str(message["data"].get("author_id")) == str(user.id))
+
+
+def _unauthorized():
+    return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+@require_GET
+async def event_stream(request):
+    """
+    Server-sent events for the logged-in user:
+      event: notif   - a new notification (like, comment, follow request)
+      event: stream  - a post was added to / updated in the user's stream
+    """
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+
+    async def events():
+        subscription = _subscribe(user)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                message = await subscription.get(timeout=SSE_KEEPALIVE)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                elif _for_user(message, user):
+                    data = json.dumps(message["data"], cls=DjangoJSONEncoder)
+                    yield f"event: {message['event']}\ndata: {data}\n\n"
+        finally:
+            await subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop nginx from buffering the stream
+    return response
+
+
+@require_GET
+async def event_poll(request):
+    """
+    Long-poll fallback for clients without SSE: waits up to ?timeout= seconds
+    (default and maximum LONG_POLL_MAX_TIMEOUT) and returns the events that arrived,
+    or an empty list. Events are delivered to connections that are open when they happen,
+    so clients should re-poll immediately.
+    """
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    try:
+        timeout = min(float(request.GET.get("timeout", LONG_POLL_MAX_TIMEOUT)), LONG_POLL_MAX_TIMEOUT)
+    except ValueError:
+        return JsonResponse({"error": "Invalid timeout."}, status=400)
+
+    subscription = _subscribe(user)
+    try:
+        messages = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(timeout, 0)
+        while not messages:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            message = await subscription.get(timeout=remaining)
+            if message is None:
+                break
+            if _for_user(message, user):
+                messages.append(message)
+        # Pick up whatever else is already queued without waiting
+        while messages:
+            message = await subscription.get(timeout=0)
+            if message is None:
+                break
+            if _for_user(message, user):
+                messages.append(message)
+    finally:
+        await subscription.close()
+    return JsonResponse(messages, safe=False, encoder=DjangoJSONEncoder)
+
+
+def _json(data, status=200, headers=None):
+    return JsonResponse(data, status=status, safe=False, encoder=DjangoJSONEncoder, headers=headers)
+
+
+async def _peer_users(request, not_found):
+    """Users of the node picked by ?node= (default settings.DEFAULT_PEER_NODE), from the RemoteAuthor cache."""
+    if await _authenticate(request) is None:
+        return _unauthorized()
+    remote_node = await sync_to_async(federation.peer_node)(request.GET.get("node"))
+    if not remote_node:
+        return _json({"error": not_found}, status=404)
+
+    cached = await federation_async.cached_remote_authors({remote_node.key: remote_node})
+    if cached.fan_out.failed or cached.fan_out.timed_out or cached.fan_out.skipped:
+        return _json({"error": f"Failed to fetch users from {remote_node.key}."}, status=502)
+    return _json(cached.users, headers=cached.headers())
+
+
+@require_GET
+async def remote_users(request):
+    """Async RemoteUsersView."""
+    return await _peer_users(request, "Remote node not found.")
+
+
+@require_GET
+async def remote_list_all_users(request):
+    """Async RemoteListAllUsersView."""
+    return await _peer_users(request, "Remote node configuration not found.")
+
+
+def _local_users():
+    data = RegisterUserSerializer(User.objects.all(), many=True).data
+    for user in data:
+        user["remote_node"] = settings.INSTANCE_NAME
+    return data
+
+
+@require_GET
+async def aggregated_list_all_users(request):
+    """Async aggregated_list_all_users: local users plus the cached users of every remote node."""
+    if await _authenticate(request) is None:
+        return _unauthorized()
+    local_data = await sync_to_async(_local_users)()
+    cached = await federation_async.cached_remote_authors()
+    return _json(local_data + cached.users, headers=cached.headers())
+
+
+@csrf_exempt
+@require_POST
+async def create_follow_request_inter_node(request, username):
+    """
+    Async create_follow_request_inter_node: local targets are handled in the sync thread,
+    anything else is forwarded to the user's node with the shared async client.
+    """
+    sender = await _authenticate(request)
+    if sender is None:
+        return _unauthorized()
+
+    receiver = await User.objects.filter(username=username).afirst()
+    if receiver:
+        result = await sync_to_async(local_follow_request)(sender, receiver)
+        if result is not None:
+            return _json(result[0], status=result[1])
+
+    remote_node = await sync_to_async(nodes.home_node)(username)
+    if not remote_node:
+        return _json({"error": "Remote node configuration not found."}, status=500)
+
+    try:
+        body, headers = compression.encode_json({"sender_username": sender.username}, remote_node)
+        response = await federation_async.get_client().post(
+            remote_node.endpoint(f"/create-follow-request/{username}/"),
+            content=body,
+            headers={**headers, "X-Node-Api-Key": remote_node.api_key},
+        )
+    except httpx.HTTPError as e:
+        return _json({"error": f"Exception occurred during remote call: {str(e)}"}, status=500)
+    compression.remember(remote_node, response)
+    if response.status_code == 200:
+        return _json(response.json())
+    return _json({"error": "Failed to send remote follow request."}, status=response.status_code)
@@ -0,0 +1,103 @@
+# changes.py
+#
+# Pull-based catch-up between nodes.
+# GET /federation/changes/?since=<cursor> lists this node's own posts (created, edited or
+# soft-deleted) in (updated, id) order, oldest first, with a cursor to resume from.
+# Posts made PRIVATE or DRAFT stay in the feed as stripped copies (see inbox.post_payload),
+# so a peer that pulled them while they were shared hides its copy too.
+# A node that missed pushes runs `manage.py pull_changes`, which pages through every peer
+# from the cursor it stored on the peer's Node row and hands each page to inbox.receive_posts.
+# Rows younger than SETTLE_SECONDS are held back: a transaction that commits late can carry an
+# 'updated' older than rows already handed out, and the cursor would otherwise skip it.
+
+import logging
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from myapp import inbox, node_health, node_http, nodes
+from myapp.models import Node, Post
+from myapp.pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = inbox.MAX_BATCH_SIZE
+SETTLE_SECONDS = getattr(settings, "FEDERATION_CHANGES_SETTLE", 5)
+CHANGES_PATH = "/federation/changes/"
+
+
+def local_posts():
+    """Posts written on this node, including the PRIVATE and DRAFT ones peers only get stripped."""
+    return Post.objects.filter(Q(author__home_node__isnull=True) | Q(author__home_node__in=["", nodes.current_name()]))
+
+
+def changes_since(cursor=None, limit=PAGE_SIZE, request=None):
+    """
+    One page of changes after 'cursor' (None: from the beginning).
+    Returns {"posts": [...], "next": <cursor>, "has_more": bool}; "next" is 'cursor' itself
+    when nothing changed, so callers can always store it.
+    """
+    posts = local_posts().filter(updated__lte=timezone.now() - timedelta(seconds=SETTLE_SECONDS))
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        posts = posts.filter(Q(updated__gt=timestamp) | Q(updated=timestamp, id__gt=pk))
+
+    page = list(posts.select_related("author").order_by("updated", "id")[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        "posts": [inbox.post_payload(post, request) for post in page],
+        "next": encode_cursor(page[-1].updated, page[-1].id) if page else cursor,
+        "has_more": has_more,
+    }
+
+
+def pull(node, limit=PAGE_SIZE):
+    """
+    Fetch and apply everything 'node' changed since the cursor stored on it.
+    The cursor is saved after every page, so an interrupted pull resumes where it stopped.
+    Returns the number of posts received; raises on network or HTTP errors.
+    """
+    # The registry's copy of the node may predate the last pull
+    node.changes_cursor = Node.objects.filter(pk=node.pk).values_list("changes_cursor", flat=True).first() or ""
+    received = 0
+    while True:
+        params = {"limit": limit}
+        if node.changes_cursor:
+            params["since"] = node.changes_cursor
+        started = time.monotonic()
+        try:
+            response = node_http.get(node, CHANGES_PATH, params=params)
+            response.raise_for_status()
+            page = response.json()
+        except (requests.RequestException, ValueError) as error:
+            node_health.record_failure(node, str(error))
+            raise
+        node_health.record_success(node, time.monotonic() - started)
+
+        inbox.receive_posts(inbox.batch_items(page), node)
+        received += len(page["posts"])
+        if page["next"] and page["next"] != node.changes_cursor:
+            node.changes_cursor = page["next"]
+            Node.objects.filter(pk=node.pk).update(changes_cursor=node.changes_cursor)
+        if not page["has_more"]:
+            return received
+
+
+def pull_all():
+    """pull() from every remote node whose circuit is closed. Returns {node key: posts received or None}."""
+    results = {}
+    for key, node in nodes.remote_nodes().items():
+        if node_health.is_open(node):
+            continue
+        try:
+            results[key] = pull(node)
+        except Exception as error:
+            logger.warning(f"Pulling changes from {key} failed: {error}")
+            results[key] = None
+    return results
@@ -0,0 +1,210 @@
+# compression.py
+#
+# Content-Encoding negotiation, in both directions.
+# - CompressionMiddleware compresses responses of at least MIN_SIZE bytes for clients that ask
+#   for it in Accept-Encoding: zstd and br when the optional 'zstandard' / 'brotli' packages
+#   are installed, gzip always. Streaming responses (SSE, image files) are left alone.
+# - The middleware also decodes request bodies sent with a Content-Encoding it supports, and
+#   advertises those encodings in an Accept-Encoding response header (RFC 7694).
+# - Outbound federation calls build their body with encode_json(), which compresses it only
+#   once the node has advertised support; remember() records what a node advertised.
+
+import gzip
+import io
+import json
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies are sent as they are; compressing them saves little and costs CPU
+MIN_SIZE = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml")
+
+
+class DecodeError(Exception):
+    pass
+
+
+def _gunzip(body, limit):
+    decompressor = zlib.decompressobj(wbits=31)
+    try:
+        data = decompressor.decompress(body, limit + 1)
+    except zlib.error as e:
+        raise DecodeError(str(e))
+    if len(data) > limit:
+        raise RequestDataTooBig("Decompressed request body exceeded DATA_UPLOAD_MAX_MEMORY_SIZE.")
+    if not decompressor.eof:
+        raise DecodeError("Truncated gzip body")
+    return data
+
+
+def _unzstd(body, limit):
+    try:
+        data = zstandard.ZstdDecompressor().decompress(body, max_output_size=limit + 1)
+    except zstandard.ZstdError as e:
+        raise DecodeError(str(e))
+    if len(data) > limit:
+        raise RequestDataTooBig("Decompressed request body exceeded DATA_UPLOAD_MAX_MEMORY_SIZE.")
+    return data
+
+
+def _unbrotli(body, limit):
+    decompressor = brotli.Decompressor()
+    data = b""
+    try:
+        # Feed small chunks so an oversized body is caught before it is all in memory
+        for start in range(0, len(body), 16384):
+            data += decompressor.process(body[start:start + 16384])
+            if len(data) > limit:
+                raise RequestDataTooBig("Decompressed request body exceeded DATA_UPLOAD_MAX_MEMORY_SIZE.")
+    except brotli.error as e:
+        raise DecodeError(str(e))
+    return data
+
+
+# {encoding: (compress(bytes), decompress(bytes, limit))}, most preferred first
+CODECS = {}
+if zstandard is not None:
+    CODECS["zstd"] = (lambda body: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), _unzstd)
+if brotli is not None:
+    CODECS["br"] = (lambda body: brotli.compress(body, quality=BROTLI_QUALITY), _unbrotli)
+CODECS["gzip"] = (lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), _gunzip)
+
+SUPPORTED = ", ".join(CODECS)
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose(header):
+    """The encoding to use for a peer that sent 'header' as Accept-Encoding, or None for identity."""
+    accepted = parse_accept_encoding(header or "")
+    best, best_q = None, 0.0
+    for coding in CODECS:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body, encoding):
+    return CODECS[encoding][0](body)
+
+
+def decompress(body, encoding, limit=None):
+    """Decode 'body'; raises DecodeError for bad data and RequestDataTooBig past 'limit' bytes."""
+    if encoding not in CODECS:
+        raise DecodeError(f"Unsupported Content-Encoding: {encoding}")
+    if limit is None:
+        limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE or float("inf")
+    return CODECS[encoding][1](body, limit)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Decodes compressed request bodies and compresses responses (see the module comment)."""
+
+    def process_request(self, request):
+        encoding = request.META.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if not encoding or encoding == "identity":
+            return None
+        if encoding not in CODECS:
+            return HttpResponse(status=415, headers={"Accept-Encoding": SUPPORTED})
+        try:
+            body = decompress(request.body, encoding)
+        except DecodeError:
+            return HttpResponse("Could not decode the request body.", status=400, content_type="text/plain")
+        request._body = body
+        request._stream = io.BytesIO(body)
+        request.META["CONTENT_LENGTH"] = str(len(body))
+        del request.META["HTTP_CONTENT_ENCODING"]
+        return None
+
+    def process_response(self, request, response):
+        if not response.has_header("Accept-Encoding"):
+            response.headers["Accept-Encoding"] = SUPPORTED
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            or len(response.content) < MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        response.headers["Content-Encoding"] = encoding
+        # The bytes differ per encoding, so a strong ETag would be wrong
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        return response
+
+
+# What each remote node said it can decode, by base URL. Per process; filled in by remember()
+_peer_encodings = {}
+
+
+def remember(node, response):
+    """Record the Accept-Encoding advertised in a 'response' from 'node' (requests or httpx)."""
+    advertised = response.headers.get("Accept-Encoding")
+    if isinstance(advertised, str):
+        _peer_encodings[node.base_url] = advertised
+
+
+def encode_json(payload, node):
+    """
+    (body, headers) for POSTing 'payload' to 'node' as JSON, compressed when the body is at
+    least MIN_SIZE bytes and the node has advertised an encoding we share.
+    """
+    body = json.dumps(payload).encode()
+    headers = {"Content-Type": "application/json"}
+    encoding = choose(_peer_encodings.get(node.base_url)) if len(body) >= MIN_SIZE else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def clear():
+    _peer_encodings.clear()
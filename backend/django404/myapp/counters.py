@@ -0,0 +1,56 @@
+# counters.py
+#
+# Denormalized like/comment counters on Post and Comment.
+# Counters are only ever changed with F() expressions (see the Like/Comment/CommentLike
+# signal handlers in signals.py), so concurrent toggles cannot lose updates.
+# reconcile() recomputes them from the source tables to repair any drift.
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from myapp.models import Comment, CommentLike, Like, Post
+
+# (model holding the counter, counter field, counted model, FK from counted model to holder)
+COUNTERS = [
+    (Post, "likes_count", Like, "post"),
+    (Post, "comments_count", Comment, "post"),
+    (Comment, "likes_count", CommentLike, "comment"),
+]
+
+
+def adjust(model, pk, field, delta):
+    """Atomically add 'delta' to a counter column, never going below zero."""
+    model.objects.filter(pk=pk).update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def actual_count(model, fk_name):
+    """Correlated COUNT(*) of 'model' rows pointing at the outer row through 'fk_name'."""
+    counts = (
+        model.objects
+            .filter(**{fk_name: OuterRef("pk")})
+            .order_by()
+            .values(fk_name)
+            .annotate(count=Count("*"))
+            .values("count")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def reconcile(fix=True):
+    """
+    Compare every counter with the real row count.
+    Returns {"<Model>.<field>": number of drifted rows}; repairs them unless fix=False.
+    """
+    drift = {}
+    for holder, field, counted, fk_name in COUNTERS:
+        drifted = (
+            holder.objects
+                .annotate(actual=actual_count(counted, fk_name))
+                .exclude(**{field: F("actual")})
+        )
+        drift[f"{holder.__name__}.{field}"] = drifted.count()
+        if fix and drift[f"{holder.__name__}.{field}"]:
+            holder.objects.filter(pk__in=drifted.values("pk")).update(
+                **{field: actual_count(counted, fk_name)}
+            )
+    return drift
@@ -0,0 +1,17 @@
+# etags.py
+#
+# Conditional GET for the views that send their own ETag (list_all_users, post images).
+# If-None-Match is compared tag by tag with the weak comparison of RFC 9110: a W/ prefix is
+# ignored on both sides, since CompressionMiddleware weakens the tag of every body it compresses.
+
+from django.utils.cache import parse_etags
+
+
+def _opaque(tag):
+    return tag.removeprefix("W/")
+
+
+def if_none_match(request, etag):
+    """True when the request's If-None-Match lists 'etag' (or '*'), i.e. a 304 should be sent."""
+    tags = parse_etags(request.headers.get("If-None-Match", ""))
+    return "*" in tags or any(_opaque(tag) == _opaque(etag) for tag in tags)
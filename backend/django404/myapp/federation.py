@@ -0,0 +1,260 @@
+# federation.py
+#
+# Helpers for talking to the other nodes in the node registry (myapp/nodes.py).
+# Remote calls go through the per-node pooled sessions of myapp/node_http.py and are issued
+# concurrently from a shared thread pool, bounded by an overall deadline, so one slow node cannot hold a worker
+# for (number of nodes x timeout) seconds.
+# Nodes whose circuit is open (see myapp/node_health.py) are skipped; every other call's outcome
+# is recorded as node health.
+# Remote user lists are cached locally in RemoteAuthor and refreshed with conditional GETs.
+
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from myapp import node_health, node_http
+from myapp import nodes as node_registry
+from myapp.models import RemoteAuthor, RemoteAuthorSync
+
+logger = logging.getLogger(__name__)
+
+# Overall time budget for one fan-out across every node, in seconds
+FANOUT_DEADLINE = getattr(settings, "FEDERATION_FANOUT_DEADLINE", 6)
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="federation")
+
+
+def remote_nodes():
+    """{key: Node} of every active node except this one."""
+    return node_registry.remote_nodes()
+
+
+def peer_node(identifier=None):
+    """
+    The active remote node for a name, URL or host - by default settings.DEFAULT_PEER_NODE,
+    the node whose users the single-node listings show. None if there is no such node.
+    """
+    node = node_registry.resolve(identifier or getattr(settings, "DEFAULT_PEER_NODE", None))
+    if node is None or not node.is_active or node.name == node_registry.current_name():
+        return None
+    return node
+
+
+def etag_for(data):
+    """Strong ETag for a JSON-serializable response body."""
+    body = json.dumps(data, sort_keys=True, default=str).encode()
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _get_json(node, path):
+    response = node_http.get(node, path)
+    response.raise_for_status()
+    return response.json()
+
+
+class FanOutResult:
+    """
+    Outcome of fan_out():
+    - 'data' maps node key -> return value for every node that answered in time
+    - 'timed_out' lists nodes that did not answer before the deadline
+    - 'failed' lists nodes that answered with an error or could not be reached
+    - 'skipped' lists nodes that were not called because their circuit is open
+    """
+    def __init__(self):
+        self.data = {}
+        self.timed_out = []
+        self.failed = []
+        self.skipped = []
+        self.errors = {}
+
+    def status_headers(self):
+        """Response headers describing which nodes are missing from a partial result."""
+        headers = {}
+        if self.timed_out:
+            headers["X-Nodes-Timed-Out"] = ",".join(sorted(self.timed_out))
+        if self.failed:
+            headers["X-Nodes-Failed"] = ",".join(sorted(self.failed))
+        if self.skipped:
+            headers["X-Nodes-Skipped"] = ",".join(sorted(self.skipped))
+        return headers
+
+    def record_health(self, called, latencies):
+        """Record every called node's outcome (see myapp/node_health.py)."""
+        for key in self.data:
+            node_health.record_success(called[key], latencies.get(key))
+        for key in self.timed_out:
+            node_health.record_failure(called[key], "timed out")
+        for key in self.failed:
+            node_health.record_failure(called[key], self.errors.get(key, ""))
+
+
+def fan_out(func, nodes=None, deadline=None):
+    """
+    Call func(node_key, node) for every node ({key: Node}) concurrently and wait at most
+    'deadline' seconds overall. Nodes still in flight at the deadline are reported as timed out,
+    nodes with an open circuit are skipped.
+    """
+    if nodes is None:
+        nodes = remote_nodes()
+    if deadline is None:
+        deadline = FANOUT_DEADLINE
+
+    result = FanOutResult()
+    available, result.skipped = node_health.split_available(nodes)
+    latencies = {}
+
+    def timed(key, node):
+        started = time.monotonic()
+        value = func(key, node)
+        latencies[key] = time.monotonic() - started
+        return value
+
+    futures = {_executor.submit(timed, key, node): key for key, node in available.items()}
+    done, not_done = wait(futures, timeout=deadline)
+
+    for future in done:
+        key = futures[future]
+        try:
+            result.data[key] = future.result()
+        except requests.Timeout:
+            result.timed_out.append(key)
+        except Exception as e:
+            logger.warning(f"Call to {key} failed: {e}")
+            result.failed.append(key)
+            result.errors[key] = str(e) or type(e).__name__
+
+    for future in not_done:
+        # Leave the request running in the pool; its result is simply ignored.
+        result.timed_out.append(futures[future])
+
+    result.record_health(nodes, latencies)
+    return result
+
+
+def fan_out_get(path, nodes=None, deadline=None):
+    """GET 'path' from every node concurrently (see fan_out)."""
+    return fan_out(lambda key, node: _get_json(node, path), nodes=nodes, deadline=deadline)
+
+
+# ---------------------------------------------------------------------------
+# Remote author directory (RemoteAuthor cache)
+# ---------------------------------------------------------------------------
+
+# Cached lists older than this many seconds are reported as stale
+REMOTE_AUTHOR_MAX_AGE = getattr(settings, "REMOTE_AUTHOR_MAX_AGE", 300)
+
+
+def _fetch_node_authors(node, sync):
+    """
+    Conditionally GET one node's user list. Runs in the fan-out pool, so it does no DB work.
+    Returns None when the node answered 304 Not Modified, otherwise (users, etag, last_modified).
+    """
+    headers = {}
+    if sync and sync.etag:
+        headers["If-None-Match"] = sync.etag
+    if sync and sync.last_modified:
+        headers["If-Modified-Since"] = sync.last_modified
+
+    response = node_http.get(node, "/list-all-users/", headers=headers)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    users = [user for user in response.json() if user.get("username")]
+    return users, response.headers.get("ETag", ""), response.headers.get("Last-Modified", "")
+
+
+def _store_node_authors(key, fetched):
+    """Write one node's fetched list into RemoteAuthor. Returns "not-modified" or the number of users."""
+    now = timezone.now()
+    if fetched is None:
+        RemoteAuthorSync.objects.filter(node=key).update(refreshed_at=now)
+        return "not-modified"
+
+    users, etag, last_modified = fetched
+    with transaction.atomic():
+        RemoteAuthor.objects.filter(node=key).exclude(username__in=[user["username"] for user in users]).delete()
+        RemoteAuthor.objects.bulk_create(
+            [RemoteAuthor(node=key, username=user["username"], data=user, fetched_at=now) for user in users],
+            update_conflicts=True,
+            unique_fields=["node", "username"],
+            update_fields=["data", "fetched_at"],
+        )
+        RemoteAuthorSync.objects.update_or_create(
+            node=key,
+            defaults={"etag": etag, "last_modified": last_modified, "refreshed_at": now},
+        )
+    return len(users)
+
+
+def refresh_remote_authors(nodes=None, deadline=None):
+    """
+    Refresh the RemoteAuthor cache from every remote node.
+    The HTTP calls run concurrently; the results are written from the calling thread.
+    """
+    if nodes is None:
+        nodes = remote_nodes()
+    syncs = {sync.node: sync for sync in RemoteAuthorSync.objects.filter(node__in=nodes)}
+
+    result = fan_out(lambda key, node: _fetch_node_authors(node, syncs.get(key)), nodes=nodes, deadline=deadline)
+    for key, fetched in result.data.items():
+        result.data[key] = _store_node_authors(key, fetched)
+    return result
+
+
+class CachedAuthors:
+    """
+    Users served from the RemoteAuthor cache:
+    - 'users' is the list of user dicts, each tagged with 'remote_node'
+    - 'refreshed_at' is when the oldest included node list was last confirmed fresh
+    - 'fan_out' is the FanOutResult of any inline refresh (for nodes never cached before)
+    """
+    def __init__(self, users, refreshed_at, fan_out_result):
+        self.users = users
+        self.refreshed_at = refreshed_at
+        self.fan_out = fan_out_result
+
+    def is_stale(self):
+        if self.refreshed_at is None:
+            return True
+        return (timezone.now() - self.refreshed_at).total_seconds() > REMOTE_AUTHOR_MAX_AGE
+
+    def headers(self):
+        """Staleness indicator plus the names of nodes an inline refresh could not reach."""
+        headers = self.fan_out.status_headers()
+        headers["X-Cache-Stale"] = "true" if self.is_stale() else "false"
+        if self.refreshed_at is not None:
+            headers["X-Cache-Refreshed-At"] = self.refreshed_at.isoformat()
+        return headers
+
+
+def cached_remote_authors(nodes=None):
+    """
+    Remote users for 'nodes' (default: every remote node) from the RemoteAuthor cache.
+    Nodes that have never been cached are refreshed inline once, within the fan-out deadline;
+    everything else is left to the refresh_remote_authors command.
+    """
+    if nodes is None:
+        nodes = remote_nodes()
+
+    cached_nodes = set(RemoteAuthorSync.objects.filter(node__in=nodes).values_list("node", flat=True))
+    missing = {key: node for key, node in nodes.items() if key not in cached_nodes}
+    fan_out_result = refresh_remote_authors(missing) if missing else FanOutResult()
+    return read_cached_authors(nodes, fan_out_result)
+
+
+def read_cached_authors(nodes, fan_out_result):
+    """CachedAuthors for 'nodes' straight from RemoteAuthor, without any remote call."""
+    users = []
+    for node_key, data in RemoteAuthor.objects.filter(node__in=nodes).order_by("node", "username").values_list("node", "data"):
+        users.append({**data, "remote_node": node_key})
+
+    refreshed_at = RemoteAuthorSync.objects.filter(node__in=nodes).aggregate(oldest=Min("refreshed_at"))["oldest"]
+    return CachedAuthors(users, refreshed_at, fan_out_result)
@@ -0,0 +1,135 @@
+# federation_async.py
+#
+# Async counterparts of the myapp/federation.py helpers, for the async views in
+# myapp/async_views.py. Remote calls go through one httpx.AsyncClient per event loop, so
+# under an ASGI server every request in a worker shares its keep-alive connection pool, and
+# waiting on a slow node costs a suspended coroutine instead of a thread.
+# Database work still runs in Django's sync thread via sync_to_async.
+
+import asyncio
+import logging
+import time
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from myapp import compression, federation, node_health, node_http
+from myapp.models import RemoteAuthorSync
+
+logger = logging.getLogger(__name__)
+
+# Connections kept per worker across all nodes, and how many of them may sit idle
+MAX_CONNECTIONS = getattr(settings, "FEDERATION_ASYNC_MAX_CONNECTIONS", 200)
+MAX_KEEPALIVE = getattr(settings, "FEDERATION_ASYNC_MAX_KEEPALIVE", 50)
+
+_clients = {}
+
+
+def get_client():
+    """The shared AsyncClient of the running event loop (clients cannot be shared across loops)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        # Drop clients of loops that have since been closed
+        for old_loop in [old_loop for old_loop in _clients if old_loop.is_closed()]:
+            del _clients[old_loop]
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(node_http.READ_TIMEOUT, connect=node_http.CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+        )
+    return client
+
+
+async def fan_out(func, nodes=None, deadline=None):
+    """
+    Await func(node_key, node_config) for every node concurrently, for at most 'deadline'
+    seconds overall; calls still pending then are cancelled and reported as timed out.
+    Nodes with an open circuit are skipped, and every outcome is recorded as node health.
+    Returns a federation.FanOutResult.
+    """
+    if nodes is None:
+        nodes = await sync_to_async(federation.remote_nodes)()
+    if deadline is None:
+        deadline = federation.FANOUT_DEADLINE
+
+    result = federation.FanOutResult()
+    available, result.skipped = await sync_to_async(node_health.split_available)(nodes)
+    if not available:
+        return result
+    latencies = {}
+
+    async def timed(key, node):
+        started = time.monotonic()
+        value = await func(key, node)
+        latencies[key] = time.monotonic() - started
+        return value
+
+    tasks = {asyncio.ensure_future(timed(key, node)): key for key, node in available.items()}
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+    for task in done:
+        key = tasks[task]
+        try:
+            result.data[key] = task.result()
+        except httpx.TimeoutException:
+            result.timed_out.append(key)
+        except Exception as e:
+            logger.warning(f"Call to {key} failed: {e}")
+            result.failed.append(key)
+            result.errors[key] = str(e) or type(e).__name__
+
+    for task in pending:
+        task.cancel()
+        result.timed_out.append(tasks[task])
+
+    await sync_to_async(result.record_health)(nodes, latencies)
+    return result
+
+
+async def _fetch_node_authors(node, sync):
+    """Async version of federation._fetch_node_authors."""
+    headers = {"X-Node-Api-Key": node.api_key}
+    if sync and sync.etag:
+        headers["If-None-Match"] = sync.etag
+    if sync and sync.last_modified:
+        headers["If-Modified-Since"] = sync.last_modified
+
+    response = await get_client().get(node.endpoint("/list-all-users/"), headers=headers)
+    compression.remember(node, response)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    users = [user for user in response.json() if user.get("username")]
+    return users, response.headers.get("ETag", ""), response.headers.get("Last-Modified", "")
+
+
+async def refresh_remote_authors(nodes=None, deadline=None):
+    """Async version of federation.refresh_remote_authors."""
+    if nodes is None:
+        nodes = await sync_to_async(federation.remote_nodes)()
+    syncs = await sync_to_async(
+        lambda: {sync.node: sync for sync in RemoteAuthorSync.objects.filter(node__in=nodes)}
+    )()
+
+    result = await fan_out(lambda key, node: _fetch_node_authors(node, syncs.get(key)), nodes=nodes, deadline=deadline)
+    for key, fetched in result.data.items():
+        result.data[key] = await sync_to_async(federation._store_node_authors)(key, fetched)
+    return result
+
+
+async def cached_remote_authors(nodes=None):
+    """
+    Async version of federation.cached_remote_authors: nodes never cached before are
+    fetched inline with the async client, the rest is read from RemoteAuthor.
+    """
+    if nodes is None:
+        nodes = await sync_to_async(federation.remote_nodes)()
+
+    cached_nodes = await sync_to_async(
+        lambda: set(RemoteAuthorSync.objects.filter(node__in=nodes).values_list("node", flat=True))
+    )()
+    missing = {key: node for key, node in nodes.items() if key not in cached_nodes}
+    fan_out_result = await refresh_remote_authors(missing) if missing else federation.FanOutResult()
+
+    return await sync_to_async(federation.read_cached_authors)(nodes, fan_out_result)
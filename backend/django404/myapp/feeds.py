@@ -0,0 +1,33 @@
+# feeds.py
+#
+# Queryset builders for anything serialized with PostSerializer/CommentSerializer in bulk.
+# They load everything the serializers read (author, nested comments) up front, so serializing
+# a page costs a constant number of queries instead of several per row.
+# Like/comment counts are plain columns (see myapp/counters.py) and need no extra work here.
+
+from django.db.models import Prefetch
+
+from myapp.models import Comment, Post
+
+
+def with_comment_data(comments):
+    """Comments with their author loaded."""
+    return comments.select_related("author")
+
+
+def with_feed_data(posts):
+    """
+    Posts with everything PostSerializer needs:
+    - author (for author_username)
+    - comments prefetched with their authors
+    """
+    return (
+        posts
+            .select_related("author")
+            .prefetch_related(Prefetch("comments", queryset=with_comment_data(Comment.objects.all())))
+    )
+
+
+def feed_posts():
+    """Shorthand for with_feed_data(Post.objects.all())."""
+    return with_feed_data(Post.objects.all())
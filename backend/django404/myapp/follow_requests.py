@@ -0,0 +1,177 @@
+# follow_requests.py
+#
+# Batched follow requests between nodes.
+# - create_follow_requests() is the receiving side: it validates a whole batch of
+#   (sender, target) pairs with a fixed number of queries and inserts the Notif rows with one
+#   bulk_create, in a single transaction.
+# - FollowRequestCoalescer is the sending side: it collects outgoing requests and sends one
+#   POST per destination node instead of one per request.
+
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from myapp import federation, node_http, notifications
+from myapp import nodes as node_registry
+from myapp.models import Following, Notif
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+BATCH_PATH = "/follow-requests/batch/"
+# Largest batch the endpoint accepts, and the chunk size the coalescer sends
+MAX_BATCH_SIZE = 500
+
+# Per-item result statuses
+CREATED = "created"
+DUPLICATE = "duplicate"
+SELF = "self"
+ALREADY_FOLLOWING = "already_following"
+UNKNOWN_TARGET = "unknown_target"
+INVALID = "invalid"
+
+
+def create_follow_requests(items, sender_node=None):
+    """
+    Create FOLLOW_REQUEST notifications for every {"sender_username", "target_username"} in 'items'.
+    Targets must be local users; senders that do not exist yet get a stub user (as in
+    remote_create_follow_request), with home_node set to 'sender_node'.
+    Returns one {"sender_username", "target_username", "status"} dict per item, in order.
+    """
+    pairs = [_pair(item) for item in items]
+
+    with transaction.atomic():
+        valid = [pair for pair in pairs if _is_valid(pair)]
+        targets = {user.username: user for user in User.objects.filter(username__in={t for _, t in valid})}
+        senders = get_or_create_remote_users({s for s, t in valid if t in targets}, sender_node)
+
+        sender_ids = [user.id for user in senders.values()]
+        target_ids = [user.id for user in targets.values()]
+        # Both lookups may return a few pairs nobody asked for; they are simply never looked up
+        existing = set(
+            Notif.objects
+                .filter(notif_type="FOLLOW_REQUEST", sender_id__in=sender_ids, receiver_id__in=target_ids)
+                .values_list("sender_id", "receiver_id")
+        )
+        following = set(
+            Following.objects
+                .filter(follower_id__in=sender_ids, followee_id__in=target_ids)
+                .values_list("follower_id", "followee_id")
+        )
+
+        results = []
+        new_notifs = []
+        for sender_name, target_name in pairs:
+            result = {"sender_username": sender_name, "target_username": target_name}
+            results.append(result)
+            if not _is_valid((sender_name, target_name)):
+                result["status"] = INVALID
+                continue
+            if target_name not in targets:
+                result["status"] = UNKNOWN_TARGET
+                continue
+            key = (senders[sender_name].id, targets[target_name].id)
+            if key[0] == key[1]:
+                result["status"] = SELF
+            elif key in following:
+                result["status"] = ALREADY_FOLLOWING
+            elif key in existing:
+                result["status"] = DUPLICATE
+            else:
+                # Also catches the same pair appearing twice in one batch
+                existing.add(key)
+                new_notifs.append(Notif(sender_id=key[0], receiver_id=key[1], notif_type="FOLLOW_REQUEST"))
+                result["status"] = CREATED
+
+        Notif.objects.bulk_create(new_notifs)
+        # bulk_create sends no signals
+        notifications.invalidate(*{notif.receiver_id for notif in new_notifs})
+        usernames = {user.id: name for name, user in senders.items()}
+        for notif in new_notifs:
+            notifications.push_new(notif, sender_username=usernames[notif.sender_id])
+    return results
+
+
+def _pair(item):
+    if not isinstance(item, dict):
+        return None, None
+    return item.get("sender_username"), item.get("target_username")
+
+
+def _is_valid(pair):
+    return all(isinstance(name, str) and name for name in pair)
+
+
+def get_or_create_remote_users(usernames, sender_node):
+    """{username: User} for 'usernames', creating stub users (home_node 'sender_node') for unknown ones."""
+    senders = {user.username: user for user in User.objects.filter(username__in=usernames)}
+    missing = usernames - senders.keys()
+    if missing:
+        # Stub records for remote users; the placeholder email keeps the unique constraint happy
+        User.objects.bulk_create(
+            [User(username=name, email=f"{name}@{sender_node or 'remote'}.invalid", home_node=sender_node) for name in missing],
+            ignore_conflicts=True,
+        )
+        senders.update({user.username: user for user in User.objects.filter(username__in=missing)})
+    return senders
+
+
+class FollowRequestCoalescer:
+    """
+    Collects outgoing follow requests and sends them to each destination node in batches.
+
+        coalescer = FollowRequestCoalescer()
+        for target in targets:
+            coalescer.add(request.user.username, target, "node2")
+        results = coalescer.flush()
+
+    Nodes are given by name, URL or host and looked up in the node registry (myapp/nodes.py),
+    unless a {key: Node} dict is passed in.
+    flush() returns {node_key: [per-item result, ...]}; every item sent to a node that
+    could not be reached is reported with status "failed".
+    """
+    def __init__(self, nodes=None):
+        self.nodes = nodes
+        self.pending = {}
+
+    def _node(self, key):
+        if self.nodes is not None:
+            return self.nodes.get(key)
+        node = node_registry.resolve(key)
+        return node if node is not None and node.is_active else None
+
+    def add(self, sender_username, target_username, node_key):
+        self.pending.setdefault(node_key, []).append(
+            {"sender_username": sender_username, "target_username": target_username}
+        )
+
+    def __len__(self):
+        return sum(len(items) for items in self.pending.values())
+
+    def flush(self, deadline=None):
+        pending, self.pending = self.pending, {}
+        nodes = {key: self._node(key) for key in pending}
+        unknown = [key for key, node in nodes.items() if node is None]
+        for key in unknown:
+            logger.error(f"No configuration found for node: {key}")
+            del nodes[key]
+
+        def send(key, node):
+            results = []
+            items = pending[key]
+            for start in range(0, len(items), MAX_BATCH_SIZE):
+                response = node_http.post(
+                    node,
+                    BATCH_PATH,
+                    json={"node": node_registry.current_name(), "items": items[start:start + MAX_BATCH_SIZE]},
+                )
+                response.raise_for_status()
+                results.extend(response.json()["results"])
+            return results
+
+        outcome = federation.fan_out(send, nodes=nodes, deadline=deadline)
+        results = dict(outcome.data)
+        for key in [*outcome.timed_out, *outcome.failed, *outcome.skipped, *unknown]:
+            results[key] = [{**item, "status": "failed"} for item in pending[key]]
+        return results
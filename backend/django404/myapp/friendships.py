@@ -0,0 +1,42 @@
+# friendships.py
+#
+# Friendship is a mutual follow: two Following rows, one in each direction.
+# Both rows carry Following.mutual, kept in sync by refresh_mutual() from the Following
+# signals, so friend lookups are a single indexed filter instead of a self-join.
+# Every view asks this module; nothing else writes 'mutual'.
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from myapp.models import Following
+
+User = get_user_model()
+
+
+def refresh_mutual(user_a_id, user_b_id):
+    """Recompute 'mutual' on the Following rows between two users (after one was added or removed)."""
+    pair = Following.objects.filter(
+        Q(follower_id=user_a_id, followee_id=user_b_id) | Q(follower_id=user_b_id, followee_id=user_a_id)
+    )
+    mutual = pair.count() == 2
+    pair.exclude(mutual=mutual).update(mutual=mutual)
+
+
+def friend_follows(user):
+    """The user's outgoing Following rows that are friendships."""
+    return Following.objects.filter(follower_id=user.id, mutual=True)
+
+
+def friends_of(user):
+    """Users who are friends with 'user'."""
+    return User.objects.filter(id__in=friend_follows(user).values("followee_id"))
+
+
+def are_friends(user_a, user_b):
+    return friend_follows(user_a).filter(followee_id=user_b.id).exists()
+
+
+def befriend(user_a, user_b):
+    """Make two users friends by creating whichever follow is missing."""
+    Following.objects.get_or_create(follower=user_a, followee=user_b)
+    Following.objects.get_or_create(follower=user_b, followee=user_a)
@@ -0,0 +1,242 @@
+# inbox.py
+#
+# Receiving posts from other nodes.
+# receive_posts() takes a whole batch from one authenticated node: every item is validated,
+# the remote authors are resolved (stub users are created in bulk), and all posts are
+# upserted with a single bulk_create(update_conflicts=True) inside one transaction.
+# Each item gets its own status, so one bad post does not fail the batch.
+# Copies we already have (same version, content hash and image) and older versions are
+# skipped before anything is written, so resends cost one primary-key lookup. A copy whose
+# only difference is an image we failed to fetch earlier just retries the download.
+# Batches arrive as a JSON array ({"posts": [...]} also works) or as NDJSON, one post per line.
+# Images are not fetched while the sender waits: once the batch commits, the posts that still
+# lack their image are handed to a small thread pool. A fetch lost to a restart is retried the
+# next time the post arrives (a push or pull_changes), since its image is still missing then.
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from myapp import media, node_http, timeline
+from myapp.follow_requests import get_or_create_remote_users
+from myapp.models import Post
+from myapp.serializers import InboxPostSerializer
+
+logger = logging.getLogger(__name__)
+
+# Largest batch the inbox accepts
+MAX_BATCH_SIZE = 500
+# Threads downloading images of received posts
+IMAGE_FETCH_WORKERS = getattr(settings, "FEDERATION_IMAGE_FETCH_WORKERS", 4)
+
+# Per-item result statuses
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"  # Same version, content and image as the stored copy; nothing written
+STALE = "stale"  # Older version than the stored copy; nothing written
+DUPLICATE = "duplicate"  # The same post id appears again in the batch; the newest version (or last copy) wins
+CONFLICT = "conflict"  # The post or its author belongs to another node
+INVALID = "invalid"
+
+# Visibilities whose title, content and image never leave this node (see post_payload)
+RESTRICTED_VISIBILITIES = ("PRIVATE", "DRAFT")
+
+# Fields a later delivery of the same post may change
+UPSERT_FIELDS = ["title", "content", "content_html", "visibility", "deleted_at", "version", "content_hash", "updated"]
+
+
+class NDJSONParser(BaseParser):
+    """Newline-delimited JSON: one post per line. Lines that are not JSON become None (reported invalid)."""
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        items = []
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+        return items
+
+
+def batch_items(data):
+    """The list of posts in a parsed request body."""
+    if isinstance(data, dict):
+        data = data.get("posts")
+    if not isinstance(data, list):
+        raise ParseError("Expected a list of posts, {\"posts\": [...]}, or NDJSON.")
+    return data
+
+
+def post_payload(post, request=None):
+    """
+    What this node sends for 'post' (the inverse of InboxPostSerializer).
+    With a 'request', live posts with an image also carry the URL to fetch it by hash.
+    PRIVATE and DRAFT posts are sent without title, content or image, so a node holding an
+    earlier copy learns to hide it without learning what it now says.
+    """
+    if post.visibility in RESTRICTED_VISIBILITIES:
+        post = Post(id=post.id, author=post.author, visibility=post.visibility, deleted_at=post.deleted_at, version=post.version)
+    payload = {
+        "id": str(post.id),
+        "author_username": post.author.username,
+        "title": post.title,
+        "content": post.content,
+        "visibility": post.visibility,
+        "deleted_at": post.deleted_at.isoformat() if post.deleted_at else None,
+        "image_hash": post.image_hash,
+        "version": post.version,
+        "content_hash": post.compute_content_hash(),
+    }
+    if request is not None and post.image_hash and not post.is_deleted():
+        payload["image_url"] = request.build_absolute_uri(reverse("post_image_by_hash", args=[post.image_hash]))
+    return payload
+
+
+def receive_posts(items, node):
+    """
+    Validate and upsert the posts in 'items', sent by 'node'.
+    Returns one {"id", "status"} dict per item, in order (plus "errors" for invalid items).
+    """
+    results = [{"id": item.get("id") if isinstance(item, dict) else None} for item in items]
+    valid = {}
+    for index, item in enumerate(items):
+        serializer = InboxPostSerializer(data=item if isinstance(item, dict) else {})
+        if not serializer.is_valid():
+            results[index].update(status=INVALID, errors=serializer.errors)
+            continue
+        data = serializer.validated_data
+        if data["id"] in valid:
+            earlier_index, earlier = valid[data["id"]]
+            if earlier["version"] > data["version"]:
+                results[index]["status"] = DUPLICATE
+                continue
+            results[earlier_index]["status"] = DUPLICATE
+        valid[data["id"]] = (index, data)
+
+    with transaction.atomic():
+        authors = get_or_create_remote_users({data["author_username"] for _, data in valid.values()}, node.key)
+        existing = {
+            row[0]: row[1:]
+            for row in (
+                Post.objects
+                    .select_for_update()  # A concurrent batch must not slip an older version in between
+                    .filter(id__in=valid)
+                    .values_list("id", "author_id", "image_hash", "version", "content_hash")
+            )
+        }
+
+        posts = []
+        missing_images = []
+        for post_id, (index, data) in valid.items():
+            author = authors[data["author_username"]]
+            author_id, image_hash, version, content_hash = existing.get(post_id, (author.id, "", -1, ""))
+            if author.home_node != node.key or author_id != author.id:
+                results[index]["status"] = CONFLICT
+                continue
+            if data["version"] < version:
+                results[index]["status"] = STALE
+                continue
+            if data["version"] == version and data["content_hash"] == content_hash:
+                if data["image_hash"] in ("", image_hash):
+                    results[index]["status"] = UNCHANGED
+                else:
+                    # Only the image is missing (e.g. an earlier download failed); keep the row as it is
+                    results[index]["status"] = UPDATED
+                    missing_images.append(post_id)
+                continue
+            post = Post(
+                id=post_id,
+                author=author,
+                title=data["title"],
+                content=data["content"],
+                visibility=data["visibility"],
+                deleted_at=data["deleted_at"],
+                version=data["version"],
+                content_hash=data["content_hash"],
+                image_hash=image_hash,  # Not written by the upsert; lets attach_remote_image skip known images
+            )
+            post.render_content_html()
+            posts.append(post)
+            results[index]["status"] = UPDATED if post_id in existing else CREATED
+
+        Post.objects.bulk_create(
+            posts,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=UPSERT_FIELDS,
+        )
+        # bulk_create sends no signals, so do what post_saved would
+        for post in posts:
+            timeline.fan_out_post(post)
+
+    pending = [
+        (post.id, valid[post.id][1]) for post in posts if valid[post.id][1]["image_hash"] not in ("", post.image_hash)
+    ]
+    pending += [(post_id, valid[post_id][1]) for post_id in missing_images]
+    if pending:
+        transaction.on_commit(lambda: fetch_images_later(pending, node))
+    return results
+
+
+_image_executor = ThreadPoolExecutor(max_workers=IMAGE_FETCH_WORKERS, thread_name_prefix="inbox-images")
+
+
+def fetch_images_later(pending, node):
+    """Run fetch_images() on the image threads; returns right away."""
+    def run():
+        try:
+            fetch_images(pending, node)
+        finally:
+            connection.close()  # The thread's own connection; nothing else would close it
+
+    _image_executor.submit(run)
+
+
+def fetch_images(pending, node):
+    """attach_remote_image() for each (post id, item) in 'pending'; failures are logged, not raised."""
+    posts = Post.objects.in_bulk([post_id for post_id, _ in pending])
+    for post_id, data in pending:
+        if post_id not in posts:
+            continue
+        try:
+            attach_remote_image(posts[post_id], data, node)
+        except Exception:
+            logger.exception(f"Attaching image {data['image_hash']} to post {post_id} failed")
+
+
+def attach_remote_image(post, data, node):
+    """
+    Give a received post the image referenced by data['image_hash'].
+    Images we already have (from any post) are reused; others are downloaded once and verified.
+    The image is always fetched from the sending node's own /post-images/sha256/<hash>/ endpoint;
+    data['image_url'] is ignored, as following it would send our credentials wherever a peer says.
+    """
+    image_hash = data.get('image_hash')
+    if not image_hash or post.image_hash == image_hash:
+        return
+    existing = Post.objects.filter(image_hash=image_hash).exclude(id=post.id).only('image').first()
+    if existing:
+        post.image.name = existing.image.name
+        post.image_hash = image_hash
+        post._hashed_image = post.image.name
+        post.save(update_fields=['image', 'image_hash'])
+        return
+    auth = (node.username, node.password) if node.username else None
+    url = node.endpoint(reverse("post_image_by_hash", args=[image_hash]))
+    file = media.download_image(url, image_hash, session=node_http.session_for(node), auth=auth)
+    if file is None:
+        logger.warning(f"Could not fetch image {image_hash} for post {post.id} from node {node.id}")
+        return
+    with file:
+        post.image.save(file.name, file, save=False)
+    post.save(update_fields=['image', 'image_hash'])
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued federation messages (OutboxItem rows) to remote nodes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running as a worker, polling every --interval seconds when the queue is empty.",
+        )
+        parser.add_argument("--interval", type=float, default=2)
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        while True:
+            attempted = outbox.drain_once(limit=options["batch_size"])
+            if attempted:
+                self.stdout.write(f"Attempted {attempted} deliveries.")
+            if not options["loop"]:
+                break
+            if not attempted:
+                time.sleep(options["interval"])
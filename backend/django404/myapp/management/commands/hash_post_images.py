@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from myapp.media import hash_file
+from myapp.models import Post
+
+
+class Command(BaseCommand):
+    help = "Backfill Post.image_hash for posts whose image has not been hashed yet."
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="").exclude(image__isnull=True).filter(image_hash="").only("id", "image")
+
+        hashed = missing = 0
+        for post in posts.iterator():
+            try:
+                image_hash = hash_file(post.image)
+            except FileNotFoundError:
+                missing += 1
+                continue
+            # update() skips save(), so 'updated' and the timeline are left alone
+            Post.objects.filter(id=post.id).update(image_hash=image_hash)
+            hashed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Hashed {hashed} post images ({missing} files missing)."))
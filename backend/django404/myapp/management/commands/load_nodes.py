@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapp.models import Node
+
+
+class Command(BaseCommand):
+    help = "Create or update Node rows for the peers listed in settings.NODE_CONFIG."
+
+    def handle(self, *args, **options):
+        for name, config in getattr(settings, "NODE_CONFIG", {}).items():
+            node = Node.objects.filter(name=name).first() or Node.objects.filter(base_url=config["url"]).first()
+            if node is None:
+                node = Node(name=name)
+            node.name = name
+            node.base_url = config["url"]
+            node.api_key = config.get("api_key") or ""
+            node.save()
+            self.stdout.write(f"{name}: {node.base_url}")
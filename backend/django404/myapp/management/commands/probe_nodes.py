@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp import node_health
+
+
+class Command(BaseCommand):
+    help = "Probe remote nodes whose circuit is open and close the circuit of those that answer."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running as a worker, checking for due probes every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=5)
+
+    def handle(self, *args, **options):
+        while True:
+            for url, answered in node_health.probe_due().items():
+                self.stdout.write(f"{url}: {'up, circuit closed' if answered else 'still down'}")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import changes, nodes
+
+
+class Command(BaseCommand):
+    help = "Catch up on posts changed on remote nodes by pulling their /federation/changes/ feed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--node", help="Only pull from this node (name or URL).")
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running as a worker, pulling again every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            if options["node"]:
+                node = nodes.resolve(options["node"])
+                if node is None:
+                    raise CommandError(f"Unknown node: {options['node']}")
+                results = {node.key: changes.pull(node)}
+            else:
+                results = changes.pull_all()
+            for key, received in results.items():
+                self.stdout.write(f"{key}: {'failed' if received is None else f'{received} posts'}")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
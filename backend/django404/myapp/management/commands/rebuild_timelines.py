@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from myapp import timeline
+from myapp.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's materialized stream (TimelineEntry rows) from Post and Following."
+
+    def handle(self, *args, **options):
+        timeline.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {TimelineEntry.objects.count()} timeline entries."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from myapp import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the like/comment counters on Post and Comment and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many rows have drifted.",
+        )
+
+    def handle(self, *args, **options):
+        drift = counters.reconcile(fix=not options["dry_run"])
+        for counter, rows in drift.items():
+            self.stdout.write(f"{counter}: {rows} drifted rows")
+        if options["dry_run"]:
+            self.stdout.write("Dry run, nothing was changed.")
+        else:
+            self.stdout.write(self.style.SUCCESS("Counters reconciled."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp import federation
+
+
+class Command(BaseCommand):
+    help = "Refresh the RemoteAuthor cache from every remote node's /list-all-users/ endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and refresh every --interval seconds (background worker mode).",
+        )
+        parser.add_argument("--interval", type=int, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            result = federation.refresh_remote_authors()
+            for node, outcome in sorted(result.data.items()):
+                self.stdout.write(f"{node}: {outcome}")
+            for node in result.timed_out:
+                self.stdout.write(self.style.WARNING(f"{node}: timed out"))
+            for node in result.failed:
+                self.stdout.write(self.style.WARNING(f"{node}: failed"))
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
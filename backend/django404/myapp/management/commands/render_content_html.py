@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from myapp.models import Post, render_markdown
+
+
+class Command(BaseCommand):
+    help = "Backfill Post.content_html for posts whose markdown has not been rendered yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render every post, e.g. after changing the markdown settings.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only("id", "content", "content_html").order_by("id")
+        if not options["all"]:
+            posts = posts.filter(content_html__isnull=True)
+
+        batch = []
+        rendered = 0
+        for post in posts.iterator(chunk_size=options["batch_size"]):
+            post.content_html = render_markdown(post.content)
+            batch.append(post)
+            if len(batch) >= options["batch_size"]:
+                # bulk_update() skips save(), so 'updated' and the timeline are left alone
+                Post.objects.bulk_update(batch, ["content_html"])
+                rendered += len(batch)
+                batch = []
+        if batch:
+            Post.objects.bulk_update(batch, ["content_html"])
+            rendered += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered content_html for {rendered} posts."))
@@ -0,0 +1,167 @@
+# media.py
+#
+# Content-addressed post images for federation.
+# Every post image is identified by the SHA-256 of its bytes (Post.image_hash). Outbound post
+# payloads carry only that hash and a URL of the /post-images/sha256/<hash>/ endpoint, and remote
+# nodes fetch each image at most once, instead of receiving it base64-inlined per node.
+
+import hashlib
+import mimetypes
+import re
+import tempfile
+
+import requests
+from django.core.files import File
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from PIL import Image
+
+from myapp import etags
+
+CHUNK_SIZE = 64 * 1024
+# Images larger than this are not downloaded from remote nodes
+MAX_REMOTE_IMAGE_SIZE = 20 * 1024 * 1024
+
+_range_re = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def hash_file(file):
+    """SHA-256 hex digest of a (Field)File, read in chunks so large images never sit in memory."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single 'bytes=' range, None to ignore the header, or 'invalid'."""
+    match = _range_re.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None  # Multiple ranges or garbage: serve the whole file
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return "invalid"
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
+
+
+class _RangeFileWrapper:
+    """Iterates over bytes [start, end] of an open file in chunks."""
+    def __init__(self, file, start, end):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = end - start + 1
+
+    def __iter__(self):
+        while self.remaining > 0:
+            data = self.file.read(min(CHUNK_SIZE, self.remaining))
+            if not data:
+                break
+            self.remaining -= len(data)
+            yield data
+
+    def close(self):
+        self.file.close()
+
+
+def serve_image(request, image, digest):
+    """
+    Stream a stored image with conditional-GET and Range support.
+    The URL is content-addressed, so the response is immutable and cacheable forever.
+    """
+    etag = f'"{digest}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if etags.if_none_match(request, etag):
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    size = image.size
+    content_type = _content_type(image.name)
+    byte_range = None
+    range_header = request.headers.get("Range")
+    # If-Range with a different validator means "send the whole thing"
+    if range_header and request.headers.get("If-Range", etag) == etag:
+        byte_range = _parse_range(range_header, size)
+
+    if byte_range == "invalid":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    image.open("rb")
+    if byte_range is None:
+        response = FileResponse(image.file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(_RangeFileWrapper(image.file, start, end), status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    for key, value in headers.items():
+        response[key] = value
+    return response
+
+
+def _content_type(name):
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def download_image(url, digest, session=None, auth=None):
+    """
+    Stream a remote image to a temporary file and check it against 'digest'.
+    Returns a django File named <digest><extension> (caller saves it into an ImageField), or
+    None if the download failed, was too large, or did not match the hash.
+    """
+    session = session or requests
+    tmp = tempfile.NamedTemporaryFile()
+    verified = False
+    try:
+        # Closing the response hands its connection back to the session's pool
+        with session.get(url, stream=True, timeout=10, auth=auth) as response:
+            response.raise_for_status()
+            hasher = hashlib.sha256()
+            received = 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                received += len(chunk)
+                if received > MAX_REMOTE_IMAGE_SIZE:
+                    return None
+                hasher.update(chunk)
+                tmp.write(chunk)
+            content_type = response.headers.get("Content-Type", "")
+        verified = hasher.hexdigest() == digest
+    except requests.RequestException:
+        return None
+    finally:
+        if not verified:
+            tmp.close()
+    if not verified:
+        return None
+    tmp.seek(0)
+    return File(tmp, name=f"{digest}{_image_extension(content_type, tmp)}")
+
+
+def _image_extension(content_type, file):
+    """
+    Extension for a downloaded image, so it is served with the right type later: from the
+    Content-Type it came with, or from the format Pillow finds in 'file' when that is not an image type.
+    """
+    content_type = content_type.partition(";")[0].strip().lower()
+    if not content_type.startswith("image/"):
+        try:
+            with Image.open(file) as image:
+                content_type = Image.MIME.get(image.format, "")
+        except (OSError, ValueError):
+            content_type = ""
+        file.seek(0)
+    return (mimetypes.guess_extension(content_type) or "") if content_type else ""
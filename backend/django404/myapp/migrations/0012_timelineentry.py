@@ -0,0 +1,53 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:50
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_timeline(apps, schema_editor):
+    Post = apps.get_model('myapp', 'Post')
+    Following = apps.get_model('myapp', 'Following')
+    TimelineEntry = apps.get_model('myapp', 'TimelineEntry')
+
+    entries = []
+    posts = Post.objects.filter(
+        deleted_at__isnull=True,
+        visibility__in=['PUBLIC', 'UNLISTED', 'FRIENDS'],
+    )
+    for post in posts.iterator():
+        if post.visibility == 'PUBLIC':
+            owner_ids = [None]
+        else:
+            owner_ids = Following.objects.filter(followee_id=post.author_id).values_list('follower_id', flat=True)
+        entries.extend(
+            TimelineEntry(owner_id=owner_id, post_id=post.id, author_id=post.author_id, updated=post.updated)
+            for owner_id in owner_ids
+        )
+    TimelineEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_user_home_node'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('updated', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='myapp.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-updated', '-id'], name='timeline_owner_updated_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'post'), name='timeline_unique_owner_post'), models.UniqueConstraint(condition=models.Q(('owner__isnull', True)), fields=('post',), name='timeline_unique_shared_post')],
+            },
+        ),
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:56
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, fk_name):
+    counts = (
+        model.objects
+            .filter(**{fk_name: OuterRef('pk')})
+            .order_by()
+            .values(fk_name)
+            .annotate(count=Count('*'))
+            .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model('myapp', 'Post')
+    Comment = apps.get_model('myapp', 'Comment')
+    Like = apps.get_model('myapp', 'Like')
+    CommentLike = apps.get_model('myapp', 'CommentLike')
+
+    Post.objects.update(
+        likes_count=count_of(Like, 'post'),
+        comments_count=count_of(Comment, 'post'),
+    )
+    Comment.objects.update(likes_count=count_of(CommentLike, 'comment'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_post_content_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:00
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0014_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoteAuthorSync',
+            fields=[
+                ('node', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RemoteAuthor',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('node', models.CharField(max_length=50)),
+                ('username', models.CharField(max_length=150)),
+                ('data', models.JSONField(default=dict)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('node', 'username'), name='remote_author_unique_node_username')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, fk_name):
+    counts = (
+        model.objects
+            .filter(**{fk_name: OuterRef('pk')})
+            .order_by()
+            .values(fk_name)
+            .annotate(count=Count('*'))
+            .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def delete_duplicates(model, fields, date_field):
+    """Keep the oldest row of every group sharing 'fields'. Returns the affected values of fields[0]."""
+    groups = model.objects.values(*fields).annotate(n=Count('id')).filter(n__gt=1)
+    affected = set()
+    for group in groups:
+        rows = model.objects.filter(**{field: group[field] for field in fields}).order_by(date_field, 'id')
+        model.objects.filter(id__in=list(rows.values_list('id', flat=True)[1:])).delete()
+        affected.add(group[fields[0]])
+    return affected
+
+
+def remove_duplicates(apps, schema_editor):
+    """The new unique constraints cannot be created while duplicate rows exist."""
+    Post = apps.get_model('myapp', 'Post')
+    Comment = apps.get_model('myapp', 'Comment')
+    Like = apps.get_model('myapp', 'Like')
+    CommentLike = apps.get_model('myapp', 'CommentLike')
+    Following = apps.get_model('myapp', 'Following')
+
+    delete_duplicates(Following, ['follower', 'followee'], 'followed_at')
+    posts = delete_duplicates(Like, ['post', 'author'], 'created')
+    Post.objects.filter(pk__in=posts).update(likes_count=count_of(Like, 'post'))
+    comments = delete_duplicates(CommentLike, ['comment', 'author'], 'created')
+    Comment.objects.filter(pk__in=comments).update(likes_count=count_of(CommentLike, 'comment'))
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_post_image_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_remove_duplicate_relations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timelineentry',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='following',
+            index=models.Index(fields=['followee', '-followed_at'], name='following_followee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notif',
+            index=models.Index(fields=['receiver', '-created_at'], name='notif_receiver_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notif',
+            index=models.Index(condition=models.Q(('notif_type', 'FOLLOW_REQUEST')), fields=['sender', 'receiver'], name='notif_follow_request_pair_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['visibility', '-published', '-id'], name='post_visibility_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'visibility', '-published', '-id'], name='post_author_vis_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('visibility', 'DELETED'), _negated=True), fields=['-published', '-id'], name='post_live_published_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='commentlike',
+            constraint=models.UniqueConstraint(fields=('comment', 'author'), name='commentlike_unique_comment_author'),
+        ),
+        migrations.AddConstraint(
+            model_name='following',
+            constraint=models.UniqueConstraint(fields=('follower', 'followee'), name='following_unique_follower_followee'),
+        ),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('post', 'author'), name='like_unique_post_author'),
+        ),
+    ]
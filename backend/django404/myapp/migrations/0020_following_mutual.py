@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0019_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='following',
+            name='mutual',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
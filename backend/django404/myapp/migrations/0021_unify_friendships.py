@@ -0,0 +1,63 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+
+def unify_friendships(apps, schema_editor):
+    """
+    Fold both old friendship stores into mutual Following rows:
+    - every User.friends pair becomes a follow in each direction
+    - 'mutual' is set wherever the follow is returned (replacing Following.friends == 'YES')
+    - the new follows get their timeline entries (signals do not run in migrations; this does
+      what timeline.add_followee_posts would)
+    """
+    User = apps.get_model('myapp', 'User')
+    Following = apps.get_model('myapp', 'Following')
+    Post = apps.get_model('myapp', 'Post')
+    TimelineEntry = apps.get_model('myapp', 'TimelineEntry')
+
+    Friendship = User.friends.through
+    pairs = set(Friendship.objects.values_list('from_user_id', 'to_user_id'))
+    pairs |= {(b, a) for a, b in pairs}
+    existing = set(Following.objects.values_list('follower_id', 'followee_id'))
+    new_pairs = [(a, b) for a, b in pairs - existing if a != b]
+    Following.objects.bulk_create(
+        [Following(follower_id=a, followee_id=b) for a, b in new_pairs],
+        ignore_conflicts=True,
+    )
+
+    followers_of = {}
+    for follower_id, followee_id in new_pairs:
+        followers_of.setdefault(followee_id, []).append(follower_id)
+    posts = Post.objects.filter(
+        author_id__in=followers_of,
+        visibility__in=['UNLISTED', 'FRIENDS'],
+        deleted_at__isnull=True,
+    ).values_list('id', 'author_id', 'updated')
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner_id=follower_id, post_id=post_id, author_id=author_id, updated=updated)
+            for post_id, author_id, updated in posts.iterator()
+            for follower_id in followers_of[author_id]
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+    followed_back = Following.objects.filter(follower_id=OuterRef('followee_id'), followee_id=OuterRef('follower_id'))
+    Following.objects.update(mutual=Exists(followed_back))
+
+
+def split_friendships(apps, schema_editor):
+    Following = apps.get_model('myapp', 'Following')
+    Following.objects.filter(mutual=True).update(friends='YES')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0020_following_mutual'),
+    ]
+
+    operations = [
+        migrations.RunPython(unify_friendships, split_friendships),
+    ]
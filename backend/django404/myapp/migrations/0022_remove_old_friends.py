@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0021_unify_friendships'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='following',
+            name='friends',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='friends',
+        ),
+        migrations.AddIndex(
+            model_name='following',
+            index=models.Index(condition=models.Q(('mutual', True)), fields=['follower', '-followed_at'], name='following_friends_idx'),
+        ),
+    ]
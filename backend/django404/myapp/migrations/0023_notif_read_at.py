@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0022_remove_old_friends'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notif',
+            name='read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notif',
+            index=models.Index(condition=models.Q(('read_at__isnull', True)), fields=['receiver'], name='notif_unread_idx'),
+        ),
+    ]
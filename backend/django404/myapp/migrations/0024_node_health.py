@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0023_notif_read_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='circuit_opened_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='consecutive_failures',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='last_error',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='last_failure',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='latency_ms',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
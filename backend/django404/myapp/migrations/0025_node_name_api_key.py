@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0024_node_health'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='api_key',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='name',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+    ]
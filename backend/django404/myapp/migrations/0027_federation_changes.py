@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0026_post_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='changes_cursor',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['updated', 'id'], name='post_updated_idx'),
+        ),
+    ]
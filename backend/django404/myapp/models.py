@@ -1,9 +1,32 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from datetime import timezone as dt_timezone
+import hashlib
+import json
 import uuid
 import markdown
 
+
+def render_markdown(text):
+    """Render post markdown to HTML."""
+    return markdown.markdown(text or '')
+
+
+def exclude_counters(instance, kwargs, counter_fields):
+    """
+    Make save() on an existing row skip its denormalized counters.
+    Counters only change through F() updates (myapp/counters.py), so a stale in-memory
+    value must never overwrite them.
+    """
+    if instance._state.adding or kwargs.get('force_insert') or kwargs.get('update_fields') is not None:
+        return
+    kwargs['update_fields'] = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in counter_fields
+    ]
+
 # Nishchay Ranjan
 class User(AbstractUser):
     """
@@ -12,7 +35,6 @@ class User(AbstractUser):
     - first_name
     - last_name
     - profile_image
-    - friends (ManyToManyField to 'self')
     - is_approved (BooleanField)
     - is_admin (BooleanField)
     """
@@ -20,8 +42,6 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     profile_image = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
-    # Mutual friendship: when one user adds another, it's automatically mutual.
-    friends = models.ManyToManyField("self", blank=True, symmetrical=True)
     is_admin = models.BooleanField(default=False)  # Admins can manage users/nodes
     # New users need approval (default set to False)
     is_approved = models.BooleanField(default=False, editable=True)
@@ -41,6 +61,7 @@ class Following(models.Model):
     Following model
     - 'follower' userId of user who wants to follow
     - 'followee' userId of user being followed
+    - 'mutual' is True when followee also follows follower (they are friends)
     - 'followed_at' is DateTimeField of when follower follows followee
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -54,13 +75,25 @@ class Following(models.Model):
         on_delete=models.CASCADE, 
         related_name='followee'
     )
-    # This field can be used to denote additional friend-related info
-    friends = models.CharField(
-        max_length=10,
-        default='NO'
-    )
+    # True when the followee follows back, i.e. the two users are friends (see myapp/friendships.py)
+    mutual = models.BooleanField(default=False, editable=False)
     followed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'], name='following_unique_follower_followee'),
+        ]
+        indexes = [
+            # get_followers: followers of one user, newest first
+            models.Index(fields=['followee', '-followed_at'], name='following_followee_date_idx'),
+            # get_friends / friendships.friends_of: one user's friends, newest first
+            models.Index(
+                fields=['follower', '-followed_at'],
+                condition=models.Q(mutual=True),
+                name='following_friends_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.follower} followed {self.followee}"
 
@@ -100,6 +133,91 @@ class Post(models.Model):
     published = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True)  # Soft Delete
+    # Cached markdown rendering of 'content', refreshed by save() only when the content changes.
+    # NULL means not rendered yet (see the render_content_html command).
+    content_html = models.TextField(blank=True, null=True, editable=False)
+    # Denormalized counters, maintained by myapp/counters.py
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # SHA-256 of the image bytes, used to serve and federate the image by content (see myapp/media.py)
+    image_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
+    # Federation: 'version' goes up whenever 'content_hash' (over FEDERATED_FIELDS) changes.
+    # Remote posts keep the version and hash of their home node, so resent or older
+    # copies can be recognized without rewriting the row (see myapp/inbox.py).
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    FEDERATED_FIELDS = ('title', 'content', 'visibility', 'deleted_at', 'image_hash')
+
+    class Meta:
+        indexes = [
+            # Listings page on (published, id) newest first (see myapp/pagination.py)
+            # public_posts: one visibility, newest first
+            models.Index(fields=['visibility', '-published', '-id'], name='post_visibility_published_idx'),
+            # user_posts, drafts, friends_posts: one or more authors, filtered by visibility
+            models.Index(fields=['author', 'visibility', '-published', '-id'], name='post_author_vis_published_idx'),
+            # list_posts: everything that is not soft-deleted
+            models.Index(
+                fields=['-published', '-id'],
+                condition=~models.Q(visibility='DELETED'),
+                name='post_live_published_idx'
+            ),
+            # /federation/changes/: posts in the order they last changed (see myapp/changes.py)
+            models.Index(fields=['updated', 'id'], name='post_updated_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which content the stored HTML was rendered from
+        if 'content' in field_names and instance.content_html is not None:
+            instance._rendered_content = instance.content
+        # ...and which image file the stored hash belongs to
+        if 'image' in field_names and instance.image_hash:
+            instance._hashed_image = instance.image.name
+        return instance
+
+    def render_content_html(self):
+        self.content_html = render_markdown(self.content)
+        self._rendered_content = self.content
+
+    def save(self, *args, **kwargs):
+        exclude_counters(self, kwargs, ['likes_count', 'comments_count'])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            if self.content_html is None or self.content != getattr(self, '_rendered_content', None):
+                self.render_content_html()
+                if update_fields is not None:
+                    kwargs['update_fields'] = set(update_fields) | {'content_html'}
+        if update_fields is None or 'image' in update_fields:
+            if self.update_image_hash() and update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'image_hash'}
+        if update_fields is None or not set(self.FEDERATED_FIELDS).isdisjoint(kwargs['update_fields']):
+            content_hash = self.compute_content_hash()
+            if content_hash != self.content_hash:
+                self.content_hash = content_hash
+                self.version += 1
+                if update_fields is not None:
+                    kwargs['update_fields'] = set(kwargs['update_fields']) | {'content_hash', 'version'}
+        super().save(*args, **kwargs)
+        # Storage may rename the file on save, so record the final name
+        self._hashed_image = self.image.name if self.image_hash else None
+
+    def update_image_hash(self):
+        """Recompute image_hash if the image changed since it was hashed. Returns True if it changed."""
+        from myapp.media import hash_file
+        old_hash = self.image_hash
+        if not self.image:
+            self.image_hash = ''
+        elif not self.image_hash or not self.image._committed or self.image.name != getattr(self, '_hashed_image', None):
+            self.image_hash = hash_file(self.image)
+        return self.image_hash != old_hash
+
+    def compute_content_hash(self):
+        """SHA-256 over FEDERATED_FIELDS; equal on every node that has the same copy of the post."""
+        deleted_at = self.deleted_at.astimezone(dt_timezone.utc).isoformat() if self.deleted_at else None
+        fields = [self.title, self.content, self.visibility, deleted_at, self.image_hash]
+        return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
 
     def is_deleted(self):
         return self.deleted_at is not None  # Check if post is deleted
@@ -118,6 +236,11 @@ class Comment(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments')
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)  # Maintained by myapp/counters.py
+
+    def save(self, *args, **kwargs):
+        exclude_counters(self, kwargs, ['likes_count'])
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.id}"
@@ -132,6 +255,11 @@ class Like(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='likes')
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'author'], name='like_unique_post_author'),
+        ]
+
     def __str__(self):
         return f"{self.author.username} liked {self.post.id}"
 
@@ -146,6 +274,7 @@ class Notif(models.Model):
     - 'post': Optional field, linked to a Post if the notification is for a like or comment.
     - 'comment': Optional field, linked to a Comment if the notification is for a comment.
     - 'created_at': Datetime when the notification was created.
+    - 'read_at': Datetime when the receiver marked it as read, NULL while unread.
     """
     NOTIF_CHOICES = [
         ('LIKE', 'like'),
@@ -184,6 +313,21 @@ class Notif(models.Model):
         related_name="comment_notif"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    read_at = models.DateTimeField(null=True, blank=True)  # NULL while unread
+
+    class Meta:
+        indexes = [
+            # get_follower_request_list / the inbox: one receiver's notifications, newest first
+            models.Index(fields=['receiver', '-created_at'], name='notif_receiver_created_idx'),
+            # Unread badge count (myapp/notifications.py)
+            models.Index(fields=['receiver'], condition=models.Q(read_at__isnull=True), name='notif_unread_idx'),
+            # "already sent a follow request?" checks
+            models.Index(
+                fields=['sender', 'receiver'],
+                condition=models.Q(notif_type='FOLLOW_REQUEST'),
+                name='notif_follow_request_pair_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.receiver} has {self.notif_type} {self.sender}"
@@ -194,16 +338,34 @@ class Node(models.Model):
     Represents a remote node that this server can communicate with.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=50, unique=True, blank=True, null=True)  # e.g. "node2"; also RemoteAuthor.node / User.home_node
     base_url = models.URLField(unique=True)  # URL of the remote node
+    api_key = models.CharField(max_length=255, blank=True, default="")  # Sent as X-Node-Api-Key
     username = models.CharField(max_length=255)  # For Basic Auth
     password = models.CharField(max_length=255)  # For Basic Auth
     is_active = models.BooleanField(default=True)  # Can be disabled
     description = models.TextField(blank=True, null=True)  # Optional description
     last_connected = models.DateTimeField(blank=True, null=True)  # Last successful connection
+    # Health, recorded on every outbound call (see myapp/node_health.py)
+    consecutive_failures = models.PositiveIntegerField(default=0, editable=False)
+    last_failure = models.DateTimeField(blank=True, null=True, editable=False)
+    last_error = models.TextField(blank=True, default="", editable=False)
+    latency_ms = models.FloatField(blank=True, null=True, editable=False)  # Moving average of successful calls
+    circuit_opened_at = models.DateTimeField(blank=True, null=True, editable=False)  # Set while the circuit is open
+    # Position in the node's /federation/changes/ feed we have pulled up to (see myapp/changes.py)
+    changes_cursor = models.CharField(max_length=255, blank=True, default="", editable=False)
 
     def __str__(self):
         return f"Node {self.base_url} (Active: {self.is_active})"
 
+    @property
+    def key(self):
+        """Identifier used in fan-out results and RemoteAuthor.node."""
+        return self.name or self.base_url
+
+    def endpoint(self, path):
+        return f"{self.base_url.rstrip('/')}{path}"
+
 class CommentLike(models.Model):
     """
     Represents a 'like' from a specific user on a specific comment.
@@ -213,5 +375,126 @@ class CommentLike(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['comment', 'author'], name='commentlike_unique_comment_author'),
+        ]
+
     def __str__(self):
         return f"{self.author.username} liked comment {self.comment.id}"
+
+class TimelineEntry(models.Model):
+    """
+    Materialized stream row: one per (owner, post) pair that should show up in an owner's stream.
+
+    - 'owner' is the user whose stream contains the post. It is NULL for PUBLIC posts,
+      which are stored once and shared by every stream instead of being copied per user.
+    - 'author' is copied from the post so the stream can drop your own posts without a join.
+    - 'updated' mirrors Post.updated and is the stream's sort key.
+    Rows are maintained by myapp.timeline whenever a Post or Following row changes.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='timeline_entries',
+        db_index=False  # Covered by timeline_owner_updated_idx
+    )
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    updated = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='timeline_unique_owner_post'),
+            models.UniqueConstraint(
+                fields=['post'],
+                condition=models.Q(owner__isnull=True),
+                name='timeline_unique_shared_post'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-updated', '-id'], name='timeline_owner_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in stream of {self.owner_id or 'everyone'}"
+
+class RemoteAuthor(models.Model):
+    """
+    Local copy of a user listed by another node's /list-all-users/ endpoint.
+    Refreshed in the background by the refresh_remote_authors command (see myapp/federation.py),
+    so user-search pages do not have to call every node on every request.
+
+    - 'node' is the name (Node.key) of the node the user lives on
+    - 'data' is the user exactly as the remote node returned it
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    node = models.CharField(max_length=50)
+    username = models.CharField(max_length=150)
+    data = models.JSONField(default=dict)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['node', 'username'], name='remote_author_unique_node_username'),
+        ]
+
+    def __str__(self):
+        return f"{self.username}@{self.node}"
+
+class RemoteAuthorSync(models.Model):
+    """
+    Per-node bookkeeping for the RemoteAuthor cache: the validators used for conditional
+    GETs (ETag / Last-Modified) and when the node's list was last confirmed fresh.
+    """
+    node = models.CharField(max_length=50, primary_key=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.node} refreshed at {self.refreshed_at}"
+
+class OutboxItem(models.Model):
+    """
+    A federation message waiting to be delivered to a remote node.
+    Rows are written in the same transaction as the change that caused them and are
+    delivered by the drain_outbox worker (see myapp/outbox.py), with retries and backoff.
+
+    - 'node' is the destination; 'path' is the endpoint on that node, e.g. '/receive-post/'
+    - 'payload' is the JSON body to POST
+    - 'next_attempt_at' is when the item is next due; a worker that claims an item pushes it
+      forward by a lease, so an item held by a crashed worker simply becomes due again
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),   # Waiting for (another) delivery attempt
+        ('SENT', 'Sent'),         # Delivered successfully
+        ('FAILED', 'Failed'),     # Gave up after too many attempts
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    node = models.ForeignKey(Node, on_delete=models.CASCADE, related_name='outbox_items')
+    post = models.ForeignKey(Post, on_delete=models.SET_NULL, blank=True, null=True, related_name='outbox_items')
+    path = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.path} to {self.node_id} ({self.status})"
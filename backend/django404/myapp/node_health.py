@@ -0,0 +1,117 @@
+# node_health.py
+#
+# Per-node health and circuit breaker.
+# Every outbound call records its outcome on the Node row: successes set last_connected and
+# feed a moving average of the latency, failures count up consecutive_failures. After
+# FAILURE_THRESHOLD failures in a row the circuit opens (circuit_opened_at is set) and fan-outs
+# skip the node instead of waiting for its timeout. The probe_nodes command re-checks open
+# nodes every PROBE_INTERVAL seconds and closes the circuit on the first success.
+# State lives in the database, so every worker sees the same circuits.
+# is_active stays an admin switch; an open circuit never changes it.
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from myapp import node_http
+from myapp.models import Node
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open a node's circuit
+FAILURE_THRESHOLD = getattr(settings, "NODE_FAILURE_THRESHOLD", 5)
+# Seconds between background probes of a node whose circuit is open
+PROBE_INTERVAL = getattr(settings, "NODE_PROBE_INTERVAL", 30)
+# Cheap endpoint used to probe a node, and how long a probe may take
+PROBE_PATH = "/hello/"
+PROBE_TIMEOUT = 3
+# Weight of the newest call in the latency moving average
+LATENCY_WEIGHT = 0.2
+
+
+def _rows(node):
+    return Node.objects.filter(pk=node.pk)
+
+
+def record_success(node, latency=None):
+    """A call to 'node' succeeded in 'latency' seconds."""
+    changes = {
+        "last_connected": timezone.now(),
+        "consecutive_failures": 0,
+        "circuit_opened_at": None,
+    }
+    if latency is not None:
+        latency_ms = latency * 1000
+        changes["latency_ms"] = Coalesce(
+            F("latency_ms") * (1 - LATENCY_WEIGHT) + latency_ms * LATENCY_WEIGHT, latency_ms
+        )
+    _rows(node).update(**changes)
+
+
+def record_failure(node, error=""):
+    """A call to 'node' failed; opens its circuit after FAILURE_THRESHOLD failures in a row."""
+    now = timezone.now()
+    rows = _rows(node)
+    rows.update(
+        consecutive_failures=F("consecutive_failures") + 1,
+        last_failure=now,
+        last_error=str(error)[:1000],
+    )
+    opened = rows.filter(
+        consecutive_failures__gte=FAILURE_THRESHOLD, circuit_opened_at__isnull=True
+    ).update(circuit_opened_at=now)
+    if opened:
+        logger.warning(f"Opened circuit for {node} after {FAILURE_THRESHOLD} failures: {error}")
+
+
+def split_available(nodes):
+    """Split a {key: Node} dict into (available, skipped): nodes with an open circuit are skipped."""
+    open_ids = set(
+        Node.objects.filter(pk__in=[node.pk for node in nodes.values()], circuit_opened_at__isnull=False)
+            .values_list("pk", flat=True)
+    ) if nodes else set()
+    available = {key: node for key, node in nodes.items() if node.pk not in open_ids}
+    skipped = [key for key in nodes if key not in available]
+    return available, skipped
+
+
+def is_open(node):
+    return node.circuit_opened_at is not None
+
+
+def state(node):
+    """'closed', 'open', or 'half-open' (open, and due for its next probe)."""
+    if not is_open(node):
+        return "closed"
+    last_attempt = max(filter(None, [node.circuit_opened_at, node.last_failure]))
+    if (timezone.now() - last_attempt).total_seconds() >= PROBE_INTERVAL:
+        return "half-open"
+    return "open"
+
+
+def probe(node):
+    """GET PROBE_PATH on the node and record the outcome. Returns True if it answered."""
+    started = time.monotonic()
+    try:
+        response = node_http.get(node, PROBE_PATH, timeout=PROBE_TIMEOUT, retries=0)
+        if response.status_code >= 500:
+            raise Exception(f"{response.status_code} - {response.text[:200]}")
+    except Exception as e:
+        record_failure(node, str(e) or type(e).__name__)
+        return False
+    record_success(node, time.monotonic() - started)
+    return True
+
+
+def probe_due():
+    """Probe every node whose circuit is open and due for a probe. Returns {base_url: answered}."""
+    cutoff = timezone.now() - timedelta(seconds=PROBE_INTERVAL)
+    due = Node.objects.filter(is_active=True, circuit_opened_at__lte=cutoff).filter(
+        Q(last_failure__isnull=True) | Q(last_failure__lte=cutoff)
+    )
+    return {node.base_url: probe(node) for node in due}
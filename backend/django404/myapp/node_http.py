@@ -0,0 +1,125 @@
+# node_http.py
+#
+# The HTTP client every outbound call to another node goes through.
+# - Each node gets its own requests.Session (keyed by base URL) with a keep-alive connection
+#   pool, so repeated calls to a peer reuse connections instead of opening a new one each time.
+# - Calls default to (CONNECT_TIMEOUT, READ_TIMEOUT); callers may pass their own 'timeout'.
+# - Idempotent calls (GET, HEAD, OPTIONS, PUT, DELETE) are retried on connection errors,
+#   timeouts and 502/503/504, after an exponential backoff with full jitter. POSTs are sent
+#   once; the outbox has its own retry schedule for them.
+# - At most MAX_PER_NODE calls to one node run at a time in this process. A call that cannot
+#   get a slot within SLOT_TIMEOUT seconds fails with NodeBusy instead of piling up.
+# - JSON bodies are built by compression.encode_json, and every response is passed to
+#   compression.remember, so bodies are compressed for peers that can decode them.
+# The async views use federation_async.get_client() (httpx) with the same timeouts.
+
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from myapp import compression
+
+CONNECT_TIMEOUT = getattr(settings, "FEDERATION_CONNECT_TIMEOUT", 3.05)
+READ_TIMEOUT = getattr(settings, "FEDERATION_READ_TIMEOUT", 5)
+MAX_PER_NODE = getattr(settings, "FEDERATION_MAX_PER_NODE", 8)
+SLOT_TIMEOUT = getattr(settings, "FEDERATION_SLOT_TIMEOUT", 5)
+RETRIES = getattr(settings, "FEDERATION_RETRIES", 2)
+RETRY_BACKOFF = 0.2  # Seconds before the first retry, doubled for every later one
+RETRY_BACKOFF_MAX = 2
+RETRY_STATUSES = (502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class NodeBusy(requests.ConnectionError):
+    """Raised when MAX_PER_NODE calls to the node are already in flight."""
+
+
+class _NodeClient:
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PER_NODE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.slots = threading.BoundedSemaphore(MAX_PER_NODE)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _client(node):
+    client = _clients.get(node.base_url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.setdefault(node.base_url, _NodeClient())
+    return client
+
+
+def session_for(node):
+    """The pooled session for 'node', for callers that need the raw session (e.g. streaming downloads)."""
+    return _client(node).session
+
+
+def backoff(attempt):
+    """Delay before retry number 'attempt' (1-based): full jitter over an exponential cap."""
+    return random.uniform(0, min(RETRY_BACKOFF * 2 ** (attempt - 1), RETRY_BACKOFF_MAX))
+
+
+def request(node, method, path, json=None, headers=None, timeout=None, retries=None, **kwargs):
+    """
+    Send 'method' to 'path' on 'node' and return the requests.Response.
+    'json' is encoded (and compressed when the node supports it) by compression.encode_json.
+    The node's api_key is sent as X-Node-Api-Key unless 'headers' set one.
+    Raises requests.RequestException (including NodeBusy) when the node cannot be reached;
+    HTTP error statuses are returned, not raised.
+    """
+    method = method.upper()
+    headers = dict(headers or {})
+    if node.api_key:
+        headers.setdefault("X-Node-Api-Key", node.api_key)
+    if json is not None:
+        kwargs["data"], body_headers = compression.encode_json(json, node)
+        headers = {**body_headers, **headers}
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if retries is None:
+        retries = RETRIES if method in IDEMPOTENT_METHODS else 0
+
+    client = _client(node)
+    if not client.slots.acquire(timeout=SLOT_TIMEOUT):
+        raise NodeBusy(f"{MAX_PER_NODE} calls to {node.key} already in flight")
+    try:
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(backoff(attempt))
+            try:
+                response = client.session.request(method, node.endpoint(path), headers=headers, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                continue
+            compression.remember(node, response)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+    finally:
+        client.slots.release()
+
+
+def get(node, path, **kwargs):
+    return request(node, "GET", path, **kwargs)
+
+
+def post(node, path, **kwargs):
+    return request(node, "POST", path, **kwargs)
+
+
+def clear():
+    """Close every pooled session (tests, or after the node list changed)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
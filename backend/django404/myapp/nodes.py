@@ -0,0 +1,126 @@
+# nodes.py
+#
+# Registry of the nodes this one federates with, backed by the Node table.
+# All federation code looks nodes up here - by name ("node2"), by URL or by host - instead of
+# reading settings. The table is read once into an in-process snapshot with dict indexes;
+# saving or deleting a Node drops this process's snapshot (myapp/signals.py) and other
+# processes reload within REGISTRY_TTL seconds, so peers are added from the admin without
+# a redeploy. Health fields are not read from the snapshot (see myapp/node_health.py).
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from myapp.models import Node, RemoteAuthor
+
+User = get_user_model()
+
+# Seconds a process may serve a snapshot before re-reading the Node table
+REGISTRY_TTL = getattr(settings, "NODE_REGISTRY_TTL", 30)
+
+
+def normalize_url(url):
+    """scheme://host[:port] of a URL, lower-cased, which is how nodes are indexed."""
+    parts = urlsplit(url.strip())
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+
+def normalize_host(host):
+    """Host name or IP of 'host[:port]', without IPv6 brackets."""
+    host = host.strip().lower()
+    if "://" not in host:
+        if host.count(":") > 1 and not host.startswith("["):
+            return host  # Bare IPv6 address
+        host = f"//{host}"
+    return urlsplit(host).hostname or ""
+
+
+class _Snapshot:
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.by_id = {str(node.pk): node for node in nodes}
+        self.by_name = {node.name: node for node in nodes if node.name}
+        self.by_url = {normalize_url(node.base_url): node for node in nodes}
+        self.by_host = {}
+        for node in nodes:
+            self.by_host.setdefault(normalize_host(node.base_url), node)
+        self.loaded_at = time.monotonic()
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _registry():
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot.loaded_at > REGISTRY_TTL:
+        with _lock:
+            snapshot = _snapshot = _Snapshot(list(Node.objects.order_by("name", "base_url")))
+    return snapshot
+
+
+def clear():
+    """Drop this process's snapshot; the next lookup re-reads the Node table."""
+    global _snapshot
+    _snapshot = None
+
+
+def current_name():
+    """Name of this node."""
+    return getattr(settings, "INSTANCE_NAME", "node1")
+
+
+def get(name):
+    """The node called 'name', or None."""
+    return _registry().by_name.get(name)
+
+
+def by_id(node_id):
+    """The node with primary key 'node_id', or None."""
+    return _registry().by_id.get(str(node_id))
+
+
+def by_url(url):
+    """The node serving 'url' (its base URL or any URL under it), or None."""
+    return _registry().by_url.get(normalize_url(url))
+
+
+def by_host(host):
+    """The node at 'host' (a name or IP, optionally with port or IPv6 brackets), or None."""
+    return _registry().by_host.get(normalize_host(host))
+
+
+def resolve(identifier):
+    """The node for a name, URL or host, or None."""
+    if not identifier:
+        return None
+    if "://" in identifier:
+        return by_url(identifier)
+    return get(identifier) or by_host(identifier)
+
+
+def remote_nodes():
+    """{key: Node} of every active node except this one."""
+    current = current_name()
+    return {node.key: node for node in _registry().nodes if node.is_active and node.name != current}
+
+
+def home_node(username):
+    """
+    The active remote node a non-local user lives on, or None (local or unknown users).
+    Stub users created for remote senders carry it in User.home_node; otherwise the
+    RemoteAuthor cache tells which node listed the user.
+    """
+    local = list(User.objects.filter(username=username).values_list("home_node", flat=True)[:1])
+    if local:
+        home = local[0]
+    else:
+        home = RemoteAuthor.objects.filter(username=username).values_list("node", flat=True).first()
+    node = resolve(home)
+    if node is None or not node.is_active or node.name == current_name():
+        return None
+    return node
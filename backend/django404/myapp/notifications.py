@@ -0,0 +1,61 @@
+# notifications.py
+#
+# Read/unread state of the notification inbox, and pushing new notifications to open
+# /events/ connections (see myapp/push.py).
+# The unread count behind the UI badge is cached per user in Django's cache and dropped
+# whenever that user's notifications change (signals, bulk inserts, mark_read), so polling
+# the badge is a cache hit instead of a scan of the inbox.
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from myapp import push
+from myapp.models import Notif
+
+# Seconds a cached count may live even without invalidation
+UNREAD_CACHE_TIMEOUT = getattr(settings, "NOTIF_UNREAD_CACHE_TIMEOUT", 600)
+
+
+def _key(user_id):
+    return f"notifs:unread:{user_id}"
+
+
+def unread_count(user_id):
+    """Number of unread notifications of a user."""
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = Notif.objects.filter(receiver_id=user_id, read_at__isnull=True).count()
+        cache.set(_key(user_id), count, UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate(*user_ids):
+    """Drop the cached counts of these users, now and again when the transaction commits."""
+    keys = [_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def mark_read(user, ids=None):
+    """Mark the user's unread notifications (only those in 'ids', if given) as read. Returns how many."""
+    notifs = Notif.objects.filter(receiver_id=user.id, read_at__isnull=True)
+    if ids is not None:
+        notifs = notifs.filter(id__in=ids)
+    marked = notifs.update(read_at=timezone.now())
+    if marked:
+        invalidate(user.id)
+    return marked
+
+
+def push_new(notif, sender_username=None):
+    """Push a newly created notification to its receiver's open connections."""
+    push.publish_to_user(notif.receiver_id, "notif", {
+        "id": notif.id,
+        "notif_type": notif.notif_type,
+        "sender_username": sender_username or notif.sender.username,
+        "post": notif.post_id,
+        "comment": notif.comment_id,
+        "created_at": notif.created_at,
+    })
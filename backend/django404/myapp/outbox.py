@@ -0,0 +1,152 @@
+# outbox.py
+#
+# Durable outbound federation queue.
+# Views call enqueue() inside their own transaction and return right away; the drain_outbox
+# worker delivers due items with retries, exponential backoff and a per-node concurrency cap.
+# Items for nodes whose circuit is open (see myapp/node_health.py) wait until a probe closes it.
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from myapp import node_health, node_http
+from myapp.models import OutboxItem
+
+logger = logging.getLogger(__name__)
+
+# Seconds a delivery attempt may take before it is abandoned
+DELIVERY_TIMEOUT = 10
+# How long a claimed item stays invisible to other workers, in seconds
+CLAIM_LEASE = 60
+# Backoff after the n-th failure is min(BACKOFF_BASE * 2**n, BACKOFF_MAX) seconds, plus jitter
+BACKOFF_BASE = 5
+BACKOFF_MAX = 3600
+# Items are marked FAILED after this many attempts
+MAX_ATTEMPTS = getattr(settings, "FEDERATION_OUTBOX_MAX_ATTEMPTS", 12)
+# At most this many deliveries to the same node run at once
+PER_NODE_CONCURRENCY = getattr(settings, "FEDERATION_OUTBOX_PER_NODE", 2)
+# Longest one delivery attempt can take, in seconds
+ATTEMPT_TIMEOUT = node_http.CONNECT_TIMEOUT + DELIVERY_TIMEOUT
+
+
+def lease_capacity(concurrency):
+    """How many items 'concurrency' parallel deliveries are sure to attempt within CLAIM_LEASE."""
+    return max(1, int(concurrency * CLAIM_LEASE // ATTEMPT_TIMEOUT))
+
+
+def enqueue(node, path, payload, post=None):
+    """Queue a POST of 'payload' to 'path' on 'node'. Commits with the caller's transaction."""
+    return OutboxItem.objects.create(node=node, path=path, payload=payload, post=post)
+
+
+def backoff(attempts):
+    """Delay before the next attempt once 'attempts' attempts have failed."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay + random.uniform(0, delay / 2))
+
+
+def claim_due(limit=100, per_node=None):
+    """
+    Claim up to 'limit' due items, at most 'per_node' for any one node (default: as many as
+    PER_NODE_CONCURRENCY deliveries get through within the lease), by pushing their
+    next_attempt_at forward by CLAIM_LEASE.
+    An item still waiting for a delivery slot when its lease ran out would be claimed and
+    sent a second time by another worker, hence the per-node cap.
+    SKIP LOCKED lets several workers drain the same table without handing out an item twice.
+    Items for nodes with an open circuit are left alone.
+    """
+    if per_node is None:
+        per_node = lease_capacity(PER_NODE_CONCURRENCY)
+    now = timezone.now()
+    due = OutboxItem.objects.filter(status="PENDING", next_attempt_at__lte=now, node__circuit_opened_at__isnull=True)
+    # FOR UPDATE cannot be combined with a window function, so rank first and lock second
+    candidates = list(
+        due
+            .annotate(node_rank=Window(RowNumber(), partition_by="node_id", order_by=["next_attempt_at", "id"]))
+            .filter(node_rank__lte=per_node)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:limit]
+    )
+    with transaction.atomic():
+        items = list(
+            due
+                .select_for_update(skip_locked=True, of=("self",))
+                .select_related("node")
+                .filter(id__in=candidates)
+                .order_by("next_attempt_at")
+        )
+        OutboxItem.objects.filter(id__in=[item.id for item in items]).update(
+            next_attempt_at=now + timedelta(seconds=CLAIM_LEASE)
+        )
+    return items
+
+
+def deliver(item):
+    """POST one item to its node. Raises on any failure; does no DB work (runs in a pool thread)."""
+    node = item.node
+    auth = (node.username, node.password) if node.username else None
+    response = node_http.post(node, item.path, json=item.payload, auth=auth, timeout=(node_http.CONNECT_TIMEOUT, DELIVERY_TIMEOUT))
+    if response.status_code >= 300:
+        raise Exception(f"{response.status_code} - {response.text[:200]}")
+
+
+def _record(item, error, latency=None):
+    if error is None:
+        node_health.record_success(item.node, latency)
+    else:
+        node_health.record_failure(item.node, error)
+
+    now = timezone.now()
+    item.attempts += 1
+    if error is None:
+        item.status = "SENT"
+        item.sent_at = now
+        item.last_error = ""
+    elif item.attempts >= MAX_ATTEMPTS:
+        item.status = "FAILED"
+        item.last_error = error
+        logger.error(f"Giving up on outbox item {item.id} to node {item.node_id}: {error}")
+    else:
+        item.next_attempt_at = now + backoff(item.attempts)
+        item.last_error = error
+    item.save(update_fields=["status", "attempts", "next_attempt_at", "last_error", "sent_at"])
+
+
+def drain_once(limit=100, max_workers=8):
+    """
+    Claim and deliver one batch of due items. Returns the number of items attempted.
+    Deliveries run in parallel, but never more than PER_NODE_CONCURRENCY to one node.
+    The batch is cut to what 'max_workers' threads can attempt before the claims expire.
+    """
+    items = claim_due(min(limit, lease_capacity(max_workers)))
+    if not items:
+        return 0
+
+    node_slots = {}
+    for item in items:
+        node_slots.setdefault(item.node_id, threading.Semaphore(PER_NODE_CONCURRENCY))
+
+    def attempt(item):
+        with node_slots[item.node_id]:
+            started = time.monotonic()
+            try:
+                deliver(item)
+                return None, time.monotonic() - started
+            except Exception as e:
+                return str(e) or type(e).__name__, None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="outbox") as executor:
+        outcomes = list(executor.map(attempt, items))
+
+    for item, (error, latency) in zip(items, outcomes):
+        _record(item, error, latency)
+    return len(items)
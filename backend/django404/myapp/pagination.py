@@ -0,0 +1,114 @@
+# pagination.py
+#
+# Keyset ("cursor") pagination for the post listing endpoints.
+# Pages are keyed on (<timestamp field>, id), newest first, so fetching page N costs the same
+# as fetching page 1. The response body stays a plain list; the next page is advertised in a
+# Link header (rel="next") so existing clients keep working unchanged.
+
+import base64
+import heapq
+import json
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp, pk):
+    """Opaque, URL-safe cursor for the position right after (timestamp, pk)."""
+    raw = json.dumps({"t": timestamp.isoformat(), "id": str(pk)})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises NotFound for anything that was not produced by it."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return datetime.fromisoformat(data["t"]), uuid.UUID(data["id"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise NotFound("Invalid cursor")
+
+
+class KeysetPagination(BasePagination):
+    """
+    Usage in a function view:
+        paginator = KeysetPagination("published")
+        page = paginator.paginate_queryset(posts, request)
+        serializer = PostSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    - 'ordering' is the timestamp field to page on (descending, ties broken by descending id)
+    - '?cursor=' is the opaque value taken from the previous page's Link header
+    - '?page_size=' is optional and capped at MAX_PAGE_SIZE
+    paginate_querysets() pages through several querysets as if they were one (see there).
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+        self.next_cursor = None
+        self.request = None
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return DEFAULT_PAGE_SIZE
+        return max(1, min(page_size, MAX_PAGE_SIZE))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        One page of the rows of all 'querysets' together, in the same order.
+        Use it instead of OR-ing the filters when each queryset is a single index range read
+        but their OR is not: every queryset is read up to the page size, already in order,
+        and the pieces are merged here instead of being sorted by the database.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            timestamp, pk = decode_cursor(cursor)
+            after_cursor = (
+                Q(**{f"{self.ordering}__lt": timestamp}) |
+                Q(**{self.ordering: timestamp, "id__lt": pk})
+            )
+            querysets = [queryset.filter(after_cursor) for queryset in querysets]
+
+        # Fetch one extra row to learn whether there is a next page.
+        parts = [list(queryset.order_by(f"-{self.ordering}", "-id")[:page_size + 1]) for queryset in querysets]
+        if len(parts) == 1:
+            page = parts[0]
+        else:
+            merged = heapq.merge(*parts, key=lambda row: (getattr(row, self.ordering), row.pk), reverse=True)
+            page = list(islice(merged, page_size + 1))
+        if len(page) > page_size:
+            page = page[:page_size]
+            last = page[-1]
+            self.next_cursor = encode_cursor(getattr(last, self.ordering), last.pk)
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        headers = {}
+        next_link = self.get_next_link()
+        if next_link:
+            headers["Link"] = f'<{next_link}>; rel="next"'
+        return Response(data, headers=headers)
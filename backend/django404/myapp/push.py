@@ -0,0 +1,167 @@
+# push.py
+#
+# Pub/sub behind the /events/ push endpoints (server-sent events and long-poll).
+# Writers call publish_to_user() / publish_public() (after their transaction commits); every open
+# /events/ connection of that user - or of everyone, for public events - receives the message.
+#
+# The broker is pluggable via settings.PUSH_BACKEND:
+# - myapp.push.LocalBroker (default): in-process, for a single ASGI worker and for tests
+# - myapp.push.RedisBroker: Redis pub/sub, so events reach connections held by other workers
+#   (needs the optional 'redis' package)
+
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_CHANNEL = "public"
+# Messages buffered per connection; the oldest are dropped when a client falls behind
+QUEUE_SIZE = 100
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+class _LocalSubscription:
+    """One connection's queue. Must be created on the event loop that will read it."""
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, message):
+        # publish() may run in a sync worker thread, so hand the message to our loop
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            pass  # Loop already closed; the connection is gone
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout):
+        """Next message, or None after 'timeout' seconds."""
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process broker: only connections held by this process receive events."""
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def subscribe(self, channels):
+        subscription = _LocalSubscription(self, channels)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscribers.pop(channel, None)
+
+
+class _RedisSubscription:
+    def __init__(self, client, channels):
+        self.client = client
+        self.channels = [f"push:{channel}" for channel in channels]
+        self.pubsub = None
+
+    async def get(self, timeout):
+        if self.pubsub is None:
+            self.pubsub = self.client.pubsub()
+            await self.pubsub.subscribe(*self.channels)
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message["data"]) if message else None
+
+    async def close(self):
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBroker:
+    """Redis pub/sub broker, shared by every worker. 'url' defaults to settings.PUSH_REDIS_URL."""
+    def __init__(self, url=None):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker needs the 'redis' package (pip install redis)")
+        self.url = url or getattr(settings, "PUSH_REDIS_URL", "redis://localhost:6379/0")
+        self._async_redis = redis.asyncio
+        self._client = redis.Redis.from_url(self.url)
+
+    def publish(self, channel, message):
+        self._client.publish(f"push:{channel}", json.dumps(message, cls=DjangoJSONEncoder))
+
+    def subscribe(self, channels):
+        return _RedisSubscription(self._async_redis.Redis.from_url(self.url), channels)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The broker configured by settings.PUSH_BACKEND, created on first use."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = getattr(settings, "PUSH_BACKEND", "myapp.push.LocalBroker")
+            _broker = import_string(backend)(**getattr(settings, "PUSH_BACKEND_OPTIONS", {}))
+        return _broker
+
+
+def _publish(channel, event, data):
+    message = {"event": event, "data": json.loads(json.dumps(data, cls=DjangoJSONEncoder))}
+
+    def send():
+        try:
+            get_broker().publish(channel, message)
+        except Exception as e:
+            # Push is best effort; clients fall back to polling
+            logger.warning(f"Could not publish {event} to {channel}: {e}")
+
+    transaction.on_commit(send)
+
+
+def publish_to_user(user_id, event, data):
+    """Push 'event' to every open connection of one user, once the current transaction commits."""
+    _publish(user_channel(user_id), event, data)
+
+
+def publish_public(event, data):
+    """Push 'event' to every open connection."""
+    _publish(PUBLIC_CHANNEL, event, data)
@@ -0,0 +1,84 @@
+# relationships.py
+#
+# Resolves how a viewer relates to other users (the 'relation' of get_relationship).
+# The three underlying facts - a pending follow request, viewer follows user, user follows
+# viewer - are Exists() subqueries annotated onto the User query, so one pair, a batch of
+# usernames or a whole user listing costs a single query.
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+
+from myapp.models import Following, Notif
+
+User = get_user_model()
+
+YOURSELF = "YOURSELF"
+PENDING = "PENDING"
+FRIEND = "FRIEND"
+FOLLOWEE = "FOLLOWEE"
+FOLLOWER = "FOLLOWER"
+NOBODY = "NOBODY"
+
+# Most usernames the batch endpoint resolves per request
+MAX_BATCH_SIZE = 200
+
+MESSAGES = {
+    YOURSELF: "This is you",
+    PENDING: "This is a user you sent a follow request to.",
+    FRIEND: "This is a user you are friends with.",
+    FOLLOWEE: "This is a user you follow.",
+    FOLLOWER: "This is a user you are followed by.",
+    NOBODY: "This is a user is no one special.",
+}
+
+
+def annotations(viewer):
+    """
+    Exists() annotations for a User queryset, relative to 'viewer':
+    - 'request_pending': viewer sent the user a follow request
+    - 'is_followee': viewer follows the user
+    - 'is_follower': the user follows viewer
+    """
+    return {
+        "request_pending": Exists(
+            Notif.objects.filter(sender_id=viewer.id, receiver_id=OuterRef("pk"), notif_type="FOLLOW_REQUEST")
+        ),
+        "is_followee": Exists(Following.objects.filter(follower_id=viewer.id, followee_id=OuterRef("pk"))),
+        "is_follower": Exists(Following.objects.filter(follower_id=OuterRef("pk"), followee_id=viewer.id)),
+    }
+
+
+def requested(request):
+    """True for listings called with ?with=relationship by a logged-in user."""
+    return request.user.is_authenticated and "relationship" in request.query_params.get("with", "").split(",")
+
+
+def with_relationship(users, viewer):
+    """Annotate a User queryset with the fields of annotations(viewer)."""
+    return users.annotate(**annotations(viewer))
+
+
+def resolve(viewer, user):
+    """Relation of viewer to a user annotated by with_relationship()."""
+    if user.id == viewer.id:
+        return YOURSELF
+    if user.request_pending:
+        return PENDING
+    if user.is_followee and user.is_follower:
+        return FRIEND
+    if user.is_followee:
+        return FOLLOWEE
+    if user.is_follower:
+        return FOLLOWER
+    return NOBODY
+
+
+def relationship(viewer, username):
+    """Relation of viewer to the user called 'username' in one query; None if there is no such user."""
+    return relationships(viewer, [username]).get(username)
+
+
+def relationships(viewer, usernames):
+    """{username: relation} for every existing user in 'usernames', in one query."""
+    users = with_relationship(User.objects.filter(username__in=usernames), viewer).only("id", "username")
+    return {user.username: resolve(viewer, user) for user in users}
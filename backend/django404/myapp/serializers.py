@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Following, Post, Comment, Like, Notif, CommentLike, Node
-import markdown
+from .models import Following, Post, Comment, Like, Notif, CommentLike, Node, render_markdown
+from . import relationships
 
 User = get_user_model()
 
@@ -16,6 +16,19 @@ class RegisterUserSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         return User.objects.create_user(**validated_data)  # Uses create_user() to hash passwords
 
+class UserRelationshipSerializer(RegisterUserSerializer):
+    """
+    RegisterUserSerializer plus the viewer's 'relation' to each user (see myapp/relationships.py).
+    Expects users annotated by relationships.with_relationship() and context['request'].
+    """
+    relation = serializers.SerializerMethodField()
+
+    class Meta(RegisterUserSerializer.Meta):
+        fields = RegisterUserSerializer.Meta.fields + ["relation"]
+
+    def get_relation(self, obj):
+        return relationships.resolve(self.context['request'].user, obj)
+
 # Serializer for Following model (by Christine Bao)
 class FollowingSerializer(serializers.ModelSerializer):
     """
@@ -24,11 +37,16 @@ class FollowingSerializer(serializers.ModelSerializer):
     """
     follower_username = serializers.ReadOnlyField(source='follower.username')
     followee_username = serializers.ReadOnlyField(source='followee.username')
+    # 'YES' / 'NO', derived from Following.mutual (see myapp/friendships.py)
+    friends = serializers.SerializerMethodField()
 
     class Meta:
         model = Following
         fields  = ['friends', 'follower_username', 'followee_username', 'followed_at']
 
+    def get_friends(self, obj):
+        return 'YES' if obj.mutual else 'NO'
+
 # Serializer for Node model (by Yicheng Lin)
 class NodeSerializer(serializers.ModelSerializer):
     """Ensures safe handling of node data without exposing passwords."""
@@ -50,21 +68,15 @@ class NodeSerializer(serializers.ModelSerializer):
 # Serializer for Comment model (by QingqiuTan)
 class CommentSerializer(serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
-    likes_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
         fields = ['id', 'post', 'author_username', 'text', 'created', 'likes_count']
         read_only_fields = ['id', 'post', 'author_username', 'created', 'likes_count']
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-
 # Serializer for Post model (by QingqiuTan/Nishchay Ranjan/Riyasat Zaman)
 class PostSerializer(serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
-    likes_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
     title = serializers.CharField(required=False, allow_blank=True)
     content = serializers.CharField(required=False, allow_blank=True)
     comments = CommentSerializer(many=True, read_only=True)
@@ -90,15 +102,11 @@ class PostSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'author_username', 'published', 'updated', 'likes_count', 'comments_count', 'comments']
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-
-    def get_comments_count(self, obj):
-        return obj.comments.count()
-    
     def get_content_html(self, obj):
-        # Convert the markdown content to HTML.
-        return markdown.markdown(obj.content or '')
+        # Rendered once on save (Post.content_html); only rows that predate the column are rendered here.
+        if obj.content_html is not None:
+            return obj.content_html
+        return render_markdown(obj.content)
     
     def validate(self, data):
         # Ensure that at least one of title, content, or image is provided.
@@ -106,6 +114,27 @@ class PostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("At least one of title/content/image is required.")
         return data
 
+# One post in a node-to-node inbox delivery (see myapp/inbox.py); same field names as PostSerializer
+class InboxPostSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    author_username = serializers.CharField(max_length=150)
+    title = serializers.CharField(max_length=100, required=False, allow_blank=True, default="")
+    content = serializers.CharField(required=False, allow_blank=True, default="")
+    visibility = serializers.ChoiceField(choices=Post.VISIBILITY_CHOICES, default="PUBLIC")
+    deleted_at = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    image_hash = serializers.RegexField(r"^[0-9a-f]{64}$", required=False, allow_blank=True, default="")
+    image_url = serializers.URLField(required=False, allow_blank=True, default="")
+    version = serializers.IntegerField(min_value=0, required=False, default=0)
+    content_hash = serializers.RegexField(r"^[0-9a-f]{64}$", required=False)
+
+    def validate(self, data):
+        # Hash what we actually received; a hash sent along must agree with it
+        content_hash = Post(**{field: data[field] for field in Post.FEDERATED_FIELDS}).compute_content_hash()
+        if data.get("content_hash", content_hash) != content_hash:
+            raise serializers.ValidationError({"content_hash": "Does not match the post."})
+        data["content_hash"] = content_hash
+        return data
+
 # Serializer for Like model (by QingqiuTan)
 class LikeSerializer(serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
@@ -121,7 +150,8 @@ class NotifSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Notif
-        fields = ['id', 'receiver', 'sender_username', 'notif_type', 'post', 'comment', 'created_at']
+        fields = ['id', 'receiver', 'sender_username', 'notif_type', 'post', 'comment', 'created_at', 'read_at']
+        read_only_fields = ['read_at']
 
 # Serializer for CommentLike model (by Yicheng Lin)
 class CommentLikeSerializer(serializers.ModelSerializer):
@@ -0,0 +1,88 @@
+# signals.py
+#
+# Keeps derived tables in sync with the models they are computed from.
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from myapp import counters, friendships, nodes, notifications, social_graph, timeline
+from myapp.models import Comment, CommentLike, Following, Like, Node, Notif, Post
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, **kwargs):
+    """Create, edit and soft-delete all go through save(), so fan the post out again."""
+    timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Following)
+def following_saved(sender, instance, created, **kwargs):
+    if created:
+        social_graph.invalidate(instance.follower_id, instance.followee_id)
+        friendships.refresh_mutual(instance.follower_id, instance.followee_id)
+        timeline.add_followee_posts(instance.follower_id, instance.followee_id)
+
+
+@receiver(post_delete, sender=Following)
+def following_deleted(sender, instance, **kwargs):
+    social_graph.invalidate(instance.follower_id, instance.followee_id)
+    friendships.refresh_mutual(instance.follower_id, instance.followee_id)
+    timeline.remove_followee_posts(instance.follower_id, instance.followee_id)
+
+
+def _parent_is_being_deleted(origin, parent_model):
+    """True when a cascade from deleting the counter's own row triggered this delete."""
+    model = getattr(origin, 'model', type(origin))
+    return issubclass(model, parent_model)
+
+
+@receiver(post_save, sender=Like)
+def like_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(Post, instance.post_id, 'likes_count', 1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, origin=None, **kwargs):
+    if not _parent_is_being_deleted(origin, Post):
+        counters.adjust(Post, instance.post_id, 'likes_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(Post, instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if not _parent_is_being_deleted(origin, Post):
+        counters.adjust(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=CommentLike)
+def comment_like_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(Comment, instance.comment_id, 'likes_count', 1)
+
+
+@receiver(post_delete, sender=CommentLike)
+def comment_like_deleted(sender, instance, origin=None, **kwargs):
+    if not _parent_is_being_deleted(origin, (Post, Comment)):
+        counters.adjust(Comment, instance.comment_id, 'likes_count', -1)
+
+
+@receiver(post_save, sender=Notif)
+@receiver(post_delete, sender=Notif)
+def notif_changed(sender, instance, **kwargs):
+    notifications.invalidate(instance.receiver_id)
+    if kwargs.get('created'):
+        notifications.push_new(instance)
+
+
+@receiver(post_save, sender=Node)
+@receiver(post_delete, sender=Node)
+def node_changed(sender, instance, **kwargs):
+    nodes.clear()
+    transaction.on_commit(nodes.clear)
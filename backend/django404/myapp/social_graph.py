@@ -0,0 +1,113 @@
+# social_graph.py
+#
+# Cached follower / followee ID sets.
+# Reads go through two tiers: a bounded in-process LRU (entries live LOCAL_TTL seconds, so
+# other processes' writes show up quickly) and Django's cache framework, shared by every
+# process. Following changes invalidate both tiers (see myapp/signals.py).
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from myapp.models import Following
+
+# Most users kept in the in-process LRU (per direction)
+LRU_SIZE = getattr(settings, "SOCIAL_GRAPH_LRU_SIZE", 10000)
+# Seconds an in-process entry is trusted before the shared cache is asked again
+LOCAL_TTL = getattr(settings, "SOCIAL_GRAPH_LOCAL_TTL", 5)
+# Seconds an entry lives in the shared cache
+SHARED_TIMEOUT = getattr(settings, "SOCIAL_GRAPH_CACHE_TIMEOUT", 600)
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + LOCAL_TTL, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = _LRU(LRU_SIZE * 2)
+
+
+def _key(direction, user_id):
+    return f"socialgraph:{direction}:{user_id}"
+
+
+def _ids(direction, user_id, load):
+    key = _key(direction, user_id)
+    ids = _local.get(key)
+    if ids is None:
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(load())
+            cache.set(key, ids, SHARED_TIMEOUT)
+        _local.set(key, ids)
+    return ids
+
+
+def followee_ids(user_id):
+    """IDs of the users 'user_id' follows."""
+    return _ids(
+        "followees", user_id,
+        lambda: Following.objects.filter(follower_id=user_id).values_list("followee_id", flat=True),
+    )
+
+
+def follower_ids(user_id):
+    """IDs of the users following 'user_id'."""
+    return _ids(
+        "followers", user_id,
+        lambda: Following.objects.filter(followee_id=user_id).values_list("follower_id", flat=True),
+    )
+
+
+def _forget(follower_id, followee_id):
+    keys = [_key("followees", follower_id), _key("followers", followee_id)]
+    for key in keys:
+        _local.discard(key)
+    cache.delete_many(keys)
+
+
+def invalidate(follower_id, followee_id):
+    """
+    Drop the cached sets a follower -> followee edge belongs to.
+    Done again on commit, so a read between the write and the commit cannot re-cache the old sets.
+    """
+    _forget(follower_id, followee_id)
+    transaction.on_commit(lambda: _forget(follower_id, followee_id))
+
+
+def clear_local():
+    """Empty this process's LRU (tests)."""
+    _local.clear()
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import httpx
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from myapp import federation, federation_async, nodes
+from myapp.models import Node, Notif, RemoteAuthor
+
+User = get_user_model()
+
+NODES = {
+    'node1': 'http://local',
+    'node2': 'http://fast',
+    'node3': 'http://slow',
+    'node4': 'http://down',
+}
+
+
+async def handler(request):
+    if request.url.host == 'slow':
+        await asyncio.sleep(1)
+    if request.url.host == 'down':
+        raise httpx.ConnectError("refused")
+    if request.method == 'POST':
+        return httpx.Response(200, json={'forwarded': json.loads(request.content), 'key': request.headers['X-Node-Api-Key']})
+    return httpx.Response(200, json=[{'username': f"remote-{request.url.host}"}], headers={'ETag': '"v1"'})
+
+
+@override_settings(INSTANCE_NAME='node1', DEFAULT_PEER_NODE='node2')
+class AsyncFederationTestCase(TestCase):
+    def setUp(self):
+        nodes.clear()
+        for number, (name, url) in enumerate(NODES.items(), start=1):
+            Node.objects.create(name=name, base_url=url, api_key=f'key{number}')
+        self.user = User.objects.create_user(username='local', email='local@example.com', password='testpass')
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.requests = []
+
+    def mock_client(self):
+        async def recording_handler(request):
+            self.requests.append(request)
+            return await handler(request)
+        return patch.object(
+            federation_async, 'get_client',
+            return_value=httpx.AsyncClient(transport=httpx.MockTransport(recording_handler)),
+        )
+
+    async def test_aggregated_users_within_deadline(self):
+        with self.mock_client(), patch.object(federation, 'FANOUT_DEADLINE', 0.3):
+            started = time.monotonic()
+            response = await self.async_client.get(reverse('async_aggregated_all_users'), headers=self.auth)
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 1)
+        usernames = {user['username']: user['remote_node'] for user in response.json()}
+        self.assertEqual(usernames, {'local': 'node1', 'remote-fast': 'node2'})
+        self.assertEqual(response['X-Nodes-Timed-Out'], 'node3')
+        self.assertEqual(response['X-Nodes-Failed'], 'node4')
+        self.assertNotIn('local', [request.url.host for request in self.requests])
+
+    async def test_remote_list_all_users_reads_paired_node(self):
+        with self.mock_client():
+            response = await self.async_client.get(reverse('async_remote_list_all_users'), headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'username': 'remote-fast', 'remote_node': 'node2'}])
+
+    async def test_follow_request_is_forwarded(self):
+        await RemoteAuthor.objects.acreate(node='node2', username='someone', fetched_at=timezone.now())
+        url = reverse('async_create_follow_request_inter_node', args=['someone'])
+        with self.mock_client():
+            response = await self.async_client.post(url, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'forwarded': {'sender_username': 'local'}, 'key': 'key2'})
+        self.assertEqual(str(self.requests[0].url), 'http://fast/create-follow-request/someone/')
+
+    async def test_local_follow_request(self):
+        bob = await User.objects.acreate(username='bob', email='bob@example.com')
+        url = reverse('async_create_follow_request_inter_node', args=['bob'])
+        with self.mock_client():
+            response = await self.async_client.post(url, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.requests, [])
+        self.assertTrue(await Notif.objects.filter(sender=self.user, receiver=bob).aexists())
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(reverse('async_aggregated_all_users'))
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,115 @@
+import uuid
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from myapp import changes, nodes
+from myapp.models import Node, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@patch.object(changes, 'SETTLE_SECONDS', 0)
+class ChangesFeedTestCase(APITestCase):
+    def setUp(self):
+        nodes.clear()
+        Node.objects.create(name='node2', base_url='http://node2.example', api_key='key2')
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass')
+        remote = User.objects.create(username='remote', email='remote@node2.invalid', home_node='node2')
+        self.posts = [Post.objects.create(author=self.alice, title=f'Post {number}') for number in range(3)]
+        Post.objects.create(author=remote, title='Not ours')
+        self.url = reverse('federation_changes')
+
+    def get_changes(self, **params):
+        return self.client.get(self.url, params, HTTP_X_NODE_API_KEY='key2')
+
+    def test_pages_through_local_changes_in_order(self):
+        first = self.get_changes(limit=2).data
+        self.assertEqual([post['title'] for post in first['posts']], ['Post 0', 'Post 1'])
+        self.assertTrue(first['has_more'])
+
+        second = self.get_changes(since=first['next'], limit=2).data
+        self.assertEqual([post['title'] for post in second['posts']], ['Post 2'])
+        self.assertFalse(second['has_more'])
+
+        empty = self.get_changes(since=second['next']).data
+        self.assertEqual((empty['posts'], empty['next']), ([], second['next']))
+
+        # Edits and soft deletes show up again after the cursor
+        self.posts[0].deleted_at = timezone.now()
+        self.posts[0].visibility = 'DELETED'
+        self.posts[0].save()
+        changed = self.get_changes(since=second['next']).data['posts']
+        self.assertEqual([(post['title'], post['version']) for post in changed], [('Post 0', 2)])
+        self.assertIsNotNone(changed[0]['deleted_at'])
+
+    def test_restricted_posts_are_sent_stripped(self):
+        cursor = self.get_changes().data['next']
+        self.posts[1].visibility = 'PRIVATE'
+        self.posts[1].content = 'Only for me'
+        self.posts[1].save()
+        Post.objects.create(author=self.alice, title='Draft', visibility='DRAFT')
+
+        changed = self.get_changes(since=cursor).data['posts']
+        self.assertEqual(
+            [(post['id'], post['visibility'], post['title'], post['content'], post['version']) for post in changed],
+            [(str(self.posts[1].id), 'PRIVATE', '', '', 2), (changed[1]['id'], 'DRAFT', '', '', 1)],
+        )
+
+    def test_recent_changes_are_held_back(self):
+        with patch.object(changes, 'SETTLE_SECONDS', 60):
+            self.assertEqual(self.get_changes().data['posts'], [])
+
+    def test_requires_node_key_and_valid_cursor(self):
+        response = self.client.get(self.url, HTTP_X_NODE_API_KEY='wrong')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_changes(since='garbage').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PullChangesTestCase(APITestCase):
+    def setUp(self):
+        nodes.clear()
+        self.node = Node.objects.create(name='node2', base_url='http://node2.example', api_key='key2')
+
+    def page(self, titles, next_cursor, has_more):
+        posts = [
+            {'id': str(uuid.uuid4()), 'author_username': 'remote', 'title': title, 'version': 1}
+            for title in titles
+        ]
+        return Mock(status_code=200, json=Mock(return_value={'posts': posts, 'next': next_cursor, 'has_more': has_more}))
+
+    @patch('requests.Session.request')
+    def test_pull_resumes_from_stored_cursor(self, get):
+        get.side_effect = [self.page(['One', 'Two'], 'c1', True), self.page(['Three'], 'c2', False)]
+        call_command('pull_changes', stdout=Mock())
+
+        self.assertEqual(sorted(Post.objects.values_list('title', flat=True)), ['One', 'Three', 'Two'])
+        self.assertEqual(User.objects.get(username='remote').home_node, 'node2')
+        self.node.refresh_from_db()
+        self.assertEqual(self.node.changes_cursor, 'c2')
+        self.assertEqual(get.call_args_list[0].args[1], 'http://node2.example/federation/changes/')
+        self.assertNotIn('since', get.call_args_list[0].kwargs['params'])
+        self.assertEqual(get.call_args_list[1].kwargs['params']['since'], 'c1')
+
+        get.side_effect = [self.page([], 'c2', False)]
+        self.assertEqual(changes.pull_all(), {'node2': 0})
+        self.assertEqual(get.call_args.kwargs['params']['since'], 'c2')
+
+    @patch('requests.Session.request')
+    def test_pulled_copy_is_hidden_when_made_private(self, get):
+        shared = self.page(['Shared'], 'c1', False)
+        post = shared.json.return_value['posts'][0]
+        hidden = {**post, 'title': '', 'visibility': 'PRIVATE', 'version': 2}
+        get.side_effect = [shared, Mock(status_code=200, json=Mock(return_value={'posts': [hidden], 'next': 'c2', 'has_more': False}))]
+
+        changes.pull(self.node)
+        self.assertTrue(TimelineEntry.objects.filter(post_id=post['id']).exists())
+        changes.pull(self.node)
+        copy = Post.objects.get(id=post['id'])
+        self.assertEqual((copy.title, copy.visibility, copy.version), ('', 'PRIVATE', 2))
+        self.assertFalse(TimelineEntry.objects.filter(post_id=post['id']).exists())
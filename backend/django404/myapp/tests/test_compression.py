@@ -0,0 +1,100 @@
+import gzip
+import json
+import uuid
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from myapp import compression, nodes, outbox
+from myapp.models import Node, Post
+
+User = get_user_model()
+
+
+class ResponseCompressionTestCase(TestCase):
+    def setUp(self):
+        User.objects.bulk_create(
+            [User(username=f'user{number}', email=f'user{number}@example.com') for number in range(50)]
+        )
+        self.url = reverse('list_all_users')
+
+    def test_compresses_when_asked(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=0.5, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip' if 'br' not in compression.CODECS else 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        if response['Content-Encoding'] == 'gzip':
+            self.assertEqual(len(json.loads(gzip.decompress(response.content))), 50)
+
+        # The weakened ETag still revalidates
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_leaves_small_or_unwanted_responses_alone(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Accept-Encoding'], compression.SUPPORTED)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self.client.get(reverse('hello'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_choose(self):
+        self.assertIsNone(compression.choose(''))
+        self.assertIsNone(compression.choose('identity'))
+        self.assertEqual(compression.choose('GZIP'), 'gzip')
+        self.assertEqual(compression.choose('*'), next(iter(compression.CODECS)))
+
+
+class RequestDecodingTestCase(TestCase):
+    def setUp(self):
+        nodes.clear()
+        Node.objects.create(name='node2', base_url='http://node2.example', api_key='key2')
+        self.url = reverse('receive_posts_batch')
+
+    def post(self, body, encoding):
+        return self.client.post(
+            self.url, body, content_type='application/json',
+            HTTP_CONTENT_ENCODING=encoding, HTTP_X_NODE_API_KEY='key2',
+        )
+
+    def test_decodes_compressed_bodies(self):
+        posts = [{'id': str(uuid.uuid4()), 'author_username': 'remote', 'title': 'Hello'}]
+        response = self.post(gzip.compress(json.dumps(posts).encode()), 'gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['status'], 'created')
+        self.assertTrue(Post.objects.filter(id=posts[0]['id']).exists())
+
+    def test_rejects_bad_or_unknown_encodings(self):
+        self.assertEqual(self.post(b'not gzip', 'gzip').status_code, 400)
+        response = self.post(b'[]', 'compress')
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(response['Accept-Encoding'], compression.SUPPORTED)
+
+    def test_limits_decompressed_size(self):
+        with self.settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1000):
+            self.assertEqual(self.post(gzip.compress(b' ' * 2000), 'gzip').status_code, 400)
+
+
+class OutboundCompressionTestCase(TestCase):
+    def setUp(self):
+        compression.clear()
+        self.node = Node.objects.create(base_url='http://remote.example', username='node', password='secret')
+        self.payload = {'content': 'x' * compression.MIN_SIZE}
+
+    @patch('requests.Session.request')
+    def test_compresses_once_the_node_advertises_support(self, post):
+        post.return_value = Mock(status_code=200, headers={'Accept-Encoding': 'gzip'})
+        outbox.enqueue(self.node, '/receive-post/', self.payload)
+        outbox.enqueue(self.node, '/receive-post/', {'content': 'short'})
+        outbox.drain_once(max_workers=1)
+        self.assertEqual([call.kwargs['headers'].get('Content-Encoding') for call in post.call_args_list], [None, None])
+
+        outbox.enqueue(self.node, '/receive-post/', self.payload)
+        outbox.drain_once()
+        self.assertEqual(post.call_args.kwargs['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(post.call_args.kwargs['data'])), self.payload)
@@ -0,0 +1,97 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from unittest.mock import patch, Mock
+import requests
+import time
+
+from myapp import federation, node_http, nodes
+from myapp.models import Node, RemoteAuthor, RemoteAuthorSync
+
+User = get_user_model()
+
+NODES = {
+    'node1': 'http://local',
+    'node2': 'http://fast',
+    'node3': 'http://slow',
+    'node4': 'http://down',
+}
+
+def create_nodes():
+    nodes.clear()
+    return {name: Node.objects.create(name=name, base_url=url, api_key='key') for name, url in NODES.items()}
+
+def fake_response(status_code, users=None, etag=''):
+    return Mock(
+        status_code=status_code,
+        headers={'ETag': etag} if etag else {},
+        json=Mock(return_value=users or []),
+        raise_for_status=Mock(),
+    )
+
+def fake_get(method, url, headers=None, timeout=None):
+    if url.startswith('http://slow'):
+        time.sleep(1)
+    if url.startswith('http://down'):
+        raise requests.ConnectionError("refused")
+    if headers.get('If-None-Match') == '"v1"':
+        return fake_response(304)
+    return fake_response(200, [{'username': f"remote-{url[7:11]}"}], etag='"v1"')
+
+@override_settings(INSTANCE_NAME='node1')
+class AggregatedUsersTestCase(APITestCase):
+    def setUp(self):
+        self.nodes = create_nodes()
+        self.user = User.objects.create_user(username='local', email='local@example.com', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    @patch('requests.Session.request', side_effect=fake_get)
+    def test_cold_cache_is_filled_with_a_deadline(self, get):
+        with patch.object(federation, 'FANOUT_DEADLINE', 0.3), patch.object(node_http, 'RETRIES', 0):
+            started = time.monotonic()
+            response = self.client.get(reverse('aggregated_all_users'))
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(elapsed, 1)
+        usernames = {user['username']: user['remote_node'] for user in response.data}
+        self.assertEqual(usernames, {'local': 'node1', 'remote-fast': 'node2'})
+        self.assertEqual(response['X-Nodes-Timed-Out'], 'node3')
+        self.assertEqual(response['X-Nodes-Failed'], 'node4')
+        # The current node is never called over HTTP
+        self.assertNotIn('http://local', [call.args[1][:12] for call in get.call_args_list])
+
+    @patch('requests.Session.request', side_effect=fake_get)
+    def test_warm_cache_is_served_without_remote_calls(self, get):
+        federation.refresh_remote_authors({'node2': self.nodes['node2']})
+        self.assertTrue(RemoteAuthor.objects.filter(node='node2', username='remote-fast').exists())
+
+        get.reset_mock()
+        response = self.client.get(reverse('aggregated_remote_list_all_users'))
+        # Only the nodes that were never cached are fetched inline
+        self.assertNotIn('http://fast/list-all-users/', [call.args[1] for call in get.call_args_list])
+        self.assertIn({'username': 'remote-fast', 'remote_node': 'node2'}, response.data)
+        self.assertIn('X-Cache-Refreshed-At', response)
+
+    @patch('requests.Session.request', side_effect=fake_get)
+    def test_refresh_uses_etag(self, get):
+        federation.refresh_remote_authors({'node2': self.nodes['node2']})
+        self.assertEqual(RemoteAuthorSync.objects.get(node='node2').etag, '"v1"')
+
+        result = federation.refresh_remote_authors({'node2': self.nodes['node2']})
+        self.assertEqual(result.data, {'node2': 'not-modified'})
+        self.assertEqual(get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+
+    def test_list_all_users_honours_if_none_match(self):
+        response = self.client.get(reverse('list_all_users'))
+        etag = response['ETag']
+        for if_none_match in (etag, f'"other", W/{etag}', '*'):
+            response = self.client.get(reverse('list_all_users'), HTTP_IF_NONE_MATCH=if_none_match)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Only whole tags match
+        for if_none_match in (f'"a{etag}"', f'"a", {etag[:-1]}0"'):
+            response = self.client.get(reverse('list_all_users'), HTTP_IF_NONE_MATCH=if_none_match)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
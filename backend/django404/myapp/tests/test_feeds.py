@@ -0,0 +1,45 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from myapp.models import Post, Comment, Like, CommentLike
+
+User = get_user_model()
+
+class FeedQueryCountTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', email='viewer@example.com', password='testpass')
+        self.other = User.objects.create_user(username='poster', email='poster@example.com', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def make_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.other, title=f'Post {i}', visibility='PUBLIC')
+            Like.objects.create(post=post, author=self.user)
+            comment = Comment.objects.create(post=post, author=self.user, text='hi')
+            CommentLike.objects.create(comment=comment, author=self.other)
+
+    def assert_constant_queries(self, url, expected):
+        self.make_posts(2)
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+        self.make_posts(8)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_public_posts_query_count(self):
+        # posts (with author and counts), comments (with author and like counts)
+        response = self.assert_constant_queries(reverse('public-posts-excluding-user'), 2)
+        post = response.data[0]
+        self.assertEqual(post['likes_count'], 1)
+        self.assertEqual(post['comments_count'], 1)
+        self.assertEqual(post['comments'][0]['likes_count'], 1)
+        self.assertEqual(post['author_username'], 'poster')
+
+    def test_stream_query_count(self):
+        # own timeline entries, shared PUBLIC entries, posts, comments
+        response = self.assert_constant_queries(reverse('stream-posts'), 4)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(response.data[0]['likes_count'], 1)
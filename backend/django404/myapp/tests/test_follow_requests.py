@@ -0,0 +1,90 @@
+import json
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from unittest.mock import patch, Mock
+import requests
+
+from myapp import nodes
+from myapp.follow_requests import FollowRequestCoalescer
+from myapp.models import Following, Node, Notif
+
+User = get_user_model()
+
+@override_settings(NODE_API_KEY='secret')
+class BatchFollowRequestTestCase(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='testpass')
+        self.url = reverse('remote_create_follow_requests_batch')
+
+    def post_batch(self, items, **extra):
+        return self.client.post(self.url, {'node': 'node2', 'items': items}, format='json', HTTP_X_NODE_API_KEY='secret', **extra)
+
+    def test_batch_returns_per_item_results(self):
+        Following.objects.create(follower=self.bob, followee=self.alice)
+        items = [
+            {'sender_username': 'remote1', 'target_username': 'alice'},
+            {'sender_username': 'remote2', 'target_username': 'alice'},
+            {'sender_username': 'remote1', 'target_username': 'alice'},
+            {'sender_username': 'bob', 'target_username': 'alice'},
+            {'sender_username': 'alice', 'target_username': 'alice'},
+            {'sender_username': 'remote1', 'target_username': 'nobody'},
+            {'sender_username': 'remote1'},
+        ]
+        with self.assertNumQueries(9):
+            response = self.post_batch(items)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'created', 'duplicate', 'already_following', 'self', 'unknown_target', 'invalid'],
+        )
+        self.assertEqual(Notif.objects.filter(receiver=self.alice, notif_type='FOLLOW_REQUEST').count(), 2)
+        self.assertEqual(User.objects.get(username='remote1').home_node, 'node2')
+
+        # Sending the same batch again creates nothing new
+        response = self.post_batch(items[:2])
+        self.assertEqual([result['status'] for result in response.data['results']], ['duplicate', 'duplicate'])
+
+    def test_requires_api_key(self):
+        response = self.client.post(self.url, {'items': []}, format='json', HTTP_X_NODE_API_KEY='wrong')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rejects_oversized_batches(self):
+        response = self.post_batch([{'sender_username': 'a', 'target_username': 'b'}] * 501)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FollowRequestCoalescerTestCase(APITestCase):
+    def setUp(self):
+        nodes.clear()
+        Node.objects.create(name='node2', base_url='http://node2', api_key='key2')
+        Node.objects.create(name='node3', base_url='http://node3', api_key='key3')
+
+    def fake_post(self, method, url, data=None, headers=None, timeout=None):
+        if url.startswith('http://node3'):
+            raise requests.ConnectionError("refused")
+        results = [{**item, 'status': 'created'} for item in json.loads(data)['items']]
+        return Mock(status_code=200, raise_for_status=Mock(), json=Mock(return_value={'results': results}))
+
+    def test_one_request_per_node(self):
+        coalescer = FollowRequestCoalescer()
+        for target in ['a', 'b', 'c']:
+            coalescer.add('alice', target, 'node2')
+        coalescer.add('alice', 'd', 'node3')
+        coalescer.add('alice', 'e', 'node9')
+        self.assertEqual(len(coalescer), 5)
+
+        with patch('requests.Session.request', side_effect=self.fake_post) as post:
+            results = coalescer.flush()
+
+        node2_calls = [call for call in post.call_args_list if call.args[1].startswith('http://node2')]
+        self.assertEqual(len(node2_calls), 1)
+        self.assertEqual(len(json.loads(node2_calls[0].kwargs['data'])['items']), 3)
+        self.assertEqual([result['status'] for result in results['node2']], ['created'] * 3)
+        self.assertEqual(results['node3'], [{'sender_username': 'alice', 'target_username': 'd', 'status': 'failed'}])
+        self.assertEqual(results['node9'][0]['status'], 'failed')
+        self.assertEqual(len(coalescer), 0)
@@ -2,6 +2,8 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from myapp import social_graph
 from myapp.models import Following, Notif
  
 User = get_user_model()
@@ -17,6 +19,9 @@ class FollowersFriendsAPITestCase(APITestCase):
          """
          # Ensure we start fresh (avoid unique constraint errors)
          User.objects.all().delete()
+         # User ids are reused across tests, so cached follow graphs must go too
+         cache.clear()
+         social_graph.clear_local()
  
          self.user = User.objects.create_user(username='user1', email='user1@example.com', password='testpass')
          self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='testpass')
@@ -127,4 +132,66 @@ class FollowersFriendsAPITestCase(APITestCase):
          url = reverse('get_relationship', args=[self.user2.username])
          response = self.client.get(url)
          self.assertEqual(response.status_code, status.HTTP_200_OK)
-         self.assertEqual(response.data["relation"], "NOBODY")
\ No newline at end of file
+         self.assertEqual(response.data["relation"], "NOBODY")
+
+     def test_relationship_pending(self):
+         Notif.objects.create(sender=self.user, receiver=self.user2, notif_type='FOLLOW_REQUEST')
+         url = reverse('get_relationship', args=[self.user2.username])
+         with self.assertNumQueries(1):
+             response = self.client.get(url)
+         self.assertEqual(response.status_code, status.HTTP_200_OK)
+         self.assertEqual(response.data["relation"], "PENDING")
+
+     def test_relationship_unknown_user(self):
+         url = reverse('get_relationship', args=['nobody'])
+         response = self.client.get(url)
+         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+     def test_relationships_batch(self):
+         Following.objects.create(follower=self.user, followee=self.user2)
+         Following.objects.create(follower=self.user3, followee=self.user)
+         url = reverse('get_relationships') + '?username=user1&username=user2&username=user3&username=ghost'
+         with self.assertNumQueries(1):
+             response = self.client.get(url)
+         self.assertEqual(response.status_code, status.HTTP_200_OK)
+         self.assertEqual(response.data, {'user1': 'YOURSELF', 'user2': 'FOLLOWEE', 'user3': 'FOLLOWER'})
+
+     def test_user_listing_with_relationship(self):
+         Following.objects.create(follower=self.user, followee=self.user2)
+         Notif.objects.create(sender=self.user, receiver=self.user3, notif_type='FOLLOW_REQUEST')
+         url = reverse('list_users_excluding_self') + '?with=relationship'
+         with self.assertNumQueries(1):
+             response = self.client.get(url)
+         self.assertEqual(response.status_code, status.HTTP_200_OK)
+         relations = {user['username']: user['relation'] for user in response.data}
+         self.assertEqual(relations, {'user2': 'FOLLOWEE', 'user3': 'PENDING'})
+
+     def test_user_listing_without_relationship(self):
+         response = self.client.get(reverse('get_non_followees'))
+         self.assertNotIn('relation', response.data[0])
+
+     def test_accepting_a_follow_back_makes_friends(self):
+         Following.objects.create(follower=self.user, followee=self.user2)
+         Notif.objects.create(sender=self.user2, receiver=self.user, notif_type='FOLLOW_REQUEST')
+         response = self.client.post(reverse('accept_follower_request', args=[self.user2.username]))
+         self.assertEqual(response.status_code, status.HTTP_200_OK)
+         self.assertEqual(Following.objects.filter(mutual=True).count(), 2)
+
+         response = self.client.get(reverse('get_friends'))
+         self.assertEqual([(row['followee_username'], row['friends']) for row in response.data], [('user2', 'YES')])
+         response = self.client.get(reverse('list-friends'))
+         self.assertEqual([user['username'] for user in response.data], ['user2'])
+         response = self.client.get(reverse('list-non-friend-users'))
+         self.assertEqual([user['username'] for user in response.data], ['user3'])
+
+         # Unfollowing ends the friendship on both rows
+         self.client.delete(reverse('unfollow_user', args=[self.user2.username]))
+         self.assertFalse(Following.objects.filter(mutual=True).exists())
+         self.assertEqual(self.client.get(reverse('list-friends')).data, [])
+
+     def test_add_friend_creates_mutual_follows(self):
+         response = self.client.post(reverse('add_friend', args=[self.user3.username]))
+         self.assertEqual(response.status_code, status.HTTP_200_OK)
+         self.assertTrue(Following.objects.filter(follower=self.user3, followee=self.user, mutual=True).exists())
+         response = self.client.post(reverse('add_friend', args=[self.user3.username]))
+         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
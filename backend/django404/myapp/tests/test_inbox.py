@@ -0,0 +1,223 @@
+import hashlib
+import json
+import uuid
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+import requests
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from myapp import inbox, nodes
+from myapp.models import Node, Post, TimelineEntry
+
+User = get_user_model()
+
+
+def payload(author='remote1', **fields):
+    return {
+        'id': str(uuid.uuid4()),
+        'author_username': author,
+        'title': 'Hello',
+        'content': 'From another node',
+        'visibility': 'PUBLIC',
+        **fields,
+    }
+
+
+class InboxTestCase(APITestCase):
+    def setUp(self):
+        nodes.clear()
+        self.node = Node.objects.create(name='node2', base_url='http://node2.example', api_key='key2')
+        Node.objects.create(name='node3', base_url='http://node3.example', api_key='key3')
+        self.url = reverse('receive_posts_batch')
+
+    def post_batch(self, items, key='key2'):
+        return self.client.post(self.url, items, format='json', HTTP_X_NODE_API_KEY=key)
+
+    def test_batch_returns_per_item_results(self):
+        updated = payload()
+        self.post_batch([updated])
+        updated['title'] = 'Edited'
+        foreign = payload(author='other')
+        User.objects.create(username='other', email='other@example.com', home_node='node3')
+        duplicate = payload()
+        items = [
+            payload(),
+            updated,
+            {'id': 'not-a-uuid', 'author_username': 'remote1'},
+            duplicate,
+            {**duplicate, 'content': 'Second copy'},
+            foreign,
+        ]
+        response = self.post_batch(items)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'updated', 'invalid', 'duplicate', 'created', 'conflict'],
+        )
+        self.assertEqual(Post.objects.get(id=updated['id']).title, 'Edited')
+        self.assertEqual(Post.objects.get(id=duplicate['id']).content, 'Second copy')
+        self.assertFalse(Post.objects.filter(id=foreign['id']).exists())
+        self.assertEqual(User.objects.get(username='remote1').home_node, 'node2')
+        self.assertTrue(TimelineEntry.objects.filter(post_id=duplicate['id'], owner__isnull=True).exists())
+
+    def test_posts_are_upserted_in_one_query(self):
+        items = [payload(author=f'remote{number % 5}') for number in range(50)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_batch(items)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Post.objects.count(), 50)
+        post_writes = [query for query in queries if query['sql'].startswith(('INSERT INTO "myapp_post"', 'UPDATE "myapp_post"'))]
+        self.assertEqual(len(post_writes), 1)
+        user_writes = [query for query in queries if 'INTO "myapp_user"' in query['sql']]
+        self.assertEqual(len(user_writes), 1)
+
+    def test_ndjson(self):
+        lines = [json.dumps(payload()), 'not json', json.dumps(payload())]
+        response = self.client.post(
+            self.url, '\n'.join(lines), content_type='application/x-ndjson', HTTP_X_NODE_API_KEY='key2',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'invalid', 'created'])
+
+    def test_single_post_endpoint(self):
+        post = payload()
+        response = self.client.post(reverse('receive_post'), post, format='json', HTTP_X_NODE_API_KEY='key2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['post_id'], post['id'])
+
+        response = self.client.post(reverse('receive_post'), post, format='json', HTTP_X_NODE_API_KEY='key3')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_requires_node_key(self):
+        self.assertEqual(self.post_batch([payload()], key='wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.post_batch([payload()] * (inbox.MAX_BATCH_SIZE + 1))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostVersionTestCase(APITestCase):
+    def setUp(self):
+        nodes.clear()
+        Node.objects.create(name='node2', base_url='http://node2.example', api_key='key2')
+        self.url = reverse('receive_posts_batch')
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass')
+
+    def post_batch(self, items):
+        # Run the image fetches queued on commit here, not on the image threads
+        with patch.object(inbox, 'fetch_images_later', inbox.fetch_images), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, items, format='json', HTTP_X_NODE_API_KEY='key2')
+        return [result['status'] for result in response.data['results']]
+
+    def test_version_goes_up_only_when_content_changes(self):
+        post = Post.objects.create(author=self.alice, title='Hello', content='First')
+        self.assertEqual(post.version, 1)
+        post.save()
+        post.save(update_fields=['updated'])
+        self.assertEqual(post.version, 1)
+
+        post.content = 'Second'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual(post.version, 2)
+        self.assertEqual(post.content_hash, post.compute_content_hash())
+
+    def test_unchanged_and_older_copies_are_skipped(self):
+        v2 = payload(version=2)
+        self.assertEqual(self.post_batch([v2]), ['created'])
+
+        v1 = {**v2, 'version': 1, 'title': 'Older'}
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post_batch([v2, v1]), ['unchanged', 'duplicate'])
+            self.assertEqual(self.post_batch([v1]), ['stale'])
+        self.assertFalse([query for query in queries if 'INTO "myapp_post"' in query['sql']])
+        self.assertEqual(Post.objects.get(id=v2['id']).title, 'Hello')
+
+        v3 = {**v2, 'version': 3, 'title': 'Newer'}
+        self.assertEqual(self.post_batch([v3]), ['updated'])
+        post = Post.objects.get(id=v2['id'])
+        self.assertEqual((post.version, post.title), (3, 'Newer'))
+
+    def test_content_hash_must_match(self):
+        local = Post.objects.create(author=self.alice, title='Hello', content='From here')
+        sent = {**inbox.post_payload(local), 'id': str(uuid.uuid4()), 'author_username': 'remote1'}
+        self.assertEqual(self.post_batch([sent]), ['created'])
+        self.assertEqual(Post.objects.get(id=sent['id']).content_hash, local.content_hash)
+
+        tampered = {**sent, 'id': str(uuid.uuid4()), 'content': 'Changed on the way'}
+        self.assertEqual(self.post_batch([tampered]), ['invalid'])
+
+    @patch('myapp.media.download_image')
+    def test_missing_image_is_fetched_again_on_resend(self, download_image):
+        image_bytes = b'not really a jpeg'
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        sent = payload(version=1, image_hash=digest, image_url='http://node2.example/media/images/photo.jpg')
+        download_image.return_value = None
+        self.assertEqual(self.post_batch([sent]), ['created'])
+        self.assertEqual(Post.objects.get(id=sent['id']).image_hash, '')
+
+        download_image.return_value = ContentFile(image_bytes, name=f'{digest}.jpg')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post_batch([sent]), ['updated'])
+        self.assertFalse([query for query in queries if 'INTO "myapp_post"' in query['sql']])
+        post = Post.objects.get(id=sent['id'])
+        self.addCleanup(post.image.delete, save=False)
+        self.assertEqual((post.image_hash, post.version), (digest, 1))
+
+        self.assertEqual(self.post_batch([sent]), ['unchanged'])
+        self.assertEqual(download_image.call_count, 2)
+
+    @patch('myapp.media.download_image')
+    def test_images_are_fetched_after_the_response(self, download_image):
+        sent = payload(image_hash='a' * 64, image_url='http://169.254.169.254/latest/meta-data/')
+        with patch.object(inbox, 'fetch_images_later') as fetch_images_later, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, [sent], format='json', HTTP_X_NODE_API_KEY='key2')
+        self.assertEqual(response.data['results'][0]['status'], 'created')
+        download_image.assert_not_called()
+        pending, node = fetch_images_later.call_args.args
+        self.assertEqual(([str(post_id) for post_id, _ in pending], node.key), ([sent['id']], 'node2'))
+
+        # The image comes from the sender's image endpoint, never from the URL it named
+        download_image.return_value = None
+        inbox.fetch_images(pending, node)
+        self.assertEqual(
+            download_image.call_args.args[0],
+            'http://node2.example' + reverse('post_image_by_hash', args=['a' * 64]),
+        )
+
+        # A failing download is logged, not raised
+        download_image.side_effect = requests.ConnectionError('reset')
+        with self.assertLogs('myapp.inbox', 'ERROR'):
+            inbox.fetch_images(pending, node)
+
+    def test_image_fetched_from_the_image_endpoint_keeps_its_type(self):
+        image = BytesIO()
+        Image.new('RGB', (10, 10), color='red').save(image, 'PNG')
+        source = Post.objects.create(author=self.alice, title='Source', image=SimpleUploadedFile('dot.png', image.getvalue()))
+        self.addCleanup(source.image.delete, save=False)
+        image_path = reverse('post_image_by_hash', args=[source.image_hash])
+        served = self.client.get(image_path)
+        body = b''.join(served.streaming_content)
+        # Make the node forget the image, so it has to be downloaded again
+        Post.objects.filter(id=source.id).update(image_hash='')
+
+        response = MagicMock(headers={'Content-Type': served['Content-Type']})
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [body]
+        sent = payload(image_hash=source.image_hash)
+        with patch('requests.Session.get', return_value=response) as get:
+            self.assertEqual(self.post_batch([sent]), ['created'])
+        self.assertEqual(get.call_args.args[0], 'http://node2.example' + image_path)
+
+        received = Post.objects.get(id=sent['id'])
+        self.addCleanup(received.image.delete, save=False)
+        self.assertEqual(received.image.name, f'images/{source.image_hash}.png')
+        self.assertEqual(self.client.get(image_path)['Content-Type'], 'image/png')
@@ -3,6 +3,7 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from myapp.models import Post, Like
+from myapp import counters
 
 User = get_user_model()
 
@@ -26,4 +27,26 @@ class LikeAPITestCase(APITestCase):
         # Second call: removes the like
         response = self.client.post(url, {}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertFalse(Like.objects.filter(post=self.post, author=self.user).exists())
\ No newline at end of file
+        self.assertFalse(Like.objects.filter(post=self.post, author=self.user).exists())
+
+    def test_toggle_like_updates_counter(self):
+        """
+        Test that the denormalized likes_count follows toggles and can be reconciled.
+        """
+        url = reverse('toggle-like', args=[self.post.id])
+        self.client.post(url, {}, format='json')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+        # A stale in-memory copy must not overwrite the counter when saved
+        stale = Post.objects.get(id=self.post.id)
+        self.client.post(url, {}, format='json')
+        stale.title = 'Renamed'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+        Post.objects.filter(id=self.post.id).update(likes_count=42)
+        self.assertEqual(counters.reconcile()['Post.likes_count'], 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
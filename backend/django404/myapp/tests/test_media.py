@@ -0,0 +1,138 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from unittest.mock import MagicMock, patch
+from django.core.files.uploadedfile import SimpleUploadedFile
+from myapp import media
+from myapp.models import Post
+from io import BytesIO
+from PIL import Image
+import hashlib
+import os
+import requests
+import tempfile
+
+User = get_user_model()
+
+def generate_image_bytes():
+    image = BytesIO()
+    Image.new('RGB', (50, 50), color='blue').save(image, 'JPEG')
+    return image.getvalue()
+
+class PostImageByHashTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.image_bytes = generate_image_bytes()
+        self.post = Post.objects.create(
+            author=self.user,
+            title='With image',
+            image=SimpleUploadedFile('photo.jpg', self.image_bytes, content_type='image/jpeg'),
+        )
+        self.digest = hashlib.sha256(self.image_bytes).hexdigest()
+        self.url = reverse('post_image_by_hash', args=[self.digest])
+
+    def tearDown(self):
+        self.post.image.delete(save=False)
+
+    def test_image_hash_is_computed_on_save(self):
+        self.assertEqual(self.post.image_hash, self.digest)
+        self.post.title = 'Renamed'
+        self.post.save()
+        self.assertEqual(Post.objects.get(id=self.post.id).image_hash, self.digest)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.image_bytes)
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_conditional_get(self):
+        for if_none_match in (f'"{self.digest}"', f'"other", W/"{self.digest}"', '*'):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=if_none_match)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Only whole tags match
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"x{self.digest}"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.image_bytes[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.image_bytes)}')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.image_bytes[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.image_bytes)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_private_and_deleted_images_are_not_served(self):
+        Post.objects.filter(id=self.post.id).update(visibility='PRIVATE')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DownloadImageTestCase(APITestCase):
+    def setUp(self):
+        self.image_bytes = generate_image_bytes()
+        self.digest = hashlib.sha256(self.image_bytes).hexdigest()
+        self.temp_files = []
+        create = tempfile.NamedTemporaryFile
+
+        def named_temporary_file(**kwargs):
+            self.temp_files.append(create(**kwargs))
+            return self.temp_files[-1]
+
+        patcher = patch.object(media.tempfile, 'NamedTemporaryFile', side_effect=named_temporary_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def session(self, *chunks, content_type='image/jpeg'):
+        def iter_content(size):
+            for chunk in chunks:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.side_effect = iter_content
+        response.headers = {'Content-Type': content_type}
+        return MagicMock(get=MagicMock(return_value=response)), response
+
+    def test_verified_download(self):
+        session, response = self.session(self.image_bytes[:100], self.image_bytes[100:])
+        file = media.download_image('http://node2.example/image/', self.digest, session=session)
+        with file:
+            self.assertEqual(file.read(), self.image_bytes)
+        response.__exit__.assert_called_once()
+        self.assertEqual(file.name, f'{self.digest}.jpg')
+
+    def test_extension_falls_back_to_the_image_format(self):
+        session, _ = self.session(self.image_bytes, content_type='application/octet-stream')
+        with media.download_image('http://node2.example/image/', self.digest, session=session) as file:
+            self.assertEqual(file.name, f'{self.digest}.jpg')
+            self.assertEqual(file.read(), self.image_bytes)
+
+        not_an_image = b'plain bytes'
+        session, _ = self.session(not_an_image, content_type='')
+        with media.download_image('http://node2.example/image/', hashlib.sha256(not_an_image).hexdigest(), session=session) as file:
+            self.assertEqual(os.path.splitext(file.name)[1], '')
+
+    def test_failures_close_the_response_and_the_temporary_file(self):
+        for chunks in (
+            [self.image_bytes[:100], requests.exceptions.ChunkedEncodingError('cut off')],
+            [b'something else'],
+        ):
+            session, response = self.session(*chunks)
+            self.assertIsNone(media.download_image('http://node2.example/image/', self.digest, session=session))
+            response.__exit__.assert_called_once()
+            self.assertTrue(self.temp_files[-1].closed)
+
+        with patch.object(media, 'MAX_REMOTE_IMAGE_SIZE', 10):
+            session, response = self.session(self.image_bytes)
+            self.assertIsNone(media.download_image('http://node2.example/image/', self.digest, session=session))
+        response.__exit__.assert_called_once()
+        self.assertTrue(self.temp_files[-1].closed)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import requests
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from myapp import federation, node_health, outbox
+from myapp.models import Node, OutboxItem
+
+User = get_user_model()
+
+
+class NodeHealthTestCase(TestCase):
+    def setUp(self):
+        self.up = Node.objects.create(base_url='http://up.example/', username='node', password='secret')
+        self.down = Node.objects.create(base_url='http://down.example', username='node', password='secret')
+
+    def open_circuit(self, node, ago=0):
+        for _ in range(node_health.FAILURE_THRESHOLD):
+            node_health.record_failure(node, 'refused')
+        Node.objects.filter(pk=node.pk).update(
+            circuit_opened_at=timezone.now() - timedelta(seconds=ago),
+            last_failure=timezone.now() - timedelta(seconds=ago),
+        )
+        node.refresh_from_db()
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        for _ in range(node_health.FAILURE_THRESHOLD - 1):
+            node_health.record_failure(self.down, 'refused')
+        self.down.refresh_from_db()
+        self.assertEqual(self.down.consecutive_failures, node_health.FAILURE_THRESHOLD - 1)
+        self.assertEqual(node_health.state(self.down), 'closed')
+
+        node_health.record_failure(self.down, 'refused')
+        self.down.refresh_from_db()
+        self.assertEqual(node_health.state(self.down), 'open')
+        self.assertEqual(self.down.last_error, 'refused')
+
+        node_health.record_success(self.down, 0.1)
+        node_health.record_success(self.down, 0.2)
+        self.down.refresh_from_db()
+        self.assertEqual(node_health.state(self.down), 'closed')
+        self.assertEqual(self.down.consecutive_failures, 0)
+        self.assertIsNotNone(self.down.last_connected)
+        self.assertAlmostEqual(self.down.latency_ms, 120)
+
+    def test_fan_out_skips_open_circuits_and_records_health(self):
+        self.open_circuit(self.down)
+
+        def call(key, node):
+            if key == 'node3':
+                raise requests.ConnectionError('refused')
+            return 'ok'
+
+        result = federation.fan_out(call, nodes={'node2': self.up, 'node3': self.down})
+        self.assertEqual(result.data, {'node2': 'ok'})
+        self.assertEqual(result.status_headers(), {'X-Nodes-Skipped': 'node3'})
+        self.up.refresh_from_db()
+        self.assertIsNotNone(self.up.last_connected)
+        self.assertIsNotNone(self.up.latency_ms)
+
+    @patch('requests.Session.request', return_value=Mock(status_code=200))
+    def test_outbox_waits_for_open_circuits(self, post):
+        self.open_circuit(self.down)
+        outbox.enqueue(self.down, '/receive-post/', {'title': 'Hello'})
+        outbox.enqueue(self.up, '/receive-post/', {'title': 'Hello'})
+
+        self.assertEqual(outbox.drain_once(), 1)
+        self.assertEqual(post.call_args.args[1], 'http://up.example/receive-post/')
+        self.assertEqual(OutboxItem.objects.get(node=self.down).status, 'PENDING')
+
+    @patch('requests.Session.request', return_value=Mock(status_code=200))
+    def test_probe_closes_due_circuits(self, get):
+        self.open_circuit(self.down, ago=node_health.PROBE_INTERVAL + 1)
+        self.open_circuit(self.up)  # Opened just now, so not due yet
+        self.assertEqual(node_health.state(self.down), 'half-open')
+
+        self.assertEqual(node_health.probe_due(), {'http://down.example': True})
+        get.assert_called_once()
+        self.assertEqual(get.call_args.args, ('GET', 'http://down.example/hello/'))
+        self.assertEqual(get.call_args.kwargs['timeout'], node_health.PROBE_TIMEOUT)
+        self.down.refresh_from_db()
+        self.assertEqual(node_health.state(self.down), 'closed')
+
+    def test_admin_shows_circuit_state(self):
+        self.open_circuit(self.down)
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='admin123')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:myapp_node_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'open')
+        self.assertContains(response, 'closed')
@@ -0,0 +1,77 @@
+import threading
+from unittest.mock import Mock, patch
+
+import requests
+from django.test import TestCase
+
+from myapp import node_http
+from myapp.models import Node
+
+
+def response(status_code=200):
+    return Mock(status_code=status_code, headers={})
+
+
+@patch.object(node_http, 'backoff', return_value=0)
+class NodeHttpTestCase(TestCase):
+    def setUp(self):
+        node_http.clear()
+        self.node = Node.objects.create(name='node2', base_url='http://node2.example/', api_key='key2')
+
+    def test_one_pooled_session_per_node(self, backoff):
+        other = Node.objects.create(name='node3', base_url='http://node3.example', api_key='key3')
+        self.assertIs(node_http.session_for(self.node), node_http.session_for(self.node))
+        self.assertIsNot(node_http.session_for(self.node), node_http.session_for(other))
+
+    @patch('requests.Session.request', return_value=response())
+    def test_sends_key_and_default_timeouts(self, request, backoff):
+        node_http.get(self.node, '/hello/')
+        self.assertEqual(request.call_args.args, ('GET', 'http://node2.example/hello/'))
+        self.assertEqual(request.call_args.kwargs['headers']['X-Node-Api-Key'], 'key2')
+        self.assertEqual(request.call_args.kwargs['timeout'], (node_http.CONNECT_TIMEOUT, node_http.READ_TIMEOUT))
+
+    @patch('requests.Session.request')
+    def test_retries_idempotent_calls_only(self, request, backoff):
+        request.side_effect = [requests.ConnectionError('refused'), response(503), response(200)]
+        self.assertEqual(node_http.get(self.node, '/list-all-users/').status_code, 200)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(backoff.call_count, 2)
+
+        request.reset_mock(side_effect=True)
+        request.side_effect = [response(503), response(200)]
+        self.assertEqual(node_http.post(self.node, '/receive-post/', json={}).status_code, 503)
+        self.assertEqual(request.call_count, 1)
+
+        request.reset_mock(side_effect=True)
+        request.side_effect = requests.ConnectionError('refused')
+        with self.assertRaises(requests.ConnectionError):
+            node_http.get(self.node, '/hello/')
+        self.assertEqual(request.call_count, node_http.RETRIES + 1)
+
+    def test_caps_calls_in_flight_per_node(self, backoff):
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def slow(*args, **kwargs):
+            started.release()
+            release.wait(5)
+            return response()
+
+        with patch('requests.Session.request', side_effect=slow), \
+                patch.object(node_http, 'MAX_PER_NODE', 1), patch.object(node_http, 'SLOT_TIMEOUT', 0.1):
+            node_http.clear()
+            thread = threading.Thread(target=node_http.get, args=(self.node, '/hello/'))
+            thread.start()
+            started.acquire(timeout=5)
+            with self.assertRaises(node_http.NodeBusy):
+                node_http.get(self.node, '/hello/')
+            release.set()
+            thread.join()
+
+
+class BackoffTestCase(TestCase):
+    def test_backoff_is_jittered_and_capped(self):
+        for attempt in range(1, 10):
+            delays = {node_http.backoff(attempt) for _ in range(20)}
+            self.assertTrue(all(0 <= delay <= node_http.RETRY_BACKOFF_MAX for delay in delays))
+            self.assertGreater(len(delays), 1)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from myapp import nodes
+from myapp.models import Node, RemoteAuthor
+
+User = get_user_model()
+
+
+@override_settings(INSTANCE_NAME='node1')
+class NodeRegistryTestCase(TestCase):
+    def setUp(self):
+        nodes.clear()
+        self.node1 = Node.objects.create(name='node1', base_url='http://[2605:fd00::1]:8000')
+        self.node2 = Node.objects.create(name='node2', base_url='http://[2605:fd00::2]:8000/', api_key='key2')
+        self.node3 = Node.objects.create(name='node3', base_url='https://node3.example', is_active=False)
+
+    def test_lookups(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(nodes.get('node2'), self.node2)
+            self.assertEqual(nodes.by_url('http://[2605:fd00::2]:8000/post-images/sha256/abc/'), self.node2)
+            self.assertEqual(nodes.by_host('[2605:fd00::2]:8000'), self.node2)
+            self.assertEqual(nodes.by_host('2605:FD00::2'), self.node2)
+            self.assertEqual(nodes.resolve('NODE3.example'), self.node3)
+            self.assertEqual(nodes.by_id(self.node1.pk), self.node1)
+            self.assertIsNone(nodes.resolve('node9'))
+
+    def test_remote_nodes_are_active_peers(self):
+        self.assertEqual(nodes.remote_nodes(), {'node2': self.node2})
+
+    def test_saving_a_node_reloads_the_registry(self):
+        nodes.get('node2')
+        Node.objects.create(name='node4', base_url='http://node4.example')
+        self.assertEqual(nodes.get('node4').base_url, 'http://node4.example')
+
+    def test_home_node(self):
+        User.objects.create(username='stub', email='stub@node2.invalid', home_node='node2')
+        User.objects.create(username='local', email='local@example.com')
+        RemoteAuthor.objects.create(node='node2', username='listed', fetched_at=timezone.now())
+        RemoteAuthor.objects.create(node='node3', username='inactive', fetched_at=timezone.now())
+
+        self.assertEqual(nodes.home_node('stub'), self.node2)
+        self.assertEqual(nodes.home_node('listed'), self.node2)
+        self.assertIsNone(nodes.home_node('local'))
+        self.assertIsNone(nodes.home_node('inactive'))
+        self.assertIsNone(nodes.home_node('unknown'))
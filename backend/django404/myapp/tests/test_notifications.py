@@ -0,0 +1,66 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from myapp.models import Notif
+
+User = get_user_model()
+
+class NotificationInboxTestCase(APITestCase):
+    def setUp(self):
+        # User ids are reused across tests, so cached counts must go too
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.senders = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass')
+            for i in range(3)
+        ]
+        self.notifs = [
+            Notif.objects.create(sender=sender, receiver=self.user, notif_type='FOLLOW_REQUEST')
+            for sender in self.senders
+        ]
+
+    def test_unread_count_is_cached_and_invalidated(self):
+        url = reverse('unread_notif_count')
+        self.assertEqual(self.client.get(url).data, {'unread': 3})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, {'unread': 3})
+
+        self.notifs[0].delete()
+        self.assertEqual(self.client.get(url).data, {'unread': 2})
+        Notif.objects.create(sender=self.senders[0], receiver=self.user, notif_type='LIKE')
+        self.assertEqual(self.client.get(url).data, {'unread': 3})
+
+    def test_mark_read(self):
+        url = reverse('mark_notifs_read')
+        response = self.client.post(url, {'ids': [str(self.notifs[1].id)]}, format='json')
+        self.assertEqual(response.data, {'marked': 1, 'unread': 2})
+        self.assertIsNotNone(Notif.objects.get(id=self.notifs[1].id).read_at)
+
+        response = self.client.post(url, {'all': True}, format='json')
+        self.assertEqual(response.data, {'marked': 2, 'unread': 0})
+
+        response = self.client.post(url, {'ids': 'nope'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_notifications_are_not_marked(self):
+        other = Notif.objects.create(sender=self.user, receiver=self.senders[0], notif_type='FOLLOW_REQUEST')
+        response = self.client.post(reverse('mark_notifs_read'), {'ids': [str(other.id)]}, format='json')
+        self.assertEqual(response.data['marked'], 0)
+        self.assertIsNone(Notif.objects.get(id=other.id).read_at)
+
+    def test_inbox_is_paginated(self):
+        url = reverse('get_follower_request_list')
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(len(response.data), 2)
+        self.assertIn('rel="next"', response['Link'])
+        self.assertIn('read_at', response.data[0])
+
+        response = self.client.get(response['Link'].split(';')[0].strip('<>'))
+        self.assertEqual(len(response.data), 1)
+
+        self.client.post(reverse('mark_notifs_read'), {'ids': [str(self.notifs[0].id)]}, format='json')
+        response = self.client.get(url, {'unread': 'true'})
+        self.assertEqual(len(response.data), 2)
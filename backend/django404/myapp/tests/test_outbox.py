@@ -0,0 +1,67 @@
+import json
+from django.test import TestCase
+from django.utils import timezone
+from unittest.mock import patch, Mock
+import requests
+
+from myapp import outbox
+from myapp.models import Node, OutboxItem
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.node = Node.objects.create(base_url='http://remote.example', username='node', password='secret')
+        self.item = outbox.enqueue(self.node, '/receive-post/', {'title': 'Hello'})
+
+    @patch('requests.Session.request', return_value=Mock(status_code=200))
+    def test_delivers_due_items(self, post):
+        self.assertEqual(outbox.drain_once(), 1)
+        post.assert_called_once()
+        self.assertEqual(post.call_args.args[1], 'http://remote.example/receive-post/')
+        self.assertEqual(json.loads(post.call_args.kwargs['data']), {'title': 'Hello'})
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'SENT')
+        self.assertEqual(outbox.drain_once(), 0)
+
+    @patch('requests.Session.request', side_effect=requests.ConnectionError('refused'))
+    def test_failures_back_off_then_give_up(self, post):
+        outbox.drain_once()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'PENDING')
+        self.assertEqual(self.item.attempts, 1)
+        self.assertGreater(self.item.next_attempt_at, timezone.now())
+        self.assertIn('refused', self.item.last_error)
+
+        # Not due yet, so nothing is retried
+        self.assertEqual(outbox.drain_once(), 0)
+
+        OutboxItem.objects.filter(id=self.item.id).update(attempts=outbox.MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+        outbox.drain_once()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'FAILED')
+
+    def test_claims_no_more_than_the_lease_covers(self):
+        other = Node.objects.create(base_url='http://other.example')
+        for number in range(20):
+            outbox.enqueue(self.node, '/receive-post/', {'number': number})
+        outbox.enqueue(other, '/receive-post/', {})
+
+        per_node = outbox.lease_capacity(outbox.PER_NODE_CONCURRENCY)
+        self.assertLessEqual(per_node / outbox.PER_NODE_CONCURRENCY * outbox.ATTEMPT_TIMEOUT, outbox.CLAIM_LEASE)
+        claimed = outbox.claim_due()
+        self.assertEqual(len(claimed), per_node + 1)
+        self.assertEqual(sum(item.node_id == other.id for item in claimed), 1)
+        self.assertIn(self.item, claimed)  # Oldest first
+
+        # The rest is due again for the next claim
+        self.assertEqual(len(outbox.claim_due()), min(per_node, 21 - per_node))
+
+    @patch('requests.Session.request', return_value=Mock(status_code=200))
+    def test_batch_fits_the_workers(self, post):
+        for number in range(10):
+            outbox.enqueue(self.node, '/receive-post/', {'number': number})
+        self.assertEqual(outbox.drain_once(max_workers=1), outbox.lease_capacity(1))
+
+    def test_backoff_grows_and_is_capped(self):
+        self.assertLess(outbox.backoff(1), outbox.backoff(4))
+        self.assertLessEqual(outbox.backoff(50).total_seconds(), outbox.BACKOFF_MAX * 1.5)
@@ -0,0 +1,69 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from unittest.mock import patch
+from myapp.models import Post
+from myapp.pagination import encode_cursor
+from myapp import pagination
+from django.utils import timezone
+import base64
+import json
+import re
+
+User = get_user_model()
+
+class KeysetPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', email='pager@example.com', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            Post.objects.create(author=self.user, title=f'Post {i}')
+
+    def next_link(self, response):
+        match = re.match(r'<(.+)>; rel="next"', response.get('Link', ''))
+        return match.group(1) if match else None
+
+    def test_walks_every_page_without_duplicates(self):
+        url = reverse('list-user-posts') + '?page_size=2'
+        titles = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles.extend(post['title'] for post in response.data)
+            url = self.next_link(response)
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        expected = Post.objects.filter(author=self.user).order_by('-published', '-id')
+        self.assertEqual(titles, [post.title for post in expected])
+
+    def test_last_page_has_no_link(self):
+        response = self.client.get(reverse('list-user-posts'))
+        self.assertEqual(len(response.data), 5)
+        self.assertIsNone(self.next_link(response))
+
+    @patch.object(pagination, 'MAX_PAGE_SIZE', 3)
+    def test_page_size_is_capped(self):
+        response = self.client.get(reverse('list-user-posts') + '?page_size=100000')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+        self.assertIsNotNone(self.next_link(response))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('list-user-posts') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        for pk in ('not-a-uuid', 42, None):
+            raw = json.dumps({'t': timezone.now().isoformat(), 'id': pk})
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            response = self.client.get(reverse('list-user-posts') + f'?cursor={cursor}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_skips_seen_posts(self):
+        newest = Post.objects.filter(author=self.user).order_by('-published', '-id').first()
+        cursor = encode_cursor(newest.published, newest.id)
+        response = self.client.get(reverse('list-user-posts') + f'?cursor={cursor}')
+        self.assertNotIn(newest.title, [post['title'] for post in response.data])
+        self.assertEqual(len(response.data), 4)
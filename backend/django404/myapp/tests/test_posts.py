@@ -10,6 +10,8 @@ from time import sleep
 from django.core.files.uploadedfile import SimpleUploadedFile
 from PIL import Image
 import io
+import markdown
+from unittest.mock import patch
 
 User = get_user_model()
 
@@ -200,3 +202,19 @@ class PostAPITestCase(APITestCase):
         self.assertIn("<h1>", data.get("content_html", ""))
         self.assertIn("<strong>", data.get("content_html", ""))
         self.assertIn("<img", data.get("content_html", ""))
+
+    def test_content_html_is_stored_and_refreshed_on_edit(self):
+        """Test that rendered markdown is cached on the post and only re-rendered when content changes."""
+        url = reverse('edit-post', args=[self.post.id])
+        self.assertEqual(Post.objects.get(id=self.post.id).content_html, '<p>Original content</p>')
+
+        with patch('myapp.models.markdown.markdown', wraps=markdown.markdown) as render:
+            response = self.client.patch(url, {'title': 'Only the title'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            render.assert_not_called()
+
+            response = self.client.patch(url, {'content': '**New**'}, format='json')
+            self.assertEqual(render.call_count, 1)
+
+        self.assertEqual(response.data['content_html'], '<p><strong>New</strong></p>')
+        self.assertEqual(Post.objects.get(id=self.post.id).content_html, '<p><strong>New</strong></p>')
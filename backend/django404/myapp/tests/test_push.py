@@ -0,0 +1,98 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from myapp import push, timeline
+from myapp.models import Notif, Post
+
+User = get_user_model()
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+class PushTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='testpass')
+        self.other = User.objects.create_user(username='bob', email='bob@example.com', password='testpass')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.broker = push.LocalBroker()
+        push._broker = self.broker
+
+    def tearDown(self):
+        push._broker = None
+
+    async def _poll(self, publish, **params):
+        """Start a long-poll, publish once it is subscribed, and return its response."""
+        params.setdefault('token', self.token)
+        request = asyncio.ensure_future(self.async_client.get(reverse('event_poll'), params))
+        channel = push.user_channel(self.user.id)
+        while channel not in self.broker._subscribers:
+            await asyncio.sleep(0.01)
+        published = publish()
+        if asyncio.iscoroutine(published):
+            await published
+        return await request
+
+    async def test_local_broker_delivers_to_subscribers(self):
+        subscription = self.broker.subscribe(['a', 'b'])
+        self.broker.publish('a', {'event': 'x', 'data': 1})
+        self.broker.publish('c', {'event': 'y', 'data': 2})
+        self.assertEqual(await subscription.get(timeout=1), {'event': 'x', 'data': 1})
+        self.assertIsNone(await subscription.get(timeout=0))
+        await subscription.close()
+        self.assertEqual(self.broker._subscribers, {})
+
+    async def test_poll_returns_published_events(self):
+        message = {'event': 'notif', 'data': {'id': 'n1'}}
+        response = await self._poll(lambda: self.broker.publish(push.user_channel(self.user.id), message))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [message])
+
+    async def test_poll_skips_own_public_posts(self):
+        own = await Post.objects.acreate(author=self.user, title='Mine')
+        theirs = await Post.objects.acreate(author=self.other, title='Theirs')
+
+        @sync_to_async
+        def publish():
+            # The real path: timeline publishes once the transaction commits
+            with self.captureOnCommitCallbacks(execute=True):
+                timeline._announce(own, [None])
+                timeline._announce(theirs, [None])
+        response = await self._poll(publish, timeout='0.2')
+        self.assertEqual([event['data']['post_id'] for event in response.json()], [str(theirs.id)])
+
+    async def test_poll_times_out_empty(self):
+        response = await self.async_client.get(
+            reverse('event_poll'), {'timeout': '0'}, headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(reverse('event_poll'))
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(reverse('event_stream'), {'token': 'bad'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_new_notif_is_published_on_commit(self):
+        broker = push._broker = RecordingBroker()
+        with self.captureOnCommitCallbacks(execute=True):
+            notif = Notif.objects.create(sender=self.other, receiver=self.user, notif_type='LIKE')
+            self.assertEqual(broker.published, [])
+        [(channel, message)] = broker.published
+        self.assertEqual(channel, push.user_channel(self.user.id))
+        self.assertEqual(message['event'], 'notif')
+        self.assertEqual(message['data']['id'], str(notif.id))
+        self.assertEqual(message['data']['sender_username'], 'bob')
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from myapp import social_graph
+from myapp.models import Following
+
+User = get_user_model()
+
+class SocialGraphCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        social_graph.clear_local()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='testpass')
+        self.carol = User.objects.create_user(username='carol', email='carol@example.com', password='testpass')
+        Following.objects.create(follower=self.alice, followee=self.bob)
+
+    def test_reads_are_cached(self):
+        self.assertEqual(social_graph.followee_ids(self.alice.id), {self.bob.id})
+        with self.assertNumQueries(0):
+            self.assertEqual(social_graph.followee_ids(self.alice.id), {self.bob.id})
+
+        # Another process: empty LRU, shared cache still warm
+        social_graph.clear_local()
+        with self.assertNumQueries(0):
+            self.assertEqual(social_graph.followee_ids(self.alice.id), {self.bob.id})
+
+    def test_follow_and_unfollow_invalidate(self):
+        self.assertEqual(social_graph.followee_ids(self.alice.id), {self.bob.id})
+        self.assertEqual(social_graph.follower_ids(self.carol.id), set())
+
+        Following.objects.create(follower=self.alice, followee=self.carol)
+        self.assertEqual(social_graph.followee_ids(self.alice.id), {self.bob.id, self.carol.id})
+        self.assertEqual(social_graph.follower_ids(self.carol.id), {self.alice.id})
+
+        Following.objects.filter(follower=self.alice, followee=self.bob).delete()
+        self.assertEqual(social_graph.followee_ids(self.alice.id), {self.carol.id})
+        self.assertEqual(social_graph.follower_ids(self.bob.id), set())
@@ -0,0 +1,107 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from myapp.models import Post, Following, TimelineEntry
+
+User = get_user_model()
+
+class StreamTimelineTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='testpass')
+        self.author = User.objects.create_user(username='writer', email='writer@example.com', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def stream_titles(self):
+        response = self.client.get(reverse('stream-posts'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data]
+
+    def test_public_post_is_shared_once(self):
+        Post.objects.create(author=self.author, title='Public', visibility='PUBLIC')
+        self.assertEqual(TimelineEntry.objects.count(), 1)
+        self.assertEqual(self.stream_titles(), ['Public'])
+
+    def test_own_posts_are_excluded(self):
+        Post.objects.create(author=self.user, title='Mine', visibility='PUBLIC')
+        self.assertEqual(self.stream_titles(), [])
+
+    def test_follow_and_unfollow_update_stream(self):
+        Post.objects.create(author=self.author, title='Unlisted', visibility='UNLISTED')
+        self.assertEqual(self.stream_titles(), [])
+
+        following = Following.objects.create(follower=self.user, followee=self.author)
+        self.assertEqual(self.stream_titles(), ['Unlisted'])
+
+        following.delete()
+        self.assertEqual(self.stream_titles(), [])
+
+    def test_new_friends_post_fans_out_to_followers(self):
+        Following.objects.create(follower=self.user, followee=self.author)
+        Post.objects.create(author=self.author, title='Friends', visibility='FRIENDS')
+        self.assertEqual(self.stream_titles(), ['Friends'])
+
+    def test_pages_merge_public_and_follower_entries(self):
+        Following.objects.create(follower=self.user, followee=self.author)
+        for number in range(5):
+            visibility = 'PUBLIC' if number % 2 else 'FRIENDS'
+            Post.objects.create(author=self.author, title=f'Post {number}', visibility=visibility)
+
+        titles, url = [], reverse('stream-posts') + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            titles += [post['title'] for post in response.data]
+            url = response.headers.get('Link', '').partition('>')[0].lstrip('<')
+        self.assertEqual(titles, [f'Post {number}' for number in reversed(range(5))])
+
+    def test_soft_delete_and_edit(self):
+        Following.objects.create(follower=self.user, followee=self.author)
+        older = Post.objects.create(author=self.author, title='Older', visibility='FRIENDS')
+        newer = Post.objects.create(author=self.author, title='Newer', visibility='PUBLIC')
+        self.assertEqual(self.stream_titles(), ['Newer', 'Older'])
+
+        # Editing bumps 'updated', which moves the post to the top
+        older.title = 'Edited'
+        older.save()
+        self.assertEqual(self.stream_titles(), ['Edited', 'Newer'])
+
+        newer.visibility = 'DELETED'
+        newer.save()
+        self.assertEqual(self.stream_titles(), ['Edited'])
+        self.assertFalse(TimelineEntry.objects.filter(post=newer).exists())
+
+
+class UnifyFriendshipsMigrationTestCase(TransactionTestCase):
+    """0021 turns User.friends pairs into follows; their timeline entries must come with them."""
+    migrate_from = [('myapp', '0020_following_mutual')]
+    migrate_to = [('myapp', '0021_unify_friendships')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_new_follows_get_timeline_entries(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        old_apps = executor.loader.project_state(self.migrate_from).apps
+        OldUser = old_apps.get_model('myapp', 'User')
+        OldPost = old_apps.get_model('myapp', 'Post')
+        alice = OldUser.objects.create(username='alice', email='alice@example.com')
+        bob = OldUser.objects.create(username='bob', email='bob@example.com')
+        alice.friends.add(bob)
+        friends_post = OldPost.objects.create(author=bob, title='For friends', visibility='FRIENDS')
+        OldPost.objects.create(author=bob, title='Just me', visibility='PRIVATE')
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        new_apps = executor.loader.project_state(self.migrate_to).apps
+        TimelineEntry = new_apps.get_model('myapp', 'TimelineEntry')
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(owner_id=alice.id).values_list('post_id', flat=True)),
+            [friends_post.id],
+        )
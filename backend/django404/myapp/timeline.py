@@ -0,0 +1,110 @@
+# timeline.py
+#
+# Fan-out-on-write home timeline behind /posts/stream/.
+# PUBLIC posts get a single shared TimelineEntry (owner = NULL) that every stream reads,
+# UNLISTED and FRIENDS posts get one TimelineEntry per follower of the author.
+# Everything else (PRIVATE, DRAFT, DELETED or soft-deleted posts) has no entries at all.
+
+from django.db import transaction
+
+from myapp import push
+from myapp.models import Following, Post, TimelineEntry
+
+# Visibilities that are copied into each follower's stream.
+FOLLOWER_VISIBILITIES = ["UNLISTED", "FRIENDS"]
+
+
+def _is_streamable(post):
+    return post.deleted_at is None and post.visibility in ["PUBLIC"] + FOLLOWER_VISIBILITIES
+
+
+def fan_out_post(post):
+    """
+    Bring the timeline entries of a single post in line with its current state.
+    Called whenever a post is created, edited or soft-deleted.
+    """
+    entries = TimelineEntry.objects.filter(post=post)
+
+    with transaction.atomic():
+        if not _is_streamable(post):
+            entries.delete()
+            return
+
+        if post.visibility == "PUBLIC":
+            # One shared row; drop any per-follower copies left from an older visibility.
+            entries.filter(owner__isnull=False).delete()
+            owner_ids = [None]
+        else:
+            entries.filter(owner__isnull=True).delete()
+            owner_ids = list(
+                Following.objects.filter(followee_id=post.author_id).values_list("follower_id", flat=True)
+            )
+            entries.exclude(owner_id__in=owner_ids).delete()
+
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(owner_id=owner_id, post=post, author_id=post.author_id, updated=post.updated)
+                for owner_id in owner_ids
+            ],
+            ignore_conflicts=True,
+        )
+        entries.update(updated=post.updated)
+        _announce(post, owner_ids)
+
+
+def _announce(post, owner_ids):
+    """Tell the open /events/ connections of every affected stream (see myapp/push.py)."""
+    event = {"post_id": post.id, "author_id": post.author_id, "updated": post.updated}
+    if owner_ids == [None]:
+        push.publish_public("stream", event)
+    for owner_id in owner_ids:
+        if owner_id is not None:
+            push.publish_to_user(owner_id, "stream", event)
+
+
+def add_followee_posts(follower_id, followee_id):
+    """
+    Copy the followee's follower-only posts into the follower's stream (a new Following row).
+    """
+    posts = Post.objects.filter(
+        author_id=followee_id,
+        visibility__in=FOLLOWER_VISIBILITIES,
+        deleted_at__isnull=True,
+    ).values_list("id", "updated")
+
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner_id=follower_id, post_id=post_id, author_id=followee_id, updated=updated)
+            for post_id, updated in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def remove_followee_posts(follower_id, followee_id):
+    """
+    Drop the followee's posts from the follower's stream (a deleted Following row).
+    """
+    TimelineEntry.objects.filter(owner_id=follower_id, author_id=followee_id).delete()
+
+
+def stream_entries(user):
+    """
+    The timeline entries visible in the user's stream, as two querysets to be read newest
+    update first and merged (KeysetPagination.paginate_querysets does this): the user's own
+    rows and the shared PUBLIC rows. Each is a single range read on timeline_owner_updated_idx
+    that comes out of the index already in order; OR-ing them would make the database
+    collect and sort every matching row before it could apply the LIMIT.
+    """
+    entries = TimelineEntry.objects.exclude(author=user)
+    return [entries.filter(owner=user), entries.filter(owner__isnull=True)]
+
+
+def rebuild_all():
+    """
+    Recompute every timeline entry from scratch. Used by the rebuild_timelines command.
+    """
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        for post in Post.objects.filter(deleted_at__isnull=True).iterator():
+            fan_out_post(post)
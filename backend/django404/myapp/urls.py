@@ -1,4 +1,5 @@
 from django.urls import path
+from . import async_views
 from .views import (
     register_user,
     login_user,
@@ -21,8 +22,11 @@ from .views import (
     list_user_posts_by_username,
     list_user_posts,
     get_relationship,
+    get_relationships,
     create_follow_request,
     get_follower_request_list,
+    unread_notif_count,
+    mark_notifs_read,
     accept_follower_request,
     deny_follow_request,
     cancel_follower_request,
@@ -50,9 +54,14 @@ from .views import (
     create_follow_request_inter_node,
     remote_create_follow_request,
     remote_get_follower_requests,
+    remote_create_follow_requests_batch,
+    receive_post,
+    receive_posts_batch,
+    federation_changes,
     aggregated_remote_list_all_users,
     accept_follow_request_inter_node,
     aggregated_list_all_users,
+    post_image_by_hash,
     create_follow_request_inter_node_1,
     create_follow_request_inter_node_by_ipv6,
     remote_create_follow_request_by_ipv6
@@ -74,6 +83,7 @@ urlpatterns = [
     path('api/admin/approve-user/<str:username>/', approve_user, name='approve_user'),
     
     # User Relationship Endpoints (by Christine Bao)
+    path('relationships/', get_relationships, name='get_relationships'),
     path('<str:username>/relationship/', get_relationship, name='get_relationship'),  # Get relationship between user and logged-in user
 
     # Following Endpoints (by Christine Bao)
@@ -81,6 +91,10 @@ urlpatterns = [
     path('profile/<str:username>/unfollow/', unfollow_user, name='unfollow_user'),  # Unfollow user whose profile you are visiting
     path('profile/<str:username>/cancel-follow-request/', cancel_follower_request, name='cancel_follewor_request'),  # Cancel follow request
     path('notifs/follow-requests/', get_follower_request_list, name='get_follower_request_list'),  # Get follow request notifications
+    path('notifs/unread-count/', unread_notif_count, name='unread_notif_count'),  # Unread badge count
+    path('notifs/mark-read/', mark_notifs_read, name='mark_notifs_read'),  # Mark notifications as read
+    path('events/', async_views.event_stream, name='event_stream'),  # Server-sent events (ASGI)
+    path('events/poll/', async_views.event_poll, name='event_poll'),  # Long-poll fallback (ASGI)
     path('notifs/follow-requests/<str:username>/accept/', accept_follower_request, name='accept_follower_request'),  # Accept follow request
     path('notifs/follow-requests/<str:username>/deny/', deny_follow_request, name='deny_follow_request'),  # Deny follow request
     path('followers/<str:username>/', get_followers, name='get_followers'),  # Get list of followers for a user
@@ -136,12 +150,23 @@ urlpatterns = [
     path('accept-follow-request-inter-node/<str:username>/', accept_follow_request_inter_node, name='accept_follow_request_inter_node'),
 
     path('aggregated-all-users/', aggregated_list_all_users, name='aggregated_all_users'),
+    path('post-images/sha256/<str:digest>/', post_image_by_hash, name='post_image_by_hash'),
     path('create-follow-request-inter-node_1/<str:username>/', create_follow_request_inter_node_1, name='create_follow_request_inter_node_1'),
 
 
     path('create-follow-request-inter-node/<str:username>/', create_follow_request_inter_node, name='create_follow_request_inter_node'),
     path('create-follow-request/<str:username>/', remote_create_follow_request, name='remote_create_follow_request'),
     path('remote-get-follower-requests/', remote_get_follower_requests, name='remote_get_follower_requests'),
+    path('follow-requests/batch/', remote_create_follow_requests_batch, name='remote_create_follow_requests_batch'),
+    path('receive-post/', receive_post, name='receive_post'),
+    path('receive-posts/batch/', receive_posts_batch, name='receive_posts_batch'),
+    path('federation/changes/', federation_changes, name='federation_changes'),
+
+    # Async versions of the cross-node endpoints (need an ASGI server, see django404/asgi.py)
+    path('async/get-remote-users/', async_views.remote_users, name='async_get_remote_users'),
+    path('async/remote-list-all-users/', async_views.remote_list_all_users, name='async_remote_list_all_users'),
+    path('async/aggregated-all-users/', async_views.aggregated_list_all_users, name='async_aggregated_all_users'),
+    path('async/create-follow-request-inter-node/<str:username>/', async_views.create_follow_request_inter_node, name='async_create_follow_request_inter_node'),
 
 
 
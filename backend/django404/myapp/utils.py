@@ -1,33 +1,26 @@
 # utils.py
 
-import requests
-from django.conf import settings
+from myapp import node_http, nodes
 from myapp.models import User
 
 def get_node_config_for_user(username):
     """
-    Retrieve the node configuration for a user based on their 'home_node' field.
-    If the user is found locally, return the corresponding configuration from settings.NODE_CONFIG.
-    If the user is not found, return None.
+    Retrieve the node a user lives on, from the node registry (myapp/nodes.py).
+    Uses the user's 'home_node' field, or the RemoteAuthor cache for users not stored locally.
     
     Args:
         username (str): The username to look up.
     
     Returns:
-        dict or None: The node configuration dictionary (e.g., {'url': ..., 'api_key': ...}) or None if not found.
+        Node or None: The user's active remote node, or None for local or unknown users.
     """
-    try:
-        user = User.objects.get(username=username)
-        node_identifier = user.home_node  # e.g., "node1" or "node2"
-        return settings.NODE_CONFIG.get(node_identifier)
-    except User.DoesNotExist:
-        return None
+    return nodes.home_node(username)
 
 def send_remote_follow_request(target_username, sender):
     """
     Send a follow request to a remote node for the specified target user.
     
-    This function looks up the target user's node configuration using their home_node field,
+    This function looks up the target user's node in the node registry,
     constructs the appropriate endpoint URL, and sends an HTTP POST request with the sender's information.
     
     Args:
@@ -41,10 +34,8 @@ def send_remote_follow_request(target_username, sender):
     if not node_config:
         return {"error": "Target node configuration not found."}
     
-    endpoint = f"{node_config['url']}/create_follow_request/{target_username}/"
     headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {node_config['api_key']}"
+        "Authorization": f"Bearer {node_config.api_key}"
     }
     payload = {
         "sender_username": sender.username,
@@ -52,7 +43,23 @@ def send_remote_follow_request(target_username, sender):
     }
     
     try:
-        response = requests.post(endpoint, json=payload, headers=headers)
+        response = node_http.post(node_config, f"/create_follow_request/{target_username}/", json=payload, headers=headers)
         return response.json()
     except Exception as e:
         return {"error": str(e)}
+
+def send_remote_follow_requests(sender, target_usernames):
+    """
+    Batch form of send_remote_follow_request: one request per destination node
+    (see FollowRequestCoalescer) instead of one per target.
+    
+    Returns:
+        dict: {node_identifier: [per-target result, ...]}; targets with no known node are left out.
+    """
+    from myapp.follow_requests import FollowRequestCoalescer
+
+    coalescer = FollowRequestCoalescer()
+    for username, node_identifier in User.objects.filter(username__in=target_usernames).values_list("username", "home_node"):
+        if node_identifier:
+            coalescer.add(sender.username, username, node_identifier)
+    return coalescer.flush()
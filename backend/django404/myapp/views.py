@@ -1,13 +1,19 @@
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import status
-from rest_framework.parsers import MultiPartParser, FormParser  # For handling image uploads
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser  # For handling image uploads
 from django.contrib.auth import authenticate, get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
-from .serializers import RegisterUserSerializer, PostSerializer, CommentSerializer, LikeSerializer, FollowingSerializer, NotifSerializer, CommentLikeSerializer
-from .models import Post, Comment, Like, Following, Notif, CommentLike
+from .serializers import RegisterUserSerializer, UserRelationshipSerializer, PostSerializer, CommentSerializer, LikeSerializer, FollowingSerializer, NotifSerializer, CommentLikeSerializer
+from .models import Post, Comment, Like, Following, Notif, CommentLike, Node
+from . import changes, etags, federation, feeds, follow_requests, friendships, inbox, media, node_http, nodes, notifications, outbox, relationships, social_graph, timeline
+from .pagination import KeysetPagination
 import base64
+import logging
 import uuid
 from django.core.files.base import ContentFile
 from django.shortcuts import get_object_or_404
@@ -15,11 +21,14 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from django.http import Http404
 from drf_yasg.utils import swagger_auto_schema
 
 
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 # Define common responses for reuse
 user_registration_responses = {
@@ -358,9 +367,11 @@ def list_posts(request):
     Lists all existing posts (except those marked 'DELETED'), ordered by newest first.
     This endpoint is accessible only to logged-in users.
     """
-    posts = Post.objects.exclude(visibility='DELETED').order_by('-published')
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    posts = feeds.feed_posts().exclude(visibility='DELETED')
+    paginator = KeysetPagination('published')
+    page = paginator.paginate_queryset(posts, request)
+    serializer = PostSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  
@@ -426,9 +437,11 @@ def list_user_posts(request):
     """
     Lists all posts created by the authenticated user.
     """
-    user_posts = Post.objects.filter(author=request.user).order_by('-published')
-    serializer = PostSerializer(user_posts, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    user_posts = feeds.feed_posts().filter(author=request.user)
+    paginator = KeysetPagination('published')
+    page = paginator.paginate_queryset(user_posts, request)
+    serializer = PostSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])  # Only allows GET requests
@@ -443,13 +456,15 @@ def list_user_posts_by_username(request, username):
         return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
     # Fetch PUBLIC posts only (so users can't see deleted/private posts)
-    user_posts = Post.objects.filter(author=user, visibility="PUBLIC").order_by('-published')
+    user_posts = feeds.feed_posts().filter(author=user, visibility="PUBLIC")
+    paginator = KeysetPagination('published')
+    page = paginator.paginate_queryset(user_posts, request)
 
     # Serialize the posts to JSON format
-    serializer = PostSerializer(user_posts, many=True)
+    serializer = PostSerializer(page, many=True)
     
-    # Return the JSON response
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    # Return the JSON response (next page, if any, is in the Link header)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  # Requires user authentication
@@ -460,10 +475,12 @@ def list_public_posts_excluding_user(request):
     user = request.user  # Get the authenticated user
 
     # Fetch public posts excluding those created by the user
-    posts = Post.objects.filter(visibility="PUBLIC").exclude(author=user).order_by('-published')
+    posts = feeds.feed_posts().filter(visibility="PUBLIC").exclude(author=user)
+    paginator = KeysetPagination('published')
+    page = paginator.paginate_queryset(posts, request)
 
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer = PostSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -478,27 +495,29 @@ def get_relationship(request, username):
     
     Expected to return 'message' of the relationship and a 'relation' of either ['YOURSELF', 'FRIEND', 'FOLLOWEE', 'FOLLOWER', 'PENDING']
     'PENDING' is if 'curr_user' sent a follow request.
+    Resolved in a single query by myapp/relationships.py.
 
     @author Christine Bao
     """
-    curr_user = get_object_or_404(User, username=request.user)
-    check_user = get_object_or_404(User, username=username)
-    if curr_user.id == check_user.id:
-        return Response({"message":"This is you", "relation":"YOURSELF"}, status=status.HTTP_200_OK)
-    
-    # Checks if curr_user and check_user have any outgoing follow requests first
-    if Notif.objects.filter(receiver=check_user.id, sender=curr_user.id):
-        return Response({"message":"This is a user you sent a follow request to.", "relation":"PENDING"}, status=status.HTTP_200_OK)
+    relation = relationships.relationship(request.user, username)
+    if relation is None:
+        raise Http404("No User matches the given query.")
+    return Response({"message": relationships.MESSAGES[relation], "relation": relation}, status=status.HTTP_200_OK)
 
-    # Checks if curr_user and check_user have Following relationship
-    if Following.objects.filter(followee_id=check_user.id, follower_id=curr_user.id).exists() and Following.objects.filter(followee_id=curr_user.id, follower_id=check_user.id).exists():
-        return Response({"message":"This is a user you are friends with.", "relation":"FRIEND"}, status=status.HTTP_200_OK)
-    elif Following.objects.filter(followee_id=check_user.id, follower_id=curr_user.id).exists():
-        return Response({"message":"This is a user you follow.", "relation":"FOLLOWEE"}, status=status.HTTP_200_OK)
-    elif Following.objects.filter(followee_id=curr_user.id, follower_id=check_user.id).exists():
-        return Response({"message":"This is a user you are followed by.", "relation":"FOLLOWER"}, status=status.HTTP_200_OK)
 
-    return Response({"message":"This is a user is no one special.", "relation":"NOBODY"}, status=status.HTTP_200_OK)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_relationships(request):
+    """
+    Batch form of get_relationship: ?username=a&username=b&... (at most relationships.MAX_BATCH_SIZE of them).
+    Returns {username: relation} for every username that exists.
+    """
+    usernames = request.query_params.getlist("username")
+    if not usernames:
+        return Response({"error": "At least one 'username' is required."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(usernames) > relationships.MAX_BATCH_SIZE:
+        return Response({"error": f"At most {relationships.MAX_BATCH_SIZE} usernames per request."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(relationships.relationships(request.user, usernames), status=status.HTTP_200_OK)
 
 
 
@@ -542,7 +561,6 @@ def get_local_user_by_username(username):
         return None
 
 from django.conf import settings
-import requests
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -553,7 +571,6 @@ from django.shortcuts import get_object_or_404
 
 from django.conf import settings
 from django.shortcuts import get_object_or_404
-import requests
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -581,33 +598,12 @@ def get_local_user_by_username(username):
 @permission_classes([IsAuthenticated])
 def aggregated_remote_list_all_users(request):
     """
-    Aggregates all users from all remote nodes.
-    It iterates through all nodes in settings.NODE_CONFIG that are not the current node,
-    fetches the users from each remote endpoint (/list-all-users/), and returns the combined list.
+    Aggregates all users from all remote nodes (every active node in the registry except the current one).
+    Users are served from the RemoteAuthor cache, each tagged with its 'remote_node';
+    X-Cache-Stale / X-Cache-Refreshed-At tell how fresh the cached lists are.
     """
-    current_instance = getattr(settings, "INSTANCE_NAME", "node1")
-    
-    # # Filter out the current node from the NODE_CONFIG.
-    remote_nodes = { key: node for key, node in settings.NODE_CONFIG.items() if key != current_instance }
-    
-    for node_key, node in remote_nodes.items():
-        url = f"{node['url']}/list-all-users/"
-        api_keys.append(node['api_key'])
-        headers = {"X-Node-Api-Key": node['api_key']}
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Optionally tag the results with the remote node key.
-                for user in data:
-                    user["remote_node"] = node_key
-
-                aggregated_data.extend(data)
-        except Exception as e:
-            # You may log the exception here.
-            pass
+    cached = federation.cached_remote_authors()
+    return Response(cached.users, status=status.HTTP_200_OK, headers=cached.headers())
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -615,9 +611,9 @@ def aggregated_list_all_users(request):
     """
     Aggregates user lists from all nodes:
       - Gets local users from the current node.
-      - Iterates over all remote nodes (all keys in NODE_CONFIG except the current one),
-        fetches the users from each remote endpoint (/list-all-users/),
-        and returns the combined list.
+      - Adds the users of every remote node from the RemoteAuthor cache
+        (see myapp/federation.py), and returns the combined list.
+    X-Cache-Stale / X-Cache-Refreshed-At tell how fresh the remote part is.
     """
     aggregated_data = []
 
@@ -630,31 +626,39 @@ def aggregated_list_all_users(request):
         user["remote_node"] = settings.INSTANCE_NAME
     aggregated_data.extend(local_data)
 
-    # 2. Get remote users.
-    current_instance = getattr(settings, "INSTANCE_NAME", "node1")
-    remote_nodes = { key: node for key, node in settings.NODE_CONFIG.items() if key != current_instance }
+    # 2. Get remote users (already tagged with their node key) from the cache.
+    cached = federation.cached_remote_authors()
+    aggregated_data.extend(cached.users)
 
-    for node_key, node in remote_nodes.items():
-        url = f"{node['url']}/list-all-users/"
-        headers = {"X-Node-Api-Key": node['api_key']}
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                # Tag each remote user with the node key.
-                for user in data:
-                    user["remote_node"] = node_key
-                aggregated_data.extend(data)
-        except Exception as e:
-            # Optionally log the error
-            pass
+    return Response(aggregated_data, status=status.HTTP_200_OK, headers=cached.headers())
 
-    return Response(aggregated_data, status=status.HTTP_200_OK)
 
+def local_follow_request(sender, receiver):
+    """
+    Follow request between two local users, shared by the sync and async
+    (myapp/async_views.py) inter-node endpoints. Returns (body, status), or None
+    when the notification could not be validated.
+    """
+    if Notif.objects.filter(sender_id=sender.id, receiver_id=receiver.id).exists():
+        return {"message": "You already sent them a follow request!"}, status.HTTP_204_NO_CONTENT
+    if receiver.id == sender.id:
+        return {"message": "You cannot send yourself a follow request!"}, status.HTTP_403_FORBIDDEN
+    if Following.objects.filter(followee_id=receiver.id, follower_id=sender.id).exists():
+        return {"error": "Already following this user"}, status.HTTP_403_FORBIDDEN
 
-def get_destination_node_from_request():
-    # For testing, we assume the target user is on node2.
-    return "node2"
+    data = {
+        "receiver": receiver.id,
+        "sender": sender.id,
+        "notif_type": "FOLLOW_REQUEST"
+    }
+    try:
+        serializer = NotifSerializer(data=data)
+        if serializer.is_valid():
+            serializer.save(receiver_id=receiver.id, sender_id=sender.id, notif_type="FOLLOW_REQUEST")
+            return {"message": "Follow Request Sent!"}, status.HTTP_200_OK
+    except Exception as e:
+        return {"error": f"Follow Request couldn't be made: {str(e)}"}, status.HTTP_400_BAD_REQUEST
+    return None
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -671,66 +675,22 @@ def create_follow_request_inter_node(request, username):
     
     # --- LOCAL PROCESSING ---
     if receiver:
-        if Notif.objects.filter(sender_id=sender.id, receiver_id=receiver.id).exists():
-            return Response({"message": "You already sent them a follow request!"}, status=status.HTTP_204_NO_CONTENT)
-        if receiver.id == sender.id:
-            return Response({"message": "You cannot send yourself a follow request!"}, status=status.HTTP_403_FORBIDDEN)
-        if Following.objects.filter(followee_id=receiver.id, follower_id=sender.id).exists():
-            return Response({"error": "Already following this user"}, status=status.HTTP_403_FORBIDDEN)
-        
-        data = {
-            "receiver": receiver.id,
-            "sender": sender.id,
-            "notif_type": "FOLLOW_REQUEST"
-        }
-        try:
-            serializer = NotifSerializer(data=data)
-            if serializer.is_valid():
-                serializer.save(receiver_id=receiver.id, sender_id=sender.id, notif_type="FOLLOW_REQUEST")
-                return Response({"message": "Follow Request Sent!"}, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"error": f"Follow Request couldn't be made: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+        result = local_follow_request(sender, receiver)
+        if result is not None:
+            return Response(result[0], status=result[1])
     
     # --- REMOTE PROCESSING (Forwarding) ---
-    # Determine the current instance (e.g., "node1", "node2", "node3")
-    current_instance = getattr(settings, "INSTANCE_NAME", "node1")
-    remote_node = None
-
-    # Determine the destination node (this function must be implemented)
-    destination_node = get_destination_node_from_request()  # IMPLEMENT THIS FUNCTION
-    
-    # Set remote node configuration based on current instance and destination
-    if current_instance == "node1":
-        if destination_node == "node2":
-            remote_node = settings.NODE_CONFIG.get("node2")
-        elif destination_node == "node3":
-            remote_node = settings.NODE_CONFIG.get("node3")
-    elif current_instance == "node2":
-        if destination_node == "node1":
-            remote_node = settings.NODE_CONFIG.get("node1")
-        elif destination_node == "node3":
-            remote_node = settings.NODE_CONFIG.get("node3")
-    elif current_instance == "node3":
-        if destination_node == "node1":
-            remote_node = settings.NODE_CONFIG.get("node1")
-        elif destination_node == "node2":
-            remote_node = settings.NODE_CONFIG.get("node2")
-    
+    # The node the target user lives on, from the node registry (myapp/nodes.py)
+    remote_node = nodes.home_node(username)
     if not remote_node:
         return Response({"error": "Remote node configuration not found."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    # Build the remote URL (assuming the remote node has an endpoint set up similarly)
-    remote_url = f"{remote_node['url']}/create-follow-request/{username}/"
-    
     # Build the payload with sender's username (as a string)
     payload = {"sender_username": request.user.username}
     
-    headers = {
-        "X-Node-Api-Key": remote_node['api_key']
-    }
-    
     try:
-        remote_response = requests.post(remote_url, json=payload, headers=headers, timeout=5)
+        # Sent through the shared per-node client (myapp/node_http.py), with the node's API key
+        remote_response = node_http.post(remote_node, f"/create-follow-request/{username}/", json=payload)
         if remote_response.status_code == 200:
             return Response(remote_response.json(), status=status.HTTP_200_OK)
         else:
@@ -788,6 +748,29 @@ def remote_create_follow_request(request, username):
         return Response({"error": f"Failed to create remote follow request: {str(e)}"}, status=400)
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Remote endpoint does not require a JWT.
+def remote_create_follow_requests_batch(request):
+    """
+    Batch version of remote_create_follow_request for inter-node traffic.
+    Expects {"node": "<sending node>", "items": [{"sender_username": ..., "target_username": ...}, ...]}
+    and creates every follow request in one transaction.
+    Returns {"results": [...]} with a per-item "status" (see myapp/follow_requests.py).
+    """
+    provided_key = request.headers.get("X-Node-Api-Key")
+    if provided_key != settings.NODE_API_KEY:
+        return Response({"error": "Invalid API key"}, status=403)
+
+    items = request.data.get("items")
+    if not isinstance(items, list):
+        return Response({"error": "'items' must be a list."}, status=400)
+    if len(items) > follow_requests.MAX_BATCH_SIZE:
+        return Response({"error": f"At most {follow_requests.MAX_BATCH_SIZE} items per batch."}, status=400)
+
+    results = follow_requests.create_follow_requests(items, sender_node=request.data.get("node"))
+    return Response({"results": results}, status=200)
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])  # No JWT required for inter-node calls.
 def remote_get_follower_requests(request):
@@ -819,24 +802,56 @@ def get_follower_request_list(request):
     'receiver' is user receiving notifs (user logged in)
     Get reciever username from request data
     Return list of Notifs of type follower_request
+    Newest first, cursor-paginated (next page in the Link header); ?unread=true returns only unread ones.
     
     @author Christine Bao
     """
     receiver = get_object_or_404(User, username=request.user)
 
-    try:
-        follower_request_list = (
-            Notif.objects
-                .filter(receiver=receiver.id)
-                .order_by("-created_at")
-            )
+    follower_request_list = Notif.objects.filter(receiver=receiver.id).select_related("sender")
+    if request.query_params.get("unread") == "true":
+        follower_request_list = follower_request_list.filter(read_at__isnull=True)
 
-        serializer = NotifSerializer(follower_request_list, many=True)
+    paginator = KeysetPagination("created_at")
+    page = paginator.paginate_queryset(follower_request_list, request)
+    serializer = NotifSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
-    except:
-        return Response({"error":"Error: Unable to retrieve follower requests"}, status=status.HTTP_400_BAD_REQUEST)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def unread_notif_count(request):
+    """
+    Number of unread notifications of the logged-in user, for the UI badge.
+    Served from a cached counter (see myapp/notifications.py).
+    """
+    return Response({"unread": notifications.unread_count(request.user.id)}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_notifs_read(request):
+    """
+    Mark notifications of the logged-in user as read.
+    Expects {"ids": [...]} for specific notifications or {"all": true} for the whole inbox.
+    Returns how many were marked and the new unread count.
+    """
+    ids = request.data.get("ids")
+    if request.data.get("all") is True:
+        ids = None
+    elif not isinstance(ids, list):
+        return Response({"error": "Send a list of 'ids' or \"all\": true."}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        try:
+            ids = [uuid.UUID(str(notif_id)) for notif_id in ids]
+        except ValueError:
+            return Response({"error": "Invalid notification id."}, status=status.HTTP_400_BAD_REQUEST)
+
+    marked = notifications.mark_read(request.user, ids)
+    return Response(
+        {"marked": marked, "unread": notifications.unread_count(request.user.id)},
+        status=status.HTTP_200_OK
+    )
 
 
 @api_view(['POST'])
@@ -882,13 +897,7 @@ def accept_follow_request_inter_node(request, username):
     
     data = {"followee": followee.id, "follower": follower.id}
     try:
-        # If mutual following exists, mark the relationship as friends.
-        if Following.objects.filter(followee_id=follower.id, follower_id=followee.id).exists():
-            relationship = Following.objects.get(followee_id=follower.id, follower_id=followee.id)
-            relationship.friends = "YES"
-            relationship.save()
-            data["friends"] = "YES"
-        
+        # If the follow is mutual, both rows are marked as friends by myapp/friendships.py.
         serializer = FollowingSerializer(data=data)
         if serializer.is_valid():
             serializer.save(followee_id=followee.id, follower_id=follower.id)
@@ -931,16 +940,9 @@ def accept_follower_request (request, username):
     if Following.objects.filter(followee_id=followee.id, follower_id=follower.id).exists():
         return Response({"error": "Already following this user"}, status=status.HTTP_403_FORBIDDEN)
 
-    # If not friends and following
     data = {"followee": followee.id, "follower": follower.id}
     try:
-        # Mark users as friends if they follow each other
-        if Following.objects.filter(followee_id=follower.id, follower_id=followee.id).exists():
-            relationship = Following.objects.get(followee_id=follower.id, follower_id=followee.id)
-            relationship.friends = 'YES'
-            relationship.save()
-            data = {"followee": followee.id, "follower": follower.id, "friends":"YES"}
-            
+        # Users who follow each other become friends (Following.mutual, set by myapp/friendships.py)
         serializer = FollowingSerializer(data=data)
         if serializer.is_valid():
             serializer.save(followee_id = followee.id, follower_id = follower.id)
@@ -1066,14 +1068,9 @@ def unfollow_user(request, username):
         )
 
     # 3. Remove the following relationship
+    # (the reverse relationship, if any, stops being a friendship - see myapp/friendships.py)
     existing_rel.delete()
 
-    # If there's a reverse relationship (the other user following you) in "friends" mode, set it to "NO"
-    reverse_rel = Following.objects.filter(followee_id=follower.id, follower_id=followee.id).first()
-    if reverse_rel:
-        reverse_rel.friends = 'NO'
-        reverse_rel.save()
-
     return Response(
         {"message": "You have unfollowed this user."}, 
         status=status.HTTP_200_OK
@@ -1131,22 +1128,33 @@ def get_followees(request, username):
     except:
         return Response({"message":"Error: Cannot retrieve followers"}, status=status.HTTP_400_BAD_REQUEST)
 
+def serialize_users(request, users):
+    """
+    Serialized user list for the user listing endpoints.
+    With ?with=relationship each user also gets the viewer's 'relation' to them, computed by
+    Exists() subqueries in the same query (see myapp/relationships.py).
+    """
+    if relationships.requested(request):
+        users = relationships.with_relationship(users, request.user)
+        return UserRelationshipSerializer(users, many=True, context={'request': request}).data
+    return RegisterUserSerializer(users, many=True).data
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_non_followees(request):
     """
     Returns a list of all users that the current user is not following.
     Excludes the current user from the list.
+    Supports ?with=relationship (see serialize_users).
     """
     current_user = request.user
-    # Get IDs of all users that the current user is following
-    followed_user_ids = Following.objects.filter(follower=current_user).values_list('followee_id', flat=True)
+    # Get IDs of all users that the current user is following (cached, see myapp/social_graph.py)
+    followed_user_ids = social_graph.followee_ids(current_user.id)
     
     # Query all users excluding those already followed and excluding self
     non_followees = User.objects.exclude(id__in=followed_user_ids).exclude(id=current_user.id)
     
-    serializer = RegisterUserSerializer(non_followees, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(serialize_users(request, non_followees), status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -1165,8 +1173,8 @@ def get_friends(request):
     
     try:
         followers = (
-            Following.objects
-                .filter(follower_id=author.id, friends='YES')
+            friendships.friend_follows(author)
+                .select_related("follower", "followee")
                 .order_by("-followed_at")
         )
 
@@ -1191,12 +1199,13 @@ def add_friend(request, username):
         return Response({"error": "Cannot add yourself as a friend."}, status=400)
 
     # Check if they are already friends
-    if target_user in request.user.friends.all():
+    if friendships.are_friends(request.user, target_user):
         return Response({"error": "You are already friends with this user."}, status=400)
 
     # Create the mutual friendship
-    request.user.friends.add(target_user)
-    target_user.friends.add(request.user)
+    with transaction.atomic():
+        friendships.befriend(request.user, target_user)
+    return Response({"message": "You are now friends with this user."}, status=200)
 
 
 
@@ -1204,28 +1213,21 @@ from rest_framework.views import APIView
 from django.conf import settings
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-import requests
 
 class RemoteUsersView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        remote_node = settings.NODE_CONFIG.get("node2")
+        # ?node= picks the node by name, URL or host; default settings.DEFAULT_PEER_NODE
+        remote_node = federation.peer_node(request.query_params.get("node"))
         if not remote_node:
-            return Response({"error": "Node 2 configuration not found in settings."}, status=500)
+            return Response({"error": "Remote node not found."}, status=404)
 
-        url = f"{remote_node['url']}/users/"
-        headers = {
-            "X-Node-Api-Key": remote_node['api_key']
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            if response.status_code == 200:
-                return Response(response.json(), status=200)
-            return Response({"error": "Failed to fetch users from node2."}, status=response.status_code)
-        except Exception as e:
-            return Response({"error": f"Exception occurred: {str(e)}"}, status=500)
+        # Served from the RemoteAuthor cache (see myapp/federation.py)
+        cached = federation.cached_remote_authors({remote_node.key: remote_node})
+        if cached.fan_out.failed or cached.fan_out.timed_out or cached.fan_out.skipped:
+            return Response({"error": f"Failed to fetch users from {remote_node.key}."}, status=502)
+        return Response(cached.users, status=200, headers=cached.headers())
 
 class HelloView(APIView):
     # Allow anyone to access this endpoint
@@ -1248,7 +1250,7 @@ def list_friends(request):
     TODO - to be removed
     Get the friends of the authenticated user
     """
-    friends = request.user.friends.all()
+    friends = friendships.friends_of(request.user)
     serializer = RegisterUserSerializer(friends, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -1259,24 +1261,25 @@ def friends_posts(request):
     Show the posts made by all the users the authenticated user is following.
     """
     user = request.user
-    # First, get all follow relationships where the current user is the follower.
-    followees_ids = Following.objects.filter(follower=user).values_list("followee_id", flat=True)
+    # First, get the IDs of everyone the current user follows (cached, see myapp/social_graph.py).
+    followees_ids = social_graph.followee_ids(user.id)
 
     # Then, filter posts by authors in followees_ids, only returning PUBLIC, UNLISTED, or FRIENDS.
     # Exclude DELETED and DRAFT.
     posts = (
-        Post.objects
+        feeds.feed_posts()
             .filter(
                 author_id__in=followees_ids,
                 visibility__in=["PUBLIC", "UNLISTED", "FRIENDS"]
             )
             .exclude(visibility="DELETED")
             .exclude(visibility="DRAFT")
-            .order_by("-published")
     )
+    paginator = KeysetPagination("published")
+    page = paginator.paginate_queryset(posts, request)
 
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data, status=200)
+    serializer = PostSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 
@@ -1304,16 +1307,12 @@ def register_user_as_admin(request):
         return Response({"message": "User registered successfully"}, status=201)
     return Response(serializer.errors, status=400)
 
-from django.db.models import Q
-
-from django.db.models import Q
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import Post, Following
 from .serializers import PostSerializer
 
-from django.db.models import Q
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -1329,26 +1328,17 @@ def stream_posts(request):
       - UNLISTED posts made by users you follow (via the Following model)
       - FRIENDS posts made by users you follow
     Excludes posts with visibility "DELETED" and sorts posts by the most recent update.
+    The stream is read from the precomputed TimelineEntry rows (see myapp/timeline.py).
     """
     user = request.user
 
-    # Get IDs of all followees for the current user.
-    followee_ids = Following.objects.filter(follower=user).values_list("followee_id", flat=True)
-
-    posts = Post.objects.filter(
-        (
-          Q(visibility="PUBLIC") & ~Q(author=user)
-        ) |
-        (
-          Q(visibility="UNLISTED", author__in=followee_ids)
-        ) |
-        (
-          Q(visibility="FRIENDS", author__in=followee_ids)
-        )
-    ).exclude(visibility="DELETED").order_by("-updated")
+    paginator = KeysetPagination("updated")
+    entries = paginator.paginate_querysets(timeline.stream_entries(user), request)
+    prefetch_related_objects(entries, Prefetch("post", queryset=feeds.feed_posts()))
+    posts = [entry.post for entry in entries]
 
     serializer = PostSerializer(posts, many=True, context={'request': request})
-    return Response(serializer.data)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
@@ -1356,56 +1346,44 @@ def stream_posts(request):
 def list_users_excluding_self(request):
     """
     Lists all users excluding the authenticated user.
+    Supports ?with=relationship (see serialize_users).
     """
     # Get all users except the currently logged-in user
     users = User.objects.exclude(id=request.user.id)
     
     # Serialize user data
-    serializer = RegisterUserSerializer(users, many=True)
-
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(serialize_users(request, users), status=status.HTTP_200_OK)
 
 class RemoteListAllUsersView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Determine current instance name; default to "node1" if not set.
-        current_instance = getattr(settings, "INSTANCE_NAME", "node1")
-        
-        # Choose the remote node: if we're node1, target node2; if node2, target node1.
-        if current_instance == "node1":
-            remote_node = settings.NODE_CONFIG.get("node2")
-        elif current_instance == "node2":
-            remote_node = settings.NODE_CONFIG.get("node1")
-        else:
-            return Response({"error": "Current node is not recognized."}, status=500)
-
+        # ?node= picks the node by name, URL or host; default settings.DEFAULT_PEER_NODE
+        remote_node = federation.peer_node(request.query_params.get("node"))
         if not remote_node:
-            return Response({"error": "Remote node configuration not found."}, status=500)
-
-        # Build the URL to the remote node's endpoint.
-        url = f"{remote_node['url']}/list-all-users/"
-        headers = {
-            "X-Node-Api-Key": remote_node['api_key']
-        }
+            return Response({"error": "Remote node configuration not found."}, status=404)
 
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            if response.status_code == 200:
-                return Response(response.json(), status=200)
-            return Response({"error": "Failed to fetch users from remote node."}, status=response.status_code)
-        except Exception as e:
-            return Response({"error": f"Exception occurred: {str(e)}"}, status=500)
+        # Served from the RemoteAuthor cache of the remote node's /list-all-users/
+        cached = federation.cached_remote_authors({remote_node.key: remote_node})
+        if cached.fan_out.failed or cached.fan_out.timed_out or cached.fan_out.skipped:
+            return Response({"error": "Failed to fetch users from remote node."}, status=502)
+        return Response(cached.users, status=200, headers=cached.headers())
 
 @api_view(['GET'])
 @permission_classes([AllowAny]) 
 def list_all_users(request):
     """
     Lists all users.
+    Sends an ETag so other nodes refreshing their RemoteAuthor cache can use If-None-Match
+    and get an empty 304 when nothing changed.
+    Logged-in users can add ?with=relationship (see serialize_users).
     """
     users = User.objects.all()  # Retrieves all users
-    serializer = RegisterUserSerializer(users, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    data = serialize_users(request, users)
+    etag = federation.etag_for(data)
+    if etags.if_none_match(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(data, status=status.HTTP_200_OK, headers={"ETag": etag})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  # ✅ Requires authentication
@@ -1414,25 +1392,26 @@ def list_non_friend_users(request):
     TODO - to be changed to accomadate new Following model for followers-only and friends-only posts
 
     Lists all users excluding the authenticated user and their friends.
+    Supports ?with=relationship (see serialize_users).
     """
     # Get all friends of the authenticated user
-    friends = request.user.friends.all()
+    friends = friendships.friend_follows(request.user).values("followee_id")
 
     # Exclude the authenticated user and their friends from the user list
-    non_friends = User.objects.exclude(id__in=friends.values_list('id', flat=True)).exclude(id=request.user.id)
+    non_friends = User.objects.exclude(id__in=friends).exclude(id=request.user.id)
 
     # Serialize user data
-    serializer = RegisterUserSerializer(non_friends, many=True)
-
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(serialize_users(request, non_friends), status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def draft_posts(request):
     # Return draft posts for the logged-in user.
-    posts = Post.objects.filter(author=request.user, visibility="DRAFT").order_by("-published")
-    serializer = PostSerializer(posts, many=True, context={'request': request})
-    return Response(serializer.data)
+    posts = feeds.feed_posts().filter(author=request.user, visibility="DRAFT")
+    paginator = KeysetPagination("published")
+    page = paginator.paginate_queryset(posts, request)
+    serializer = PostSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -1448,7 +1427,7 @@ def list_comments(request, post_id):
     except Post.DoesNotExist:
         return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
     
-    comments = post.comments.all().order_by('-created')
+    comments = feeds.with_comment_data(post.comments.all()).order_by('-created')
     serializer = CommentSerializer(comments, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -1464,7 +1443,9 @@ def create_comment(request, post_id):
     
     serializer = CommentSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(post=post, author=request.user)
+        # Post.comments_count is bumped in the same transaction (myapp/signals.py)
+        with transaction.atomic():
+            serializer.save(post=post, author=request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1496,11 +1477,11 @@ def create_like(request, post_id):
     except Post.DoesNotExist:
         return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
     
-    # Check if the user already liked the post
-    if Like.objects.filter(post=post, author=request.user).exists():
+    # (post, author) is unique, so this is a single insert-or-fetch
+    with transaction.atomic():
+        like, created = Like.objects.get_or_create(post=post, author=request.user)
+    if not created:
         return Response({"error": "Already liked"}, status=status.HTTP_400_BAD_REQUEST)
-    
-    like = Like.objects.create(post=post, author=request.user)
     serializer = LikeSerializer(like)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -1515,14 +1496,14 @@ def toggle_like(request, post_id):
     except Post.DoesNotExist:
         return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Filter by both post and the requesting user
-    existing_like = Like.objects.filter(post=post, author=request.user).first()
-    if existing_like:
-        existing_like.delete()
-        return Response({"message": "You unliked this post."}, status=status.HTTP_200_OK)
-    else:
-        new_like = Like.objects.create(post=post, author=request.user)
-        # optionally serialize new_like
+    # Filter by both post and the requesting user; (post, author) is unique.
+    # Post.likes_count is adjusted with F() in the same transaction (myapp/signals.py).
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(post=post, author=request.user).delete()
+        if deleted:
+            return Response({"message": "You unliked this post."}, status=status.HTTP_200_OK)
+        # get_or_create also absorbs a concurrent like of the same post
+        Like.objects.get_or_create(post=post, author=request.user)
         return Response({"message": "You liked this post."}, status=status.HTTP_201_CREATED)
     
 
@@ -1537,12 +1518,12 @@ def toggle_comment_like(request, post_id, comment_id):
     except Comment.DoesNotExist:
         return Response({"error": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    existing_like = CommentLike.objects.filter(comment=comment, author=request.user).first()
-    if existing_like:
-        existing_like.delete()
-        return Response({"message": "You unliked this comment."}, status=status.HTTP_200_OK)
-    else:
-        CommentLike.objects.create(comment=comment, author=request.user)
+    # Comment.likes_count is adjusted with F() in the same transaction (myapp/signals.py)
+    with transaction.atomic():
+        deleted, _ = CommentLike.objects.filter(comment=comment, author=request.user).delete()
+        if deleted:
+            return Response({"message": "You unliked this comment."}, status=status.HTTP_200_OK)
+        CommentLike.objects.get_or_create(comment=comment, author=request.user)
         return Response({"message": "You liked this comment."}, status=status.HTTP_201_CREATED)
 
 ##############################################################################################################
@@ -1604,8 +1585,9 @@ class CrossNodePostViewSet(viewsets.ModelViewSet):
     
     def sync_post_to_followers(self, post):
         """
-        Sync post to remote followers
-        In a production environment, this would be a background task
+        Sync post to remote followers.
+        Only queues one OutboxItem per node (committed with the request); the drain_outbox
+        worker does the actual delivery, with retries (see myapp/outbox.py).
         """
         try:
             # Skip for non-local posts or private posts
@@ -1626,40 +1608,25 @@ class CrossNodePostViewSet(viewsets.ModelViewSet):
                     followers_by_node[follower.remote_node] = []
                 followers_by_node[follower.remote_node].append(follower.remote_username)
             
-            # Get active nodes
-            active_nodes = Node.objects.filter(is_active=True)
-            node_configs = {}
-            
-            # Convert Node models to config dictionary
-            for node in active_nodes:
-                node_configs[node.id] = {
-                    'url': node.base_url,
-                    'username': node.username,
-                    'password': node.password  # Assuming this is stored securely
-                }
-            
             # For each node with followers
             for node_id, followers in followers_by_node.items():
                 # Skip if already synced and no changes needed
                 if node_id in post.remote_nodes_sent and not post.needs_sync:
                     continue
                 
-                # Get node configuration
-                node_config = node_configs.get(node_id)
-                if not node_config:
+                # Get node configuration from the node registry (myapp/nodes.py)
+                node = nodes.by_id(node_id)
+                if not node or not node.is_active:
                     logger.error(f"No configuration found for node: {node_id}")
                     continue
                 
                 # Prepare post data
-                post_data = post.to_dict()
+                # Only a reference to the image is sent; the node fetches it once by hash
+                post_data = inbox.post_payload(post, self.request)
                 post_data['followers'] = followers
                 
-                # Add image if exists and post not deleted
-                if post.image and not post.is_deleted():
-                    post_data['image_content'] = self.get_base64_file(post.image)
-                
-                # Send to remote node
-                self.send_post_to_remote_node(node_id, node_config, post_data, post)
+                # Queue for delivery to the remote node
+                outbox.enqueue(node, "/receive-post/", post_data, post=post)
             
             # Mark post as no longer needing sync
             post.needs_sync = False
@@ -1667,114 +1634,101 @@ class CrossNodePostViewSet(viewsets.ModelViewSet):
                 
         except Exception as e:
             logger.error(f"Error syncing post {post.id} to followers: {str(e)}")
-    
-    def get_base64_file(self, file_field):
-        """Convert file to base64 for transmission"""
-        try:
-            file_field.open()
-            file_content = file_field.read()
-            file_field.close()
-            return base64.b64encode(file_content).decode('utf-8')
-        except Exception as e:
-            logger.error(f"Error encoding file: {str(e)}")
-            return None
-    
-    def send_post_to_remote_node(self, node_id, node_config, post_data, post):
-        """Send post to a remote node"""
-        remote_url = f"{node_config['url']}/receive-post/"
-        
-        # Authentication method depends on your implementation
-        # Option 1: Use API key authentication
-        headers = {
-            "X-Node-Api-Key": node_config.get('api_key', ''),
-            "Content-Type": "application/json"
-        }
-        
-        # Option 2: Use basic auth or token auth as needed
-        auth = None
-        if 'username' in node_config and 'password' in node_config:
-            auth = (node_config['username'], node_config['password'])
-        
-        try:
-            # Use appropriate auth method
-            if auth:
-                response = requests.post(
-                    remote_url, 
-                    json=post_data,
-                    auth=auth,
-                    timeout=10
-                )
-            else:
-                response = requests.post(
-                    remote_url, 
-                    json=post_data,
-                    headers=headers,
-                    timeout=10
-                )
-            
-            if response.status_code == 200:
-                # Record that we've sent to this node
-                post.add_remote_node_sent(node_id)
-                logger.info(f"Successfully sent post {post.id} to node {node_id}")
-            else:
-                logger.error(f"Failed to send post to node {node_id}: {response.status_code} - {response.text}")
-                
-        except Exception as e:
-            logger.error(f"Exception sending post to node {node_id}: {str(e)}")
 
-@api_view(['POST'])
-def receive_post(request):
+def authenticate_node(request):
     """
-    Endpoint to receive posts from remote nodes
+    The active Node sending 'request', or None.
+    Nodes authenticate with their X-Node-Api-Key header, or as a user named like the node (basic auth).
     """
-    # Validate authentication
-    # Option 1: API key validation
     api_key = request.headers.get('X-Node-Api-Key')
     if api_key:
-        # Find the node with this API key
-        try:
-            node = Node.objects.get(api_key=api_key, is_active=True)
-            sender_node_id = node.id
-        except Node.DoesNotExist:
-            return Response({"error": "Invalid API key"}, status=status.HTTP_401_UNAUTHORIZED)
-    
-    # Option 2: Basic auth validation (use your preferred auth method)
-    elif request.user.is_authenticated:
-        # Check if user is a node
-        try:
-            node = Node.objects.get(username=request.user.username, is_active=True)
-            sender_node_id = node.id
-        except Node.DoesNotExist:
-            return Response({"error": "Not authorized as a node"}, status=status.HTTP_401_UNAUTHORIZED)
-    else:
+        return Node.objects.filter(api_key=api_key, is_active=True).first()
+    if request.user.is_authenticated:
+        return Node.objects.filter(username=request.user.username, is_active=True).first()
+    return None
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Nodes authenticate themselves, see authenticate_node
+def receive_post(request):
+    """
+    Endpoint to receive a single post from a remote node (see inbox.post_payload for the format).
+    """
+    node = authenticate_node(request)
+    if node is None:
         return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-    
-    # Deserialize the post data
-    serializer = RemotePostSerializer(data=request.data)
-    if not serializer.is_valid():
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
+
+    result, = inbox.receive_posts([request.data], node)
+    if result["status"] == inbox.INVALID:
+        return Response(result["errors"], status=status.HTTP_400_BAD_REQUEST)
+    if result["status"] == inbox.CONFLICT:
+        return Response({"error": "Post belongs to another node"}, status=status.HTTP_409_CONFLICT)
+
+    logger.info(f"Received post {result['id']} from node {node.key}")
+    return Response(
+        {"message": "Post received successfully", "post_id": str(result["id"])},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # Nodes authenticate themselves, see authenticate_node
+def federation_changes(request):
+    """
+    This node's posts created, edited or soft-deleted after '?since=<cursor>', oldest first
+    (see myapp/changes.py). Returns {"posts": [...], "next": <cursor>, "has_more": bool};
+    pass "next" back as 'since' to resume. '?limit=' is optional.
+    """
+    node = authenticate_node(request)
+    if node is None:
+        return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
     try:
-        # Save the post
-        post = serializer.save()
-        
-        # Handle post deletion
-        if post.is_deleted():
-            logger.info(f"Received deletion for post {post.id} from node {sender_node_id}")
-        else:
-            logger.info(f"Received post {post.id} from node {sender_node_id}")
-        
-        return Response(
-            {"message": "Post received successfully", "post_id": str(post.id)}, 
-            status=status.HTTP_200_OK
-        )
-                        
-    except Exception as e:
-        logger.error(f"Error processing remote post: {str(e)}")
-        return Response(
-            {"error": f"Error processing post: {str(e)}"}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+        limit = max(1, min(int(request.query_params.get('limit', changes.PAGE_SIZE)), changes.MAX_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "'limit' must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+    page = changes.changes_since(request.query_params.get('since'), limit=limit, request=request)
+    return Response(page, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Nodes authenticate themselves, see authenticate_node
+@parser_classes([JSONParser, inbox.NDJSONParser])
+def receive_posts_batch(request):
+    """
+    Batch version of receive_post: a JSON array of posts ({"posts": [...]} also works), or NDJSON.
+    All posts are upserted in one transaction (see myapp/inbox.py).
+    Returns {"results": [...]} with a per-item "status".
+    """
+    node = authenticate_node(request)
+    if node is None:
+        return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    items = inbox.batch_items(request.data)
+    if len(items) > inbox.MAX_BATCH_SIZE:
+        return Response({"error": f"At most {inbox.MAX_BATCH_SIZE} posts per batch."}, status=400)
+
+    results = inbox.receive_posts(items, node)
+    logger.info(f"Received {len(items)} posts from node {node.key}")
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+@require_GET
+def post_image_by_hash(request, digest):
+    """
+    Serve a post image by the SHA-256 of its content, with Range and conditional-GET support.
+    Remote nodes fetch federated images from here instead of receiving them inline.
+    """
+    post = (
+        Post.objects
+            .filter(image_hash=digest.lower(), deleted_at__isnull=True)
+            .exclude(visibility__in=['PRIVATE', 'DRAFT', 'DELETED'])
+            .only('image')
+            .first()
+    )
+    if post is None or not post.image:
+        raise Http404("No such image")
+    return media.serve_image(request, post.image, post.image_hash)
 
 
 @api_view(['POST'])
@@ -1792,7 +1746,9 @@ def register_remote_follower(request):
     
     try:
         # Find the node
-        node = Node.objects.get(id=remote_node, is_active=True)
+        node = nodes.by_id(remote_node)
+        if node is None or not node.is_active:
+            raise Node.DoesNotExist
         
         # Create the remote follower
         RemoteFollower.objects.get_or_create(